@@ -15,6 +15,7 @@
 */
 package org.microfunctions.data_layer;
 
+import java.io.File;
 import java.io.FileInputStream;
 import java.io.IOException;
 import java.net.InetAddress;
@@ -24,13 +25,19 @@ import java.net.UnknownHostException;
 import java.nio.ByteBuffer;
 import java.util.AbstractMap;
 import java.util.ArrayList;
+import java.util.Collections;
 import java.util.HashMap;
 import java.util.HashSet;
+import java.util.Iterator;
 import java.util.List;
 import java.util.Map;
+import java.util.NavigableMap;
 import java.util.Properties;
 import java.util.Set;
+import java.util.TreeMap;
+import java.util.UUID;
 import java.util.concurrent.Callable;
+import java.util.concurrent.ConcurrentHashMap;
 import java.util.concurrent.ExecutorService;
 import java.util.concurrent.Executors;
 import java.util.concurrent.Future;
@@ -47,6 +54,8 @@ import org.apache.thrift.transport.TServerSocket;
 import org.apache.thrift.transport.TServerTransport;
 import org.apache.thrift.transport.TTransportException;
 import org.microfunctions.data_layer.DataLayerService.Iface;
+import org.newsclub.net.unix.AFUNIXServerSocket;
+import org.newsclub.net.unix.AFUNIXSocketAddress;
 
 public class DataLayerServer implements Iface, Callable<Object> {
 	
@@ -70,7 +79,13 @@ public class DataLayerServer implements Iface, Callable<Object> {
 	public static final int DEFAULT_CLIENT_TIMEOUT = 0;
 	public static final int DEFAULT_MAX_FRAME_LENGTH = Integer.MAX_VALUE;
 	
+	// the sorted snapshots of the collections that are being iterated page by page (see getPage())
+	private static final long PAGE_SNAPSHOT_TTL_MS = 60000L;
+	private static final int MAX_PAGE_SNAPSHOTS = 64;
+	private static final ConcurrentHashMap<String, PageSnapshot> pageSnapshots = new ConcurrentHashMap<String, PageSnapshot>();
+	
 	private TServer server = null;
+	private TServer unixSocketServer = null;
 	private LocalAccess dbLocal = null;
 	private RiakAccess dbRiak = null;
 
@@ -125,6 +140,12 @@ public class DataLayerServer implements Iface, Callable<Object> {
 	private static final int GET_SIZE_OF_MAP = 42;
 	private static final int DELETE_MAP = 43;
 	private static final int SELECT_MAPS = 44;
+	private static final int INSERT_ROWS = 45;
+	private static final int PUT_ENTRIES_TO_MAP = 46;
+	private static final int SELECT_ROWS = 47;
+	private static final int DELETE_ROWS = 48;
+	private static final int GET_ENTRIES_FROM_MAP = 49;
+	private static final int REMOVE_ENTRIES_FROM_MAP = 50;
 	
 	public DataLayerServer(Map<String,Integer> riakNodes, Map<String,Integer> allDatalayerNodes) {
         this.isMainDataLayerServer = true;
@@ -145,6 +166,7 @@ public class DataLayerServer implements Iface, Callable<Object> {
         this.parameters = parameters;
 	}
 
+	@SuppressWarnings("unchecked")
 	@Override
 	public Object call() throws Exception {
 		String keyspace = null;
@@ -155,6 +177,8 @@ public class DataLayerServer implements Iface, Callable<Object> {
 		int count = 0;
 		String table = null;
 		KeyValuePair keyValuePair = null;
+		List<KeyValuePair> keyValuePairs = null;
+		List<String> keys = null;
 		String key = null;
 		String counterName = null;
 		long initialValue = 0;
@@ -239,12 +263,24 @@ public class DataLayerServer implements Iface, Callable<Object> {
 			keyValuePair = (KeyValuePair)(parameters.get(2));
 			locality = (Integer)(parameters.get(3));
 			return (Boolean)insertRow(keyspace, table, keyValuePair, locality);
+		case INSERT_ROWS:
+			keyspace = parameters.get(0).toString();
+			table = parameters.get(1).toString();
+			keyValuePairs = (List<KeyValuePair>)(parameters.get(2));
+			locality = (Integer)(parameters.get(3));
+			return (Boolean)insertRows(keyspace, table, keyValuePairs, locality);
 		case SELECT_ROW:
 			keyspace = parameters.get(0).toString();
 			table = parameters.get(1).toString();
 			key = parameters.get(2).toString();
 			locality = (Integer)(parameters.get(3));
 			return selectRow(keyspace, table, key, locality);
+		case SELECT_ROWS:
+			keyspace = parameters.get(0).toString();
+			table = parameters.get(1).toString();
+			keys = (List<String>)(parameters.get(2));
+			locality = (Integer)(parameters.get(3));
+			return selectRows(keyspace, table, keys, locality);
 		case UPDATE_ROW:
 			keyspace = parameters.get(0).toString();
 			table = parameters.get(1).toString();
@@ -257,6 +293,12 @@ public class DataLayerServer implements Iface, Callable<Object> {
 			key = parameters.get(2).toString();
 			locality = (Integer)(parameters.get(3));
 			return (Boolean)deleteRow(keyspace, table, key, locality);
+		case DELETE_ROWS:
+			keyspace = parameters.get(0).toString();
+			table = parameters.get(1).toString();
+			keys = (List<String>)(parameters.get(2));
+			locality = (Integer)(parameters.get(3));
+			return (Boolean)deleteRows(keyspace, table, keys, locality);
 		case SELECT_KEYS:
 			keyspace = parameters.get(0).toString();
 			table = parameters.get(1).toString();
@@ -387,6 +429,13 @@ public class DataLayerServer implements Iface, Callable<Object> {
 			keyValuePair = (KeyValuePair)(parameters.get(3));
 			locality = (Integer)(parameters.get(4));
 			return (Boolean)putEntryToMap(keyspace, table, mapName, keyValuePair, locality);
+		case PUT_ENTRIES_TO_MAP:
+			keyspace = parameters.get(0).toString();
+			table = parameters.get(1).toString();
+			mapName = parameters.get(2).toString();
+			keyValuePairs = (List<KeyValuePair>)(parameters.get(3));
+			locality = (Integer)(parameters.get(4));
+			return (Boolean)putEntriesToMap(keyspace, table, mapName, keyValuePairs, locality);
 		case GET_ENTRY_FROM_MAP:
 			keyspace = parameters.get(0).toString();
 			table = parameters.get(1).toString();
@@ -394,6 +443,13 @@ public class DataLayerServer implements Iface, Callable<Object> {
 			entryKey = parameters.get(3).toString();
 			locality = (Integer)(parameters.get(4));
 			return getEntryFromMap(keyspace, table, mapName, entryKey, locality);
+		case GET_ENTRIES_FROM_MAP:
+			keyspace = parameters.get(0).toString();
+			table = parameters.get(1).toString();
+			mapName = parameters.get(2).toString();
+			keys = (List<String>)(parameters.get(3));
+			locality = (Integer)(parameters.get(4));
+			return getEntriesFromMap(keyspace, table, mapName, keys, locality);
 		case REMOVE_ENTRY_FROM_MAP:
 			keyspace = parameters.get(0).toString();
 			table = parameters.get(1).toString();
@@ -401,6 +457,13 @@ public class DataLayerServer implements Iface, Callable<Object> {
 			entryKey = parameters.get(3).toString();
 			locality = (Integer)(parameters.get(4));
 			return (Boolean)removeEntryFromMap(keyspace, table, mapName, entryKey, locality);
+		case REMOVE_ENTRIES_FROM_MAP:
+			keyspace = parameters.get(0).toString();
+			table = parameters.get(1).toString();
+			mapName = parameters.get(2).toString();
+			keys = (List<String>)(parameters.get(3));
+			locality = (Integer)(parameters.get(4));
+			return (Boolean)removeEntriesFromMap(keyspace, table, mapName, keys, locality);
 		case CONTAINS_KEY_IN_MAP:
 			keyspace = parameters.get(0).toString();
 			table = parameters.get(1).toString();
@@ -779,6 +842,38 @@ public class DataLayerServer implements Iface, Callable<Object> {
 			return false;
 		}
 	}
+
+	// batch of insertRow() in a single call; returns true only if all rows have been inserted
+	@Override
+	public boolean insertRows(String keyspace, String table, List<KeyValuePair> keyValuePairs, int locality) throws TException {
+		boolean result = true;
+		switch (locality) {
+		case LOCAL_DATALAYER:
+			for (KeyValuePair keyValuePair: keyValuePairs) {
+				result = dbLocal.insertRow(keyspace, table, keyValuePair.getKey(), ByteBuffer.wrap(keyValuePair.getValue())) && result;
+			}
+			return result;
+		case RIAK_DATALAYER:
+			for (KeyValuePair keyValuePair: keyValuePairs) {
+				result = dbRiak.insertRow(keyspace, table, keyValuePair.getKey(), ByteBuffer.wrap(keyValuePair.getValue())) && result;
+			}
+			return result;
+		case WRITE_RIAK_ASYNC_LOCAL_SYNC:
+			int function = INSERT_ROWS;
+			List<Object> parameters = new ArrayList<Object>(4);
+			parameters.add(keyspace);
+			parameters.add(table);
+			parameters.add(keyValuePairs);
+			parameters.add((Integer)RIAK_DATALAYER);
+			execute(keyspace, table, new DataLayerServer(dbRiak, function, parameters));
+			for (KeyValuePair keyValuePair: keyValuePairs) {
+				result = dbLocal.insertRow(keyspace, table, keyValuePair.getKey(), ByteBuffer.wrap(keyValuePair.getValue())) && result;
+			}
+			return result;
+		default:
+			return false;
+		}
+	}
 	
 	@Override
 	public KeyValuePair selectRow(String keyspace, String table, String key, int locality) throws TException {
@@ -814,6 +909,58 @@ public class DataLayerServer implements Iface, Callable<Object> {
 		return new KeyValuePair(row.getKey(), row.getValue());
 	}
 
+	// batch of selectRow() in a single call; the rows are in the order of the keys (empty for the missing ones)
+	@SuppressWarnings("unchecked")
+	@Override
+	public List<KeyValuePair> selectRows(String keyspace, String table, List<String> keys, int locality) throws TException {
+		List<AbstractMap.SimpleEntry<String, ByteBuffer>> rows = Collections.nCopies(keys.size(), NO_ROW);
+		switch (locality) {
+		case LOCAL_DATALAYER:
+			rows = new ArrayList<AbstractMap.SimpleEntry<String, ByteBuffer>>(keys.size());
+			for (String key: keys) {
+				rows.add(dbLocal.selectRow(keyspace, table, key));
+			}
+			break;
+		case RIAK_DATALAYER:
+			rows = dbRiak.selectRows(keyspace, table, keys);
+			break;
+		case READ_RIAK_ASYNC:
+			try {
+				int function = SELECT_ROWS;
+				List<Object> parameters = new ArrayList<Object>(4);
+				parameters.add(keyspace);
+				parameters.add(table);
+				parameters.add(keys);
+				parameters.add((Integer)RIAK_DATALAYER);
+				Future<Object> future = execute(keyspace, table, new DataLayerServer(dbRiak, function, parameters));
+				return (List<KeyValuePair>)future.get();
+			} catch (Exception e) {
+			    LOGGER.error("selectRows() failed.  Keyspace: " + keyspace + "  Table: " + table + "  Locality: " + locality, e);
+				break;
+			}
+		case READ_LOCAL_THEN_RIAK:
+			rows = new ArrayList<AbstractMap.SimpleEntry<String, ByteBuffer>>(keys.size());
+			List<Integer> missingIndices = new ArrayList<Integer>();
+			List<String> missingKeys = new ArrayList<String>();
+			for (int i = 0; i < keys.size(); i++) {
+				AbstractMap.SimpleEntry<String, ByteBuffer> row = dbLocal.selectRow(keyspace, table, keys.get(i));
+				if (row.getKey().compareTo(keys.get(i)) != 0) {
+					missingIndices.add(i);
+					missingKeys.add(keys.get(i));
+				}
+				rows.add(row);
+			}
+			if (!missingKeys.isEmpty()) {
+				List<AbstractMap.SimpleEntry<String, ByteBuffer>> riakRows = dbRiak.selectRows(keyspace, table, missingKeys);
+				for (int i = 0; i < missingIndices.size(); i++) {
+					rows.set(missingIndices.get(i), riakRows.get(i));
+				}
+			}
+			break;
+		}
+		return toKeyValuePairs(rows);
+	}
+
 	@Override
 	public boolean updateRow(String keyspace, String table, KeyValuePair keyValuePair, int locality) throws TException {
 		switch (locality) {
@@ -856,6 +1003,35 @@ public class DataLayerServer implements Iface, Callable<Object> {
 		}
 	}
 
+	// batch of deleteRow() in a single call; returns true only if all rows have been deleted
+	@Override
+	public boolean deleteRows(String keyspace, String table, List<String> keys, int locality) throws TException {
+		boolean result = true;
+		switch (locality) {
+		case LOCAL_DATALAYER:
+			for (String key: keys) {
+				result = dbLocal.deleteRow(keyspace, table, key) && result;
+			}
+			return result;
+		case RIAK_DATALAYER:
+			return dbRiak.deleteRows(keyspace, table, keys);
+		case WRITE_RIAK_ASYNC_LOCAL_SYNC:
+			int function = DELETE_ROWS;
+			List<Object> parameters = new ArrayList<Object>(4);
+			parameters.add(keyspace);
+			parameters.add(table);
+			parameters.add(keys);
+			parameters.add((Integer)RIAK_DATALAYER);
+			execute(keyspace, table, new DataLayerServer(dbRiak, function, parameters));
+			for (String key: keys) {
+				result = dbLocal.deleteRow(keyspace, table, key) && result;
+			}
+			return result;
+		default:
+			return false;
+		}
+	}
+
 	@SuppressWarnings("unchecked")
 	@Override
 	public List<String> selectKeys(String keyspace, String table, int start, int count, int locality) throws TException {
@@ -892,6 +1068,24 @@ public class DataLayerServer implements Iface, Callable<Object> {
 		return keys;
 	}
 
+	// the keys of a table with the given prefix in sorted order, page by page
+	@Override
+	public KeyPage selectKeysPage(final String keyspace, final String table, final String prefix, String cursor, int count, final int locality) throws TException {
+		Page page = getPage(cursor, count, new PageSnapshotLoader() {
+			@Override
+			public NavigableMap<String, ByteBuffer> load() throws TException {
+				NavigableMap<String, ByteBuffer> entries = new TreeMap<String, ByteBuffer>();
+				for (String key: selectKeys(keyspace, table, 0, Integer.MAX_VALUE, locality)) {
+					if (prefix == null || key.startsWith(prefix)) {
+						entries.put(key, null);
+					}
+				}
+				return entries;
+			}
+		});
+		return new KeyPage(page.keys, page.nextCursor);
+	}
+
 	@Override
 	public boolean createCounter(String keyspace, String table, String counterName, long initialValue, int locality) throws TException {
 		switch (locality) {
@@ -1076,6 +1270,26 @@ public class DataLayerServer implements Iface, Callable<Object> {
 		}
 	}
 
+	// the items of a set in sorted order, page by page
+	@Override
+	public KeyPage retrieveSetPage(final String keyspace, final String table, final String setName, String cursor, int count, final int locality) throws TException {
+		Page page = getPage(cursor, count, new PageSnapshotLoader() {
+			@Override
+			public NavigableMap<String, ByteBuffer> load() throws TException {
+				KeySetPair set = retrieveSet(keyspace, table, setName, locality);
+				if (set.getKey() == null || set.getKey().compareTo(setName) != 0) {
+					return null;
+				}
+				NavigableMap<String, ByteBuffer> items = new TreeMap<String, ByteBuffer>();
+				for (String item: set.getItems()) {
+					items.put(item, null);
+				}
+				return items;
+			}
+		});
+		return new KeyPage(page.keys, page.nextCursor);
+	}
+
 	@Override
 	public KeySetPair retrieveSet(String keyspace, String table, String setName, int locality) throws TException {
 		AbstractMap.SimpleEntry<String, Set<String>> set = NO_SET;
@@ -1352,6 +1566,26 @@ public class DataLayerServer implements Iface, Callable<Object> {
 		return new KeySetPair(set.getKey(), set.getValue());
 	}
 
+	// the entries of a map in the order of their keys, page by page
+	@Override
+	public KeyValuePage retrieveMapPage(final String keyspace, final String table, final String mapName, String cursor, int count, final int locality) throws TException {
+		Page page = getPage(cursor, count, new PageSnapshotLoader() {
+			@Override
+			public NavigableMap<String, ByteBuffer> load() throws TException {
+				KeyMapPair map = retrieveAllEntriesFromMap(keyspace, table, mapName, locality);
+				if (map.getKey() == null || map.getKey().compareTo(mapName) != 0) {
+					return null;
+				}
+				return new TreeMap<String, ByteBuffer>(map.getEntries());
+			}
+		});
+		List<KeyValuePair> entries = new ArrayList<KeyValuePair>(page.keys.size());
+		for (int i = 0; i < page.keys.size(); i++) {
+			entries.add(new KeyValuePair(page.keys.get(i), page.values.get(i)));
+		}
+		return new KeyValuePage(entries, page.nextCursor);
+	}
+
 	@Override
 	public KeyMapPair retrieveAllEntriesFromMap(String keyspace, String table, String mapName, int locality) throws TException {
 		AbstractMap.SimpleEntry<String, Map<String, ByteBuffer>> map = NO_MAP;
@@ -1408,6 +1642,39 @@ public class DataLayerServer implements Iface, Callable<Object> {
 		}
 	}
 
+	// batch of putEntryToMap() in a single call; returns true only if all entries have been put
+	@Override
+	public boolean putEntriesToMap(String keyspace, String table, String mapName, List<KeyValuePair> keyValuePairs, int locality) throws TException {
+		boolean result = true;
+		switch (locality) {
+		case LOCAL_DATALAYER:
+			for (KeyValuePair keyValuePair: keyValuePairs) {
+				result = dbLocal.putEntryToMap(keyspace, table, mapName, keyValuePair.getKey(), ByteBuffer.wrap(keyValuePair.getValue())) && result;
+			}
+			return result;
+		case RIAK_DATALAYER:
+			for (KeyValuePair keyValuePair: keyValuePairs) {
+				result = dbRiak.putEntryToMap(keyspace, table, mapName, keyValuePair.getKey(), ByteBuffer.wrap(keyValuePair.getValue())) && result;
+			}
+			return result;
+		case WRITE_RIAK_ASYNC_LOCAL_SYNC:
+			int function = PUT_ENTRIES_TO_MAP;
+			List<Object> parameters = new ArrayList<Object>(5);
+			parameters.add(keyspace);
+			parameters.add(table);
+			parameters.add(mapName);
+			parameters.add(keyValuePairs);
+			parameters.add((Integer)RIAK_DATALAYER);
+			execute(keyspace, table, new DataLayerServer(dbRiak, function, parameters));
+			for (KeyValuePair keyValuePair: keyValuePairs) {
+				result = dbLocal.putEntryToMap(keyspace, table, mapName, keyValuePair.getKey(), ByteBuffer.wrap(keyValuePair.getValue())) && result;
+			}
+			return result;
+		default:
+			return false;
+		}
+	}
+
 	@Override
 	public KeyValuePair getEntryFromMap(String keyspace, String table, String mapName, String entryKey, int locality) throws TException {
 		AbstractMap.SimpleEntry<String, ByteBuffer> row = NO_ROW;
@@ -1443,6 +1710,58 @@ public class DataLayerServer implements Iface, Callable<Object> {
 		return new KeyValuePair(row.getKey(), row.getValue());
 	}
 
+	// batch of getEntryFromMap() in a single call; the entries are in the order of the keys (empty for the missing ones)
+	@SuppressWarnings("unchecked")
+	@Override
+	public List<KeyValuePair> getEntriesFromMap(String keyspace, String table, String mapName, List<String> entryKeys, int locality) throws TException {
+		List<AbstractMap.SimpleEntry<String, ByteBuffer>> rows = Collections.nCopies(entryKeys.size(), NO_ROW);
+		switch (locality) {
+		case LOCAL_DATALAYER:
+			rows = new ArrayList<AbstractMap.SimpleEntry<String, ByteBuffer>>(entryKeys.size());
+			for (String entryKey: entryKeys) {
+				rows.add(dbLocal.getEntryFromMap(keyspace, table, mapName, entryKey));
+			}
+			break;
+		case RIAK_DATALAYER:
+			rows = dbRiak.getEntriesFromMap(keyspace, table, mapName, entryKeys);
+			break;
+		case READ_RIAK_ASYNC:
+			try {
+				int function = GET_ENTRIES_FROM_MAP;
+				List<Object> parameters = new ArrayList<Object>(5);
+				parameters.add(keyspace);
+				parameters.add(table);
+				parameters.add(mapName);
+				parameters.add(entryKeys);
+				parameters.add((Integer)RIAK_DATALAYER);
+				Future<Object> future = execute(keyspace, table, new DataLayerServer(dbRiak, function, parameters));
+				return (List<KeyValuePair>)future.get();
+			} catch (Exception e) {
+			    LOGGER.error("getEntriesFromMap() failed.  Keyspace: " + keyspace + "  Table: " + table + "  Locality: " + locality, e);
+				break;
+			}
+		case READ_LOCAL_THEN_RIAK:
+			rows = new ArrayList<AbstractMap.SimpleEntry<String, ByteBuffer>>(entryKeys.size());
+			boolean hasMissing = false;
+			for (String entryKey: entryKeys) {
+				AbstractMap.SimpleEntry<String, ByteBuffer> row = dbLocal.getEntryFromMap(keyspace, table, mapName, entryKey);
+				hasMissing = hasMissing || row.getKey().compareTo(entryKey) != 0;
+				rows.add(row);
+			}
+			if (hasMissing) {
+				// the map is fetched once from Riak for all missing entries
+				List<AbstractMap.SimpleEntry<String, ByteBuffer>> riakRows = dbRiak.getEntriesFromMap(keyspace, table, mapName, entryKeys);
+				for (int i = 0; i < entryKeys.size(); i++) {
+					if (rows.get(i).getKey().compareTo(entryKeys.get(i)) != 0) {
+						rows.set(i, riakRows.get(i));
+					}
+				}
+			}
+			break;
+		}
+		return toKeyValuePairs(rows);
+	}
+
 	@Override
 	public boolean removeEntryFromMap(String keyspace, String table, String mapName, String entryKey, int locality) throws TException {
 		switch (locality) {
@@ -1465,6 +1784,133 @@ public class DataLayerServer implements Iface, Callable<Object> {
 		}
 	}
 
+	// batch of removeEntryFromMap() in a single call; returns true only if all entries have been removed
+	@Override
+	public boolean removeEntriesFromMap(String keyspace, String table, String mapName, List<String> entryKeys, int locality) throws TException {
+		boolean result = true;
+		switch (locality) {
+		case LOCAL_DATALAYER:
+			for (String entryKey: entryKeys) {
+				result = dbLocal.removeEntryFromMap(keyspace, table, mapName, entryKey) && result;
+			}
+			return result;
+		case RIAK_DATALAYER:
+			return dbRiak.removeEntriesFromMap(keyspace, table, mapName, entryKeys);
+		case WRITE_RIAK_ASYNC_LOCAL_SYNC:
+			int function = REMOVE_ENTRIES_FROM_MAP;
+			List<Object> parameters = new ArrayList<Object>(5);
+			parameters.add(keyspace);
+			parameters.add(table);
+			parameters.add(mapName);
+			parameters.add(entryKeys);
+			parameters.add((Integer)RIAK_DATALAYER);
+			execute(keyspace, table, new DataLayerServer(dbRiak, function, parameters));
+			for (String entryKey: entryKeys) {
+				result = dbLocal.removeEntryFromMap(keyspace, table, mapName, entryKey) && result;
+			}
+			return result;
+		default:
+			return false;
+		}
+	}
+
+	private static List<KeyValuePair> toKeyValuePairs(List<AbstractMap.SimpleEntry<String, ByteBuffer>> rows) {
+		List<KeyValuePair> keyValuePairs = new ArrayList<KeyValuePair>(rows.size());
+		for (AbstractMap.SimpleEntry<String, ByteBuffer> row: rows) {
+			keyValuePairs.add(new KeyValuePair(row.getKey(), row.getValue()));
+		}
+		return keyValuePairs;
+	}
+
+	private interface PageSnapshotLoader {
+		// the sorted entries of the collection (null values for sets and keys); null if it does not exist
+		NavigableMap<String, ByteBuffer> load() throws TException;
+	}
+
+	private static class PageSnapshot {
+		final NavigableMap<String, ByteBuffer> entries;
+		volatile long lastAccess;
+
+		PageSnapshot(NavigableMap<String, ByteBuffer> entries) {
+			this.entries = entries;
+			this.lastAccess = System.currentTimeMillis();
+		}
+	}
+
+	private static class Page {
+		final List<String> keys = new ArrayList<String>();
+		final List<ByteBuffer> values = new ArrayList<ByteBuffer>();
+		String nextCursor = "";
+	}
+
+	/*
+	 * A cursor is <snapshot id> '|' <last key of the previous page> (empty for the first page).
+	 * The snapshot of the collection is taken with the first page, so that the pages are consistent with each other.
+	 * If the snapshot has expired (or the cursor is from another data layer server),
+	 * the iteration continues after the last key in a new snapshot.
+	 */
+	private Page getPage(String cursor, int count, PageSnapshotLoader loader) throws TException {
+		Page page = new Page();
+		if (count < 1) {
+			return page;
+		}
+
+		String snapshotId = null;
+		String lastKey = null;
+		int separator = (cursor == null) ? -1 : cursor.indexOf('|');
+		if (separator >= 0) {
+			snapshotId = cursor.substring(0, separator);
+			lastKey = cursor.substring(separator + 1);
+		}
+
+		PageSnapshot snapshot = (snapshotId == null) ? null : pageSnapshots.get(snapshotId);
+		if (snapshot == null) {
+			NavigableMap<String, ByteBuffer> entries = loader.load();
+			if (entries == null) {
+				return page;
+			}
+			snapshot = new PageSnapshot(entries);
+			snapshotId = UUID.randomUUID().toString();
+			evictPageSnapshots();
+			pageSnapshots.put(snapshotId, snapshot);
+		}
+		snapshot.lastAccess = System.currentTimeMillis();
+
+		NavigableMap<String, ByteBuffer> remaining = (lastKey == null) ? snapshot.entries : snapshot.entries.tailMap(lastKey, false);
+		for (Map.Entry<String, ByteBuffer> entry: remaining.entrySet()) {
+			if (page.keys.size() == count) {
+				page.nextCursor = snapshotId + "|" + page.keys.get(page.keys.size() - 1);
+				return page;
+			}
+			page.keys.add(entry.getKey());
+			page.values.add(entry.getValue());
+		}
+
+		// the last page
+		pageSnapshots.remove(snapshotId);
+		return page;
+	}
+
+	private static void evictPageSnapshots() {
+		long now = System.currentTimeMillis();
+		String oldestId = null;
+		long oldestAccess = Long.MAX_VALUE;
+		for (Iterator<Map.Entry<String, PageSnapshot>> it = pageSnapshots.entrySet().iterator(); it.hasNext(); ) {
+			Map.Entry<String, PageSnapshot> entry = it.next();
+			long lastAccess = entry.getValue().lastAccess;
+			if (now - lastAccess > PAGE_SNAPSHOT_TTL_MS) {
+				it.remove();
+			} else if (lastAccess < oldestAccess) {
+				oldestAccess = lastAccess;
+				oldestId = entry.getKey();
+			}
+		}
+
+		if (pageSnapshots.size() >= MAX_PAGE_SNAPSHOTS && oldestId != null) {
+			pageSnapshots.remove(oldestId);
+		}
+	}
+
 	@Override
 	public boolean containsKeyInMap(String keyspace, String table, String mapName, String entryKey, int locality) throws TException {
 		switch (locality) {
@@ -1624,23 +2070,56 @@ public class DataLayerServer implements Iface, Callable<Object> {
 	}
 
 
-	public void start(InetSocketAddress bindAddr) throws TTransportException {
-		TServerTransport transport = new TServerSocket(bindAddr, DEFAULT_CLIENT_TIMEOUT);
+	private TServer createServer(TServerTransport transport) {
 		TThreadPoolServer.Args args = new TThreadPoolServer.Args(transport)
 				.transportFactory(new TFramedTransport.Factory(DEFAULT_MAX_FRAME_LENGTH))
 				.protocolFactory(new TCompactProtocol.Factory())
 				.processor(new DataLayerService.Processor<Iface>(this))
 				.maxWorkerThreads(DEFAULT_MAX_WORKER_THREADS);
-		server = new TThreadPoolServer(args);
+		return new TThreadPoolServer(args);
+	}
+
+	public void start(InetSocketAddress bindAddr) throws TTransportException {
+		TServerTransport transport = new TServerSocket(bindAddr, DEFAULT_CLIENT_TIMEOUT);
+		server = this.createServer(transport);
 		LOGGER.info("Listening on "+bindAddr);
 		server.serve();
 	}
 	
+	/**
+	 * Listen also on a unix domain socket for the clients on the same host (e.g., function workers).
+	 * The server runs in its own thread; start() needs to be called afterwards.
+	 */
+	public void startUnixSocket(String socketPath) throws IOException, TTransportException {
+		final File socketFile = new File(socketPath);
+		// remove the socket file of a previous run; otherwise, the bind fails
+		socketFile.delete();
+
+		AFUNIXServerSocket serverSocket = AFUNIXServerSocket.newInstance();
+		serverSocket.bind(new AFUNIXSocketAddress(socketFile));
+		TServerTransport transport = new TServerSocket(serverSocket, DEFAULT_CLIENT_TIMEOUT);
+		unixSocketServer = this.createServer(transport);
+
+		Thread unixSocketServerThread = new Thread(new Runnable() {
+			@Override
+			public void run() {
+				unixSocketServer.serve();
+			}
+		});
+		unixSocketServerThread.setDaemon(true);
+		unixSocketServerThread.start();
+		LOGGER.info("Listening on unix socket "+socketPath);
+	}
+	
 	public void stop () {
 		if (server != null) {
 			server.stop();
 		}
 		
+		if (unixSocketServer != null) {
+			unixSocketServer.stop();
+		}
+		
 		if (executors != null) {
 			for (ExecutorService executor: executors) {
 				executor.shutdown();
@@ -1667,6 +2146,7 @@ public class DataLayerServer implements Iface, Callable<Object> {
 				+ " or as Java system properties\n");
 		System.err.println("OPTIONS:\n"
 				+ " - datalayer.bind (DATALAYER_BIND)\t<host> ':' <port>\t(default: 0.0.0.0:4998)\n"
+				+ " - datalayer.unix.socket (DATALAYER_UNIX_SOCKET)\t<path>\t(optional; also listen on this unix domain socket)\n"
 				+ " - riak.connect (RIAK_CONNECT)\t<host> ':' (<port>) [ ',' <host> ':' (<port>)? ]\t(default: 127.0.0.1:8087"
 				+ " - all.datalayer.bind (ALL_DATALAYER_BIND)\t<host> ':' (<port>) [ ',' <host> ':' (<port>)? ]\t(default: 127.0.0.1:4998");
 	}
@@ -1685,7 +2165,7 @@ public class DataLayerServer implements Iface, Callable<Object> {
 			// Copy properties from env or system props
 			Map<String,String> env = System.getenv();
 			Properties sys = System.getProperties();
-			for(String key : new String[]{"riak.connect","datalayer.bind", "all.datalayer.bind"}) {
+			for(String key : new String[]{"riak.connect","datalayer.bind", "all.datalayer.bind", "datalayer.unix.socket"}) {
 				String envkey = key.replace('.', '_').toUpperCase();
 				if(env.containsKey(envkey))
 					config.put(key,env.get(envkey));
@@ -1751,6 +2231,11 @@ public class DataLayerServer implements Iface, Callable<Object> {
 			// Parse bind address from <host>':'(<port>)?
 			InetSocketAddress bindAddr = new InetSocketAddress(bind[0],Integer.valueOf(bind[1]));
 
+			String unixSocketPath = config.getProperty("datalayer.unix.socket");
+			if (unixSocketPath != null) {
+				server.startUnixSocket(unixSocketPath);
+			}
+
 			server.start(bindAddr);
 		} catch (TTransportException e) {
 			System.err.println(e.getMessage());
@@ -50,6 +50,7 @@ import com.basho.riak.client.api.commands.kv.FetchValue;
 import com.basho.riak.client.api.commands.kv.ListKeys;
 import com.basho.riak.client.api.commands.kv.StoreValue;
 import com.basho.riak.client.core.RiakCluster;
+import com.basho.riak.client.core.RiakFuture;
 import com.basho.riak.client.core.RiakNode;
 import com.basho.riak.client.core.query.Location;
 import com.basho.riak.client.core.query.Namespace;
@@ -585,6 +586,55 @@ public class RiakAccess {
 		}
 	}
 	
+	// all rows are fetched concurrently (i.e., in about the time of a single fetch); missing rows are NO_ROW
+	public List<AbstractMap.SimpleEntry<String, ByteBuffer>> selectRows (String keyspace, String table, List<String> keys) {
+		List<AbstractMap.SimpleEntry<String, ByteBuffer>> rows = new ArrayList<AbstractMap.SimpleEntry<String, ByteBuffer>>(keys.size());
+		if (this.detectInvalidName(keyspace) || this.detectInvalidName(table)) {
+			LOGGER.warn("selectRows() invalid parameters.  Keyspace: " + keyspace + "  Table: " + table);
+			return Collections.nCopies(keys.size(), NO_ROW);
+		}
+
+        String tableType = null;
+        if (table == null) {
+            tableType = BUCKET_TYPE_DEFAULT;
+        } else {
+            tableType = BUCKET_TO_TYPE.get(keyspace + ";" + table);
+        }
+        
+        if (! KV_BUCKET_TYPES.contains(tableType)) {
+            LOGGER.warn("selectRows() invalid parameters.  Keyspace: " + keyspace + "  Table: " + table + ", tableType: " + tableType);
+            return Collections.nCopies(keys.size(), NO_ROW);
+        }
+		
+		Namespace bucket = null;
+		if (table == null) {
+			bucket = new Namespace(BUCKET_TYPE_DEFAULT, keyspace);
+		} else {
+			bucket = new Namespace(tableType, keyspace + ";" + table);
+		}
+		
+		List<RiakFuture<FetchValue.Response, Location>> futures = new ArrayList<RiakFuture<FetchValue.Response, Location>>(keys.size());
+		for (String key: keys) {
+			FetchValue fetch = new FetchValue.Builder(new Location(bucket, key)).build();
+			futures.add(client.executeAsync(fetch));
+		}
+		
+		for (int i = 0; i < keys.size(); i++) {
+			try {
+				RiakObject object = futures.get(i).get().getValue(RiakObject.class);
+				if (object == null || object.getValue() == null) {
+					rows.add(NO_ROW);
+				} else {
+					rows.add(new AbstractMap.SimpleEntry<String, ByteBuffer>(keys.get(i), ByteBuffer.wrap(object.getValue().unsafeGetValue())));
+				}
+			} catch (Exception e) {
+				LOGGER.error("selectRows() failed.  Keyspace: " + keyspace + "  Table: " + table + "  Key: " + keys.get(i), e);
+				rows.add(NO_ROW);
+			}
+		}
+		return rows;
+	}
+	
 	public boolean updateRow (String keyspace, String table, String key, ByteBuffer value) {
 		if (this.detectInvalidName(keyspace) || this.detectInvalidName(table)) {
 		    LOGGER.warn("updateRow() invalid parameters.  Keyspace: " + keyspace + "  Table: " + table);
@@ -670,6 +720,50 @@ public class RiakAccess {
 			return false;
 		}
 	}
+	
+	// all rows are deleted concurrently; returns true only if all of them have been deleted
+	public boolean deleteRows (String keyspace, String table, List<String> keys) {
+		if (this.detectInvalidName(keyspace) || this.detectInvalidName(table)) {
+		    LOGGER.warn("deleteRows() invalid parameters.  Keyspace: " + keyspace + "  Table: " + table);
+			return false;
+		}
+		
+        String tableType = null;
+        if (table == null) {
+            tableType = BUCKET_TYPE_DEFAULT;
+        } else {
+            tableType = BUCKET_TO_TYPE.get(keyspace + ";" + table);
+        }
+        
+	    if (! KV_BUCKET_TYPES.contains(tableType)) {
+	        LOGGER.warn("deleteRows() invalid parameters.  Keyspace: " + keyspace + "  Table: " + table);
+	        return false;
+	    }
+	    
+		Namespace bucket = null;
+		if (table == null) {
+			bucket = new Namespace(BUCKET_TYPE_DEFAULT, keyspace);
+		} else {
+			bucket = new Namespace(tableType, keyspace + ";" + table);
+		}
+		
+		List<RiakFuture<Void, Location>> futures = new ArrayList<RiakFuture<Void, Location>>(keys.size());
+		for (String key: keys) {
+			DeleteValue delete = new DeleteValue.Builder(new Location(bucket, key)).build();
+			futures.add(client.executeAsync(delete));
+		}
+		
+		boolean result = true;
+		for (int i = 0; i < keys.size(); i++) {
+			try {
+				futures.get(i).get();
+			} catch (Exception e) {
+				LOGGER.error("deleteRows() failed.  Keyspace: " + keyspace + "  Table: " + table + "  Key: " + keys.get(i), e);
+				result = false;
+			}
+		}
+		return result;
+	}
 
 	public List<String> selectKeys (String keyspace, String table, int start, int count) {
         String tableType = null;
@@ -1120,6 +1214,36 @@ public class RiakAccess {
 		}
 	}
 	
+	// the map is fetched once for all entries; missing entries are NO_ROW
+	public List<AbstractMap.SimpleEntry<String, ByteBuffer>> getEntriesFromMap (String keyspace, String table, String mapName, List<String> entryKeys) {
+		if (this.detectInvalidName(keyspace) || this.detectInvalidName(table)) {
+		    LOGGER.warn("getEntriesFromMap() invalid parameters.  Keyspace: " + keyspace + "  Table: " + table);
+			return Collections.nCopies(entryKeys.size(), NO_ROW);
+		}
+		
+		try {
+			Namespace bucket = new Namespace(BUCKET_TYPE_MAPS, keyspace + ";" + table);
+			Location location = new Location(bucket, mapName);
+			
+			FetchMap fetch = new FetchMap.Builder(location).build();
+			FetchMap.Response response = client.execute(fetch);
+			RiakMap rMap = response.getDatatype();
+			List<AbstractMap.SimpleEntry<String, ByteBuffer>> entries = new ArrayList<AbstractMap.SimpleEntry<String, ByteBuffer>>(entryKeys.size());
+			for (String entryKey: entryKeys) {
+				RiakRegister rRegister = rMap.getRegister(entryKey);
+				if (rRegister == null) {
+					entries.add(NO_ROW);
+				} else {
+					entries.add(new AbstractMap.SimpleEntry<String, ByteBuffer>(entryKey, ByteBuffer.wrap(rRegister.view().unsafeGetValue())));
+				}
+			}
+			return entries;
+		} catch (Exception e) {
+		    LOGGER.error("getEntriesFromMap() failed.  Keyspace: " + keyspace + "  Table: " + table, e);
+			return Collections.nCopies(entryKeys.size(), NO_ROW);
+		}
+	}
+	
 	public boolean removeEntryFromMap (String keyspace, String table, String mapName, String entryKey) {
 		if (this.detectInvalidName(keyspace) || this.detectInvalidName(table)) {
 		    LOGGER.warn("removeEntryFromMap() invalid parameters.  Keyspace: " + keyspace + "  Table: " + table);
@@ -1144,6 +1268,34 @@ public class RiakAccess {
 		}
 	}
 	
+	// all entries are removed with a single update of the map
+	public boolean removeEntriesFromMap (String keyspace, String table, String mapName, List<String> entryKeys) {
+		if (this.detectInvalidName(keyspace) || this.detectInvalidName(table)) {
+		    LOGGER.warn("removeEntriesFromMap() invalid parameters.  Keyspace: " + keyspace + "  Table: " + table);
+			return false;
+		}
+		
+		try {
+			Namespace bucket = new Namespace(BUCKET_TYPE_MAPS, keyspace + ";" + table);
+			Location location = new Location(bucket, mapName);
+			
+			FetchMap fetch = new FetchMap.Builder(location).build();
+			FetchMap.Response response = client.execute(fetch);
+			Context context = response.getContext();
+			
+			MapUpdate entries = new MapUpdate();
+			for (String entryKey: entryKeys) {
+				entries.removeRegister(entryKey);
+			}
+			UpdateMap update = new UpdateMap.Builder(location, entries).withContext(context).build();
+			client.execute(update);
+			return true;
+		} catch (Exception e) {
+		    LOGGER.error("removeEntriesFromMap() failed.  Keyspace: " + keyspace + "  Table: " + table, e);
+			return false;
+		}
+	}
+	
 	public boolean containsKeyInMap (String keyspace, String table, String mapName, String entryKey) {
 		if (this.detectInvalidName(keyspace) || this.detectInvalidName(table)) {
 		    LOGGER.warn("containsKeyInMap() invalid parameters.  Keyspace: " + keyspace + "  Table: " + table);
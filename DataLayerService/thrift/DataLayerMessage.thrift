@@ -36,6 +36,18 @@ struct KeyMapPair {
 	2: map<string, binary> entries
 }
 
+// a page of the entries of a collection; nextCursor is empty after the last page
+struct KeyValuePage {
+	1: list<KeyValuePair> entries,
+	2: string nextCursor
+}
+
+// a page of the items (or keys) of a collection; nextCursor is empty after the last page
+struct KeyPage {
+	1: list<string> keys,
+	2: string nextCursor
+}
+
 struct KeyIntPair {
 	1: string key,
 	2: i32 number
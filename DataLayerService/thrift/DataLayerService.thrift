@@ -37,10 +37,14 @@ service DataLayerService {
 	bool dropMapTable (1: string keyspace, 2: string table, 3: i32 locality),
 	
 	bool insertRow (1: string keyspace, 2: string table, 3: DataLayerMessage.KeyValuePair keyValuePair, 4: i32 locality),
+	bool insertRows (1: string keyspace, 2: string table, 3: list<DataLayerMessage.KeyValuePair> keyValuePairs, 4: i32 locality),
 	DataLayerMessage.KeyValuePair selectRow (1: string keyspace, 2: string table, 3: string key, 4: i32 locality),
+	list<DataLayerMessage.KeyValuePair> selectRows (1: string keyspace, 2: string table, 3: list<string> keys, 4: i32 locality),
 	bool updateRow (1: string keyspace, 2: string table, 3: DataLayerMessage.KeyValuePair keyValuePair, 4: i32 locality),
 	bool deleteRow (1: string keyspace, 2: string table, 3: string key, 4: i32 locality),
+	bool deleteRows (1: string keyspace, 2: string table, 3: list<string> keys, 4: i32 locality),
 	list<string> selectKeys (1: string keyspace, 2: string table, 3: i32 start, 4: i32 count, 5: i32 locality),
+	DataLayerMessage.KeyPage selectKeysPage (1: string keyspace, 2: string table, 3: string prefix, 4: string cursor, 5: i32 count, 6: i32 locality),
 	
 	bool createCounter (1: string keyspace, 2: string table, 3: string counterName, 4: i64 initialValue, 5: i32 locality),
 	DataLayerMessage.KeyCounterPair getCounter (1: string keyspace, 2: string table, 3: string counterName, 4: i32 locality),
@@ -51,6 +55,7 @@ service DataLayerService {
 	
 	bool createSet (1: string keyspace, 2: string table, 3: string setName, 4: i32 locality),
 	DataLayerMessage.KeySetPair retrieveSet (1: string keyspace, 2: string table, 3: string setName, 4: i32 locality),
+	DataLayerMessage.KeyPage retrieveSetPage (1: string keyspace, 2: string table, 3: string setName, 4: string cursor, 5: i32 count, 6: i32 locality),
 	bool addItemToSet (1: string keyspace, 2: string table, 3: string setName, 4: string setItem, 5: i32 locality),
 	bool removeItemFromSet (1: string keyspace, 2: string table, 3: string setName, 4: string setItem, 5: i32 locality),
 	bool containsItemInSet (1: string keyspace, 2: string table, 3: string setName, 4: string setItem, 5: i32 locality),
@@ -62,9 +67,13 @@ service DataLayerService {
 	bool createMap (1: string keyspace, 2: string table, 3: string mapName, 4: i32 locality),
 	DataLayerMessage.KeySetPair retrieveKeysetFromMap (1: string keyspace, 2: string table, 3: string mapName, 4: i32 locality),
 	DataLayerMessage.KeyMapPair retrieveAllEntriesFromMap (1: string keyspace, 2: string table, 3: string mapName, 4: i32 locality),
+	DataLayerMessage.KeyValuePage retrieveMapPage (1: string keyspace, 2: string table, 3: string mapName, 4: string cursor, 5: i32 count, 6: i32 locality),
 	bool putEntryToMap (1: string keyspace, 2: string table, 3: string mapName, 4: DataLayerMessage.KeyValuePair keyValuePair, 5: i32 locality),
+	bool putEntriesToMap (1: string keyspace, 2: string table, 3: string mapName, 4: list<DataLayerMessage.KeyValuePair> keyValuePairs, 5: i32 locality),
 	DataLayerMessage.KeyValuePair getEntryFromMap (1: string keyspace, 2: string table, 3: string mapName, 4: string entryKey, 5: i32 locality),
+	list<DataLayerMessage.KeyValuePair> getEntriesFromMap (1: string keyspace, 2: string table, 3: string mapName, 4: list<string> entryKeys, 5: i32 locality),
 	bool removeEntryFromMap (1: string keyspace, 2: string table, 3: string mapName, 4: string entryKey, 5: i32 locality),
+	bool removeEntriesFromMap (1: string keyspace, 2: string table, 3: string mapName, 4: list<string> entryKeys, 5: i32 locality),
 	bool containsKeyInMap (1: string keyspace, 2: string table, 3: string mapName, 4: string entryKey, 5: i32 locality),
 	bool clearMap (1: string keyspace, 2: string table, 3: string mapName, 4: i32 locality),
 	i32 getSizeOfMap (1: string keyspace, 2: string table, 3: string mapName, 4: i32 locality),
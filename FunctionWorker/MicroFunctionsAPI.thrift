@@ -57,11 +57,17 @@ service MicroFunctionsAPIService {
     void put(1: string key, 2: string value, 3: bool is_private, 4: bool is_queued),
     string get(1: string key, 2: bool is_private),
     void remove(1: string key, 2: bool is_private, 3: bool is_queued),
+    void multi_put(1: map<string, string> key_value_map, 2: bool is_private, 3: bool is_queued),
+    map<string, string> multi_get(1: list<string> keys, 2: bool is_private),
+    void multi_delete(1: list<string> keys, 2: bool is_private, 3: bool is_queued),
 
     void createMap(1: string mapname, 2: bool is_private, 3: bool is_queued),
     void putMapEntry(1: string mapname, 2: string key, 3: string value, 4: bool is_private, 5: bool is_queued),
     string getMapEntry(1: string mapname, 2: string key, 3: bool is_private),
     void deleteMapEntry(1: string mapname, 2: string key, 3: bool is_private, 4: bool is_queued),
+    void multi_putMapEntries(1: string mapname, 2: map<string, string> key_value_map, 3: bool is_private, 4: bool is_queued),
+    map<string, string> multi_getMapEntries(1: string mapname, 2: list<string> keys, 3: bool is_private),
+    void multi_deleteMapEntries(1: string mapname, 2: list<string> keys, 3: bool is_private, 4: bool is_queued),
     bool containsMapKey(1: string mapname, 2: string key, 3: bool is_private),
     set<string> getMapKeys(1: string mapname, 2: bool is_private),
     void clearMap(1: string mapname, 2: bool is_private, 3: bool is_queued),
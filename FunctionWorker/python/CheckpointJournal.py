@@ -0,0 +1,166 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import fcntl
+import json
+import os
+import zlib
+
+from struct import pack, unpack_from
+
+# The checkpoint journal is an append-only file in the sandbox, to which the function workers
+# append their checkpoints (i.e., entries of the execution info maps) instead of writing them
+# to the data layer. The sandbox agent replicates the records to the data layer in the background
+# (see SandboxAgent/checkpoint_replicator.py) and keeps the offset up to which they have been replicated
+# in a separate file, so that the remaining records can be replayed after a restart.
+#
+# Each record is: 4 bytes (uint32, big endian) body length, 4 bytes crc32 of the body and the body.
+# The body is: 4 bytes header length, the header as JSON text (map name, keys and value lengths)
+# and the values as raw bytes.
+CHECKPOINT_JOURNAL_FOLDER = "/opt/mfn/checkpoints/"
+RECORD_HEADER_LENGTH = 8
+
+_journal_fds = {}
+
+def get_checkpoint_journal_path(sandboxid):
+    return CHECKPOINT_JOURNAL_FOLDER + "journal_" + sandboxid + ".log"
+
+def _encode_record(map_name, entries):
+    keys = []
+    values = []
+    for key in entries:
+        value = entries[key]
+        if value is None:
+            value = ""
+        if isinstance(value, str):
+            value = value.encode()
+        keys.append(key)
+        values.append(bytes(value))
+
+    header = json.dumps({"map": map_name, "keys": keys, "lengths": [len(value) for value in values]}).encode()
+    body = b"".join([pack('!I', len(header)), header] + values)
+    return pack('!II', len(body), zlib.crc32(body) & 0xffffffff) + body
+
+def _decode_record(body):
+    header_length = unpack_from('!I', body, 0)[0]
+    header = json.loads(body[4:4 + header_length].decode())
+    entries = {}
+    offset = 4 + header_length
+    for key, length in zip(header["keys"], header["lengths"]):
+        entries[key] = body[offset:offset + length]
+        offset += length
+    return header["map"], entries
+
+def _get_journal_fd(path):
+    # flock() locks belong to the open file description,
+    # so each (forked) process needs its own
+    fd_key = (path, os.getpid())
+    if fd_key not in _journal_fds:
+        folder = os.path.dirname(path)
+        if folder != "":
+            os.makedirs(folder, exist_ok=True)
+        _journal_fds[fd_key] = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    return _journal_fds[fd_key]
+
+def append_checkpoint(path, map_name, entries):
+    '''
+    Appends the entries of an execution info map as a single record.
+    The record is only written to the page cache; the replicator syncs the journal in batches.
+    '''
+    record = _encode_record(map_name, entries)
+    fd = _get_journal_fd(path)
+    # writers share the lock, so that the replicator can only truncate the journal between records
+    fcntl.flock(fd, fcntl.LOCK_SH)
+    try:
+        view = memoryview(record)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+class CheckpointJournalReader:
+    '''
+    Reads the records of a checkpoint journal that have not yet been replicated.
+    '''
+    def __init__(self, path):
+        self._path = path
+        self._offset_path = path + ".offset"
+        self._fd = _get_journal_fd(path)
+        self.num_corrupted_records = 0
+
+    def sync(self):
+        os.fsync(self._fd)
+
+    def get_replicated_offset(self):
+        try:
+            with open(self._offset_path, "r") as offset_file:
+                return int(offset_file.read().strip())
+        except (IOError, ValueError):
+            return 0
+
+    def set_replicated_offset(self, offset):
+        tmp_path = self._offset_path + ".tmp"
+        with open(tmp_path, "w") as offset_file:
+            offset_file.write(str(offset))
+            offset_file.flush()
+            os.fsync(offset_file.fileno())
+        os.replace(tmp_path, self._offset_path)
+
+    def read_records(self, offset, max_bytes):
+        '''
+        Returns the complete records after the offset (up to about max_bytes)
+        and the offset after the last returned record.
+        A record that is still being written is left for the next read;
+        corrupted records are skipped and counted.
+        '''
+        records = []
+        with open(self._path, "rb") as journal_file:
+            journal_file.seek(offset)
+            data = journal_file.read(max_bytes)
+            position = 0
+            while len(data) - position >= RECORD_HEADER_LENGTH:
+                body_length, crc = unpack_from('!II', data, position)
+                end = position + RECORD_HEADER_LENGTH + body_length
+                if end > len(data):
+                    if position > 0:
+                        break
+                    # a single record that is larger than max_bytes
+                    data += journal_file.read(end - len(data))
+                    if end > len(data):
+                        break
+                body = data[position + RECORD_HEADER_LENGTH:end]
+                if zlib.crc32(body) & 0xffffffff == crc:
+                    records.append(_decode_record(body))
+                else:
+                    self.num_corrupted_records += 1
+                position = end
+
+        return records, offset + position
+
+    def truncate_if_replicated(self, offset, min_size):
+        '''
+        Truncates the journal if it is larger than min_size and all of its records have been replicated.
+        '''
+        if offset < min_size:
+            return False
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size != offset:
+                return False
+            os.ftruncate(self._fd, 0)
+            self.set_replicated_offset(0)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return True
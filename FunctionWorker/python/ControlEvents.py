@@ -0,0 +1,84 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import json
+import time
+import uuid
+
+# The control events of a workflow (e.g., stopped executions, data layer cache invalidations) are delivered to the function workers
+# in all sandboxes of the workflow: each event is an entry of a map in the global data layer of the sandbox keyspace
+# (i.e., shared by all sandboxes of the workflow), and the sandbox agent of each sandbox subscribes to the map
+# (see SandboxAgent/control_event_subscriber.py) and forwards the events as update messages ("0l") to its function workers.
+# The data layer has no notifications, so that the subscription polls a version counter,
+# which is incremented with each event; the map itself is only read when the version has changed.
+CONTROL_EVENTS_MAP = "control_events"
+CONTROL_EVENTS_VERSION_COUNTER = "control_events_version"
+
+# the events are removed after this time (in seconds); a sandbox that has not polled within this time misses them
+CONTROL_EVENT_TTL = 600.0
+
+def publish_control_event(dlc, update):
+    '''
+    Publish an update (i.e., the message of the action as handled by FunctionWorker._process_update())
+    to all sandboxes of the workflow. The data layer client has to be for the sandbox keyspace with the global locality.
+    '''
+    entry = {}
+    entry["time"] = time.time()
+    entry["update"] = update
+    dlc.putMapEntry(CONTROL_EVENTS_MAP, str(uuid.uuid4()), json.dumps(entry), locality=1)
+    dlc.incrementCounter(CONTROL_EVENTS_VERSION_COUNTER, 1)
+
+class ControlEventReader:
+    '''
+    Returns the control events that have not been read before, in the order of their publication.
+    The expired events are removed by the readers.
+    '''
+    def __init__(self, ttl=CONTROL_EVENT_TTL):
+        self._ttl = ttl
+        self._version = None
+        self._read_event_ids = set()
+
+    def read_new_events(self, dlc):
+        version = dlc.getCounter(CONTROL_EVENTS_VERSION_COUNTER)
+        if version == self._version:
+            return []
+
+        entries = dlc.retrieveMap(CONTROL_EVENTS_MAP, locality=1)
+        if entries is None:
+            return []
+        self._version = version
+
+        new_events = []
+        expired_event_ids = []
+        expiry = time.time() - self._ttl
+        for event_id in entries:
+            try:
+                entry = json.loads(entries[event_id])
+            except ValueError:
+                expired_event_ids.append(event_id)
+                continue
+            if entry["time"] < expiry:
+                expired_event_ids.append(event_id)
+            elif event_id not in self._read_event_ids:
+                new_events.append((entry["time"], entry["update"]))
+                self._read_event_ids.add(event_id)
+
+        if expired_event_ids:
+            dlc.deleteMapEntries(CONTROL_EVENTS_MAP, expired_event_ids)
+        # the ids of the removed events are not needed anymore
+        self._read_event_ids.intersection_update(entries.keys())
+        self._read_event_ids.difference_update(expired_event_ids)
+
+        new_events.sort(key=lambda event: event[0])
+        return [update for _, update in new_events]
@@ -0,0 +1,157 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import json
+import threading
+import time
+import uuid
+
+from collections import OrderedDict
+
+from DataLayerClient import DataLayerClient
+
+CACHE_KEY_PREFIX = "__mfn_cache|"
+# the current generation of a group of entries (e.g., the entries of a map); see invalidate_group()
+CACHE_GENERATION_KEY_PREFIX = "__mfn_cache_generation|"
+
+DEFAULT_TTL = 60.0
+DEFAULT_MAX_ENTRIES = 10000
+
+# the cache keys that have been stored by this process in the order of their last use (i.e., LRU first)
+# it is shared by all instances in the process (e.g., pool, thread and asyncio modes)
+_lru_index = OrderedDict()
+_lru_index_lock = threading.Lock()
+
+def get_cache_key(kind, is_private, table, names):
+    # e.g., "map|False|defaultMapTable|mymap|mykey"
+    return "|".join([kind, str(is_private), table] + list(names))
+
+class DataLayerCache:
+    '''
+    A read-through cache for the global data layer in the local data layer (locality = 0) of the sandbox.
+    Only the tables that are listed in the workflow's cache configuration are cached.
+    Entries expire after their TTL; the writes of other sandboxes invalidate the entries via control events
+    (see DataLayerOperator._publish_cache_invalidations() and SandboxAgent/control_event_subscriber.py).
+    The entries of a group (e.g., a map) are stored with the generation of the group, which is shared by
+    all processes of the sandbox, so that invalidating the group (e.g., clearing the map) invalidates all its entries.
+    The number of entries stored by a function worker process is bounded
+    with LRU eviction (in the fork mode, the instances don't share their LRU index, so that only the TTL applies).
+    '''
+    def __init__(self, sandboxid, datalayer, cache_config):
+        self._sandboxid = sandboxid
+        self._datalayer = datalayer
+        self._tables = set(cache_config.get("tables", []))
+        self._ttl = float(cache_config.get("ttl", DEFAULT_TTL))
+        self._max_entries = int(cache_config.get("max_entries", DEFAULT_MAX_ENTRIES))
+
+        # the threads of the instance (e.g., asynchronous operations) cannot share a data layer client
+        self._thread_local = threading.local()
+        self._local_data_layer_clients = []
+        self._local_data_layer_clients_lock = threading.Lock()
+
+        self.num_hits = 0
+        self.num_misses = 0
+
+    def is_cached_table(self, table):
+        return table in self._tables
+
+    def _get_local_data_layer_client(self):
+        local_data_layer_client = getattr(self._thread_local, "data_layer_client", None)
+        if local_data_layer_client is None:
+            local_data_layer_client = DataLayerClient(locality=0, for_mfn=True, sid=self._sandboxid, connect=self._datalayer, pooled=True)
+            self._thread_local.data_layer_client = local_data_layer_client
+            with self._local_data_layer_clients_lock:
+                self._local_data_layer_clients.append(local_data_layer_client)
+        return local_data_layer_client
+
+    def _touch(self, cache_key):
+        evicted = []
+        with _lru_index_lock:
+            _lru_index.pop(cache_key, None)
+            _lru_index[cache_key] = True
+            while len(_lru_index) > self._max_entries:
+                evicted.append(_lru_index.popitem(last=False)[0])
+        for evicted_key in evicted:
+            self._get_local_data_layer_client().delete(CACHE_KEY_PREFIX + evicted_key)
+
+    def _get_miss_generations(self):
+        miss_generations = getattr(self._thread_local, "miss_generations", None)
+        if miss_generations is None or len(miss_generations) > 1024:
+            miss_generations = {}
+            self._thread_local.miss_generations = miss_generations
+        return miss_generations
+
+    def get(self, cache_key, group=None):
+        '''
+        Returns (True, value) if the entry is in the cache, not expired and of the current generation of its group;
+        (False, None) otherwise.
+        '''
+        local_data_layer_client = self._get_local_data_layer_client()
+        generation = None
+        if group is None:
+            entry = local_data_layer_client.get(CACHE_KEY_PREFIX + cache_key)
+        else:
+            # the entry and the generation of its group with a single round trip
+            entries = local_data_layer_client.getMultiple([CACHE_KEY_PREFIX + cache_key, CACHE_GENERATION_KEY_PREFIX + group])
+            entry = entries.get(CACHE_KEY_PREFIX + cache_key)
+            generation = entries.get(CACHE_GENERATION_KEY_PREFIX + group, "")
+
+        if entry is not None and entry != "":
+            entry = json.loads(entry)
+            if entry["expiry"] > time.time() and entry.get("generation") == generation:
+                self.num_hits += 1
+                self._touch(cache_key)
+                return True, entry["value"]
+            self.invalidate(cache_key)
+
+        # the value read from the data layer after this miss belongs to this generation (see put()),
+        # even if the group is invalidated in the meantime
+        if group is not None:
+            self._get_miss_generations()[cache_key] = generation
+        self.num_misses += 1
+        return False, None
+
+    def put(self, cache_key, value, group=None):
+        entry = {}
+        entry["expiry"] = time.time() + self._ttl
+        entry["value"] = value
+        if group is not None:
+            generation = self._get_miss_generations().pop(cache_key, None)
+            if generation is None:
+                generation = self._get_local_data_layer_client().get(CACHE_GENERATION_KEY_PREFIX + group)
+            entry["generation"] = "" if generation is None else generation
+        self._get_local_data_layer_client().put(CACHE_KEY_PREFIX + cache_key, json.dumps(entry))
+        self._touch(cache_key)
+
+    def invalidate(self, cache_key):
+        with _lru_index_lock:
+            _lru_index.pop(cache_key, None)
+        self._get_local_data_layer_client().delete(CACHE_KEY_PREFIX + cache_key)
+
+    def invalidate_group(self, group):
+        # the entries of the previous generations are treated as misses (and deleted) when they are read
+        self._get_local_data_layer_client().put(CACHE_GENERATION_KEY_PREFIX + group, uuid.uuid4().hex)
+
+    def get_stats(self):
+        stats = {}
+        stats["hits"] = self.num_hits
+        stats["misses"] = self.num_misses
+        return stats
+
+    def shutdown(self):
+        with self._local_data_layer_clients_lock:
+            for local_data_layer_client in self._local_data_layer_clients:
+                local_data_layer_client.shutdown()
+            self._local_data_layer_clients = []
+        self._thread_local = threading.local()
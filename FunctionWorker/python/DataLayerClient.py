@@ -12,7 +12,15 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import os
+import select
+import socket
+import threading
 import time
+import zlib
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 from thrift import Thrift
 from thrift.transport import TSocket
@@ -25,10 +33,546 @@ from data_layer.service import DataLayerService
 
 MAX_RETRIES=3
 
+# the prefix of the address of a data layer server that listens on a unix domain socket (i.e., unix:///path/to/socket)
+UNIX_SOCKET_PREFIX="unix://"
+
+# idle pooled connections are closed after this many seconds
+POOL_IDLE_TIMEOUT=60.0
+# the maximum number of idle pooled connections per data layer address
+POOL_MAX_IDLE=8
+
+# the number of recent latencies of an operation that determine the delay of its hedged requests
+LATENCY_WINDOW=200
+# the minimum number of recent latencies of an operation before its requests are hedged
+HEDGE_MIN_SAMPLES=20
+# the percentile of the recent latencies after which a hedged request is sent
+HEDGE_PERCENTILE=0.95
+# the hedge delay of an operation is updated after this many calls
+HEDGE_DELAY_UPDATE_INTERVAL=20
+# the maximum number of concurrent requests (i.e., primary and hedge) of the hedged reads of the process;
+# a read is not hedged when they are all in use, so that it never waits for a thread
+HEDGE_MAX_WORKERS=16
+# the maximum time to connect to an alternative data layer server for a hedged request (if there is no deadline)
+HEDGE_MAX_CONNECT_WAIT=1.0
+
+# the number of entries, items or keys that are fetched with a single call when iterating over a collection (e.g., iter_map())
+ITER_PAGE_SIZE=1000
+# the maximum number of concurrent prefetches of the next pages of the iterations of the process
+ITER_PREFETCH_MAX_WORKERS=4
+
+# the header of a compressed value (i.e., zlib); a zero byte does not start the values written without compression in practice
+COMPRESSION_HEADER=b"\x00MFZ\x01"
+# the values of the compressed tables that are smaller than this many bytes are not compressed
+COMPRESSION_MIN_SIZE=4096
+COMPRESSION_LEVEL=6
+
+# the per-operation counters (see get_latency_counters())
+COUNTER_CALLS=0
+COUNTER_TOTAL_MS=1
+COUNTER_MAX_MS=2
+COUNTER_ERRORS=3
+COUNTER_HEDGED=4
+COUNTER_HEDGE_WINS=5
+
+class DataLayerDeadlineExceeded(Exception):
+    '''
+    The deadline of a data layer call (see DataLayerClient.set_deadline()) has passed.
+    '''
+
+def _get_remaining_millis(deadline):
+    remaining = int((deadline - time.time()) * 1000.0)
+    if remaining <= 0:
+        raise DataLayerDeadlineExceeded("The deadline of the data layer call has passed.")
+    return remaining
+
+class DataLayerLatencyStats:
+    '''
+    Per-operation latency counters of the data layer calls of the process.
+    The recent latencies of an operation also determine the delay of its hedged requests.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        # operation -> [calls, total ms, max ms, errors, hedged, hedge wins]
+        self._counters = {}
+        self._recent = {}
+        self._hedge_delays = {}
+
+    def _get_counters(self, operation):
+        if self._pid != os.getpid():
+            # the counters have been inherited from the parent process
+            self._reset()
+        counters = self._counters.get(operation)
+        if counters is None:
+            counters = [0, 0.0, 0.0, 0, 0, 0]
+            self._counters[operation] = counters
+        return counters
+
+    def record(self, operation, latency, is_error=False):
+        with self._lock:
+            counters = self._get_counters(operation)
+            counters[COUNTER_CALLS] += 1
+            counters[COUNTER_TOTAL_MS] += latency
+            if latency > counters[COUNTER_MAX_MS]:
+                counters[COUNTER_MAX_MS] = latency
+            if is_error:
+                counters[COUNTER_ERRORS] += 1
+                return
+
+            recent = self._recent.get(operation)
+            if recent is None:
+                recent = deque(maxlen=LATENCY_WINDOW)
+                self._recent[operation] = recent
+            recent.append(latency)
+            if len(recent) >= HEDGE_MIN_SAMPLES and counters[COUNTER_CALLS] % HEDGE_DELAY_UPDATE_INTERVAL == 0:
+                latencies = sorted(recent)
+                self._hedge_delays[operation] = latencies[int(len(latencies) * HEDGE_PERCENTILE)] / 1000.0
+
+    def record_hedge(self, operation, is_win):
+        with self._lock:
+            counters = self._get_counters(operation)
+            if is_win:
+                counters[COUNTER_HEDGE_WINS] += 1
+            else:
+                counters[COUNTER_HEDGED] += 1
+
+    def get_hedge_delay(self, operation):
+        '''
+        Return the delay (in seconds) after which a request of the operation is hedged;
+        None if there are not enough recent latencies of the operation.
+        '''
+        return self._hedge_delays.get(operation)
+
+    def get_counters(self, reset=False):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            counters = {}
+            for operation in self._counters:
+                counters[operation] = list(self._counters[operation])
+                counters[operation][COUNTER_TOTAL_MS] = round(counters[operation][COUNTER_TOTAL_MS], 3)
+                counters[operation][COUNTER_MAX_MS] = round(counters[operation][COUNTER_MAX_MS], 3)
+            if reset:
+                self._counters = {}
+        return counters
+
+_latency_stats = DataLayerLatencyStats()
+
+def get_latency_counters(reset=False):
+    '''
+    Return the latency counters of the data layer calls of the process per (thrift) operation:
+    [calls, total ms, max ms, errors, hedged, hedge wins]
+    (see the COUNTER_* indices).
+    With reset=True, the counters start over (e.g., to report the calls of a function instance).
+    '''
+    return _latency_stats.get_counters(reset)
+
+class _TimedDataLayerService:
+    '''
+    Records the latencies of the calls of a data layer service client.
+    '''
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, operation):
+        call = getattr(self._client, operation)
+
+        def timed_call(*args):
+            t_start = time.time()
+            try:
+                result = call(*args)
+            except Exception:
+                _latency_stats.record(operation, (time.time() - t_start) * 1000.0, is_error=True)
+                raise
+            _latency_stats.record(operation, (time.time() - t_start) * 1000.0)
+            return result
+
+        # the next calls of the operation do not go through __getattr__()
+        setattr(self, operation, timed_call)
+        return timed_call
+
+class DataLayerConnection:
+    '''
+    A thrift connection to a data layer server.
+    The keyspace, table and locality are arguments of every call,
+    so that a connection can be used by the clients of all keyspaces and localities.
+    '''
+
+    def __init__(self, address, deadline=None):
+        self.address = address
+        self.pid = os.getpid()
+        self.socket = None
+        self.transport = None
+        self.datalayer = None
+        # the timeout of the calls (ms); None means no timeout
+        self.timeout = None
+
+        # pool bookkeeping (see DataLayerConnectionPool)
+        self.num_leases = 0
+        self.lease_map = None
+        self.last_used = 0.0
+
+        self.open(deadline)
+
+    def open(self, deadline=None):
+        retry = 0.5 #s
+        while True:
+            try:
+                if self.address.startswith(UNIX_SOCKET_PREFIX):
+                    self.socket = TSocket.TSocket(unix_socket=self.address[len(UNIX_SOCKET_PREFIX):])
+                else:
+                    host, port = self.address.split(':')
+                    self.socket = TSocket.TSocket(host, int(port))
+                self.timeout = None
+                if deadline is not None:
+                    self.set_timeout(_get_remaining_millis(deadline))
+                self.transport = TTransport.TFramedTransport(self.socket)
+                self.transport.open()
+                protocol = TCompactProtocol.TCompactProtocol(self.transport)
+                self.datalayer = _TimedDataLayerService(DataLayerService.Client(protocol))
+                break
+            except Thrift.TException as exc:
+                if retry < 60 and (deadline is None or time.time() + retry < deadline):
+                    print("[DataLayerClient] Could not connect due to "+str(exc)+", retrying in "+str(retry)+"s")
+                    time.sleep(retry)
+                    retry = retry * 2
+                else:
+                    raise
+
+    def set_timeout(self, timeout):
+        if timeout != self.timeout:
+            self.socket.setTimeout(timeout)
+            self.timeout = timeout
+
+    def is_healthy(self):
+        if self.transport is None or not self.transport.isOpen():
+            return False
+        try:
+            readable, _, _ = select.select([self.socket.handle], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        # there is nothing to read on an idle connection, unless the server has closed it
+        return not readable
+
+    def close(self):
+        try:
+            self.transport.close()
+        except Thrift.TException as exc:
+            print(str(exc))
+
+    def abort(self):
+        # also wakes up a thread that is still waiting for a response on the connection
+        try:
+            self.socket.handle.shutdown(socket.SHUT_RDWR)
+        except (OSError, AttributeError):
+            pass
+        self.close()
+
+class DataLayerConnectionPool:
+    '''
+    Process-wide pool of data layer connections, keyed by the address of the data layer server.
+    The pooled clients of a thread share a single connection per address, because their calls are sequential.
+    When the last of them is shut down, the connection is kept idle for the next clients of any thread.
+    '''
+
+    def __init__(self, idle_timeout=POOL_IDLE_TIMEOUT, max_idle=POOL_MAX_IDLE):
+        self._idle_timeout = idle_timeout
+        self._max_idle = max_idle
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        # address -> idle connections, the least recently released first
+        self._idle = {}
+        self._thread_local = threading.local()
+
+    def reset_after_fork(self):
+        # the connections inherited from the parent process must not be used by the child
+        # (closing the child's copy of a socket does not affect the parent)
+        idle = self._idle
+        self._reset()
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    def acquire(self, address, deadline=None):
+        if self._pid != os.getpid():
+            self.reset_after_fork()
+
+        leased = getattr(self._thread_local, "leased", None)
+        if leased is None:
+            leased = {}
+            self._thread_local.leased = leased
+
+        connection = leased.get(address)
+        if connection is None:
+            connection = self._get_idle_connection(address, deadline)
+            if connection is None:
+                connection = DataLayerConnection(address, deadline)
+            connection.lease_map = leased
+            leased[address] = connection
+
+        connection.num_leases += 1
+        return connection
+
+    def _get_idle_connection(self, address, deadline=None):
+        connection = None
+        stale = []
+        now = time.time()
+        with self._lock:
+            connections = self._idle.get(address)
+            while connections:
+                candidate = connections.pop()
+                if now - candidate.last_used < self._idle_timeout:
+                    connection = candidate
+                    break
+                stale.append(candidate)
+
+        for candidate in stale:
+            candidate.close()
+
+        if connection is not None and not connection.is_healthy():
+            connection.close()
+            connection.open(deadline)
+        return connection
+
+    def release(self, connection):
+        if connection.pid != os.getpid():
+            # inherited from the parent process
+            return
+
+        connection.num_leases -= 1
+        if connection.num_leases > 0:
+            return
+
+        if connection.lease_map is not None and connection.lease_map.get(connection.address) is connection:
+            del connection.lease_map[connection.address]
+        connection.lease_map = None
+
+        stale = []
+        now = time.time()
+        with self._lock:
+            connections = self._idle.setdefault(connection.address, [])
+            while connections and now - connections[0].last_used >= self._idle_timeout:
+                stale.append(connections.pop(0))
+            if len(connections) < self._max_idle and connection.transport.isOpen():
+                connection.last_used = now
+                connections.append(connection)
+            else:
+                stale.append(connection)
+
+        for candidate in stale:
+            candidate.close()
+
+_connection_pool = DataLayerConnectionPool()
+
+# the cpu time of the calling thread (python 3.7+); otherwise, of the process
+_get_cpu_time = getattr(time, "thread_time", time.process_time)
+
+class DataLayerCompressionStats:
+    '''
+    The compression counters of the process: the number of compressed values (and the ones not compressed,
+    because compression did not make them smaller), their sizes before and after compression,
+    and the cpu time spent compressing and decompressing.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._counters = {"compressed": 0, "incompressible": 0, "bytes_in": 0, "bytes_out": 0, "compress_ms": 0.0, "decompressed": 0, "decompress_ms": 0.0}
+
+    def _add(self, **increments):
+        with self._lock:
+            if self._pid != os.getpid():
+                # the counters of the parent process are reported by the parent
+                self._reset()
+            for name in increments:
+                self._counters[name] += increments[name]
+
+    def record_compression(self, size_in, size_out, cpu_ms):
+        if size_out is None:
+            self._add(incompressible=1, compress_ms=cpu_ms)
+        else:
+            self._add(compressed=1, bytes_in=size_in, bytes_out=size_out, compress_ms=cpu_ms)
+
+    def record_decompression(self, cpu_ms):
+        self._add(decompressed=1, decompress_ms=cpu_ms)
+
+    def get_counters(self, reset=False):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            counters = dict(self._counters)
+            if reset:
+                self._reset()
+        return counters
+
+_compression_stats = DataLayerCompressionStats()
+
+def get_compression_counters(reset=False):
+    '''
+    Return the compression counters of the process (see DataLayerCompressionStats);
+    the compression ratio is bytes_in / bytes_out.
+    '''
+    return _compression_stats.get_counters(reset)
+
+# per table name: (minimum size, zlib level) of the values to be compressed (see set_compression_config())
+_compressed_tables = {}
+# the same for the table name prefixes (e.g., "wf_maps_*")
+_compressed_table_prefixes = []
+
+def set_compression_config(compression_config):
+    '''
+    Compress the values written to the listed tables by the data layer clients of the process,
+    e.g., {"tables": ["defaultTable", "defaultMapTable"], "min_size": 4096, "level": 6}.
+    The tables can also be a dict of table names to their minimum sizes.
+    A table name ending with "*" is a prefix (e.g., "sbox_maps_*" for the checkpoints and results of the workflow).
+    The compressed values are decompressed when read by any data layer client, regardless of the configuration.
+    '''
+    _compressed_tables.clear()
+    del _compressed_table_prefixes[:]
+    if not compression_config or not compression_config.get("tables"):
+        return
+    min_size = int(compression_config.get("min_size", COMPRESSION_MIN_SIZE))
+    level = int(compression_config.get("level", COMPRESSION_LEVEL))
+    tables = compression_config["tables"]
+    for table in tables:
+        table_min_size = tables[table] if isinstance(tables, dict) else min_size
+        if table.endswith("*"):
+            _compressed_table_prefixes.append((table[:-1], (int(table_min_size), level)))
+        else:
+            _compressed_tables[table] = (int(table_min_size), level)
+
+def compress_value(table, value):
+    '''
+    Return the (encoded) value as it is stored in the table:
+    compressed with the COMPRESSION_HEADER, if the table is compressed, the value is large enough
+    and compression makes it smaller.
+    '''
+    if table in _compressed_tables:
+        config = _compressed_tables[table]
+    else:
+        config = None
+        for prefix, prefix_config in _compressed_table_prefixes:
+            if table.startswith(prefix):
+                config = prefix_config
+                break
+        # the next lookups of the table are exact
+        _compressed_tables[table] = config
+    if config is None or len(value) < config[0]:
+        return value
+    t_start = _get_cpu_time()
+    compressed = COMPRESSION_HEADER + zlib.compress(value, config[1])
+    cpu_ms = (_get_cpu_time() - t_start) * 1000.0
+    if len(compressed) >= len(value):
+        _compression_stats.record_compression(len(value), None, cpu_ms)
+        return value
+    _compression_stats.record_compression(len(value), len(compressed), cpu_ms)
+    return compressed
+
+def decompress_value(value):
+    if not value.startswith(COMPRESSION_HEADER):
+        return value
+    t_start = _get_cpu_time()
+    value = zlib.decompress(value[len(COMPRESSION_HEADER):])
+    _compression_stats.record_decompression((_get_cpu_time() - t_start) * 1000.0)
+    return value
+
+def _encode_value(table, value):
+    if value is None:
+        value = ""
+    if isinstance(value, str):
+        value = value.encode()
+    return compress_value(table, value)
+
+def _decode_value(value, raw=False):
+    value = decompress_value(value)
+    if raw:
+        return value
+    return value.decode()
+
+if hasattr(os, "register_at_fork"):
+    # python 3.7+; otherwise, the pool detects the fork when it is used
+    os.register_at_fork(after_in_child=_connection_pool.reset_after_fork)
+
+_hedge_executor = None
+_hedge_executor_pid = None
+_hedge_in_flight = 0
+_hedge_lock = threading.Lock()
+
+def _acquire_hedge_executor(num_requests):
+    '''
+    Return the executor of the hedged reads with num_requests of its threads reserved,
+    or None if they are not available right away.
+    '''
+    global _hedge_executor, _hedge_executor_pid, _hedge_in_flight
+    with _hedge_lock:
+        if _hedge_executor is None or _hedge_executor_pid != os.getpid():
+            # the threads of the executor are not inherited by a forked child
+            _hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS)
+            _hedge_executor_pid = os.getpid()
+            _hedge_in_flight = 0
+        if _hedge_in_flight + num_requests > HEDGE_MAX_WORKERS:
+            return None
+        _hedge_in_flight += num_requests
+        return _hedge_executor
+
+def _release_hedge_executor(num_requests):
+    global _hedge_in_flight
+    with _hedge_lock:
+        _hedge_in_flight -= num_requests
+
+_prefetch_executor = None
+_prefetch_executor_pid = None
+
+def _get_prefetch_executor():
+    # the prefetches of the iterations (see DataLayerClient._iterate_pages()) do not delay the hedged reads
+    global _prefetch_executor, _prefetch_executor_pid
+    if _prefetch_executor is None or _prefetch_executor_pid != os.getpid():
+        _prefetch_executor = ThreadPoolExecutor(max_workers=ITER_PREFETCH_MAX_WORKERS)
+        _prefetch_executor_pid = os.getpid()
+    return _prefetch_executor
+
+def _send_pooled_request(address, operation, args, deadline):
+    # sent from a thread of the executor with its own pooled connection
+    if deadline is None:
+        deadline = time.time() + HEDGE_MAX_CONNECT_WAIT
+        connection = _connection_pool.acquire(address, deadline)
+        connection.set_timeout(None)
+    else:
+        connection = _connection_pool.acquire(address, deadline)
+        connection.set_timeout(_get_remaining_millis(deadline))
+    try:
+        return getattr(connection.datalayer, operation)(*args)
+    except Exception:
+        # a connection with an unfinished call cannot be reused
+        connection.close()
+        raise
+    finally:
+        _connection_pool.release(connection)
+
 class DataLayerClient:
 
-    def __init__(self, locality=1, sid=None, wid=None, suid=None, is_wf_private=False, for_mfn=False, connect="127.0.0.1:4998", init_tables=False):
+    def __init__(self, locality=1, sid=None, wid=None, suid=None, is_wf_private=False, for_mfn=False, connect="127.0.0.1:4998", init_tables=False, pooled=False, deadline=None, hedge_connect=None):
         self.dladdress = connect
+        # a pooled client shares the connection of the thread with the other pooled clients (see DataLayerConnectionPool);
+        # it must only be used by the thread that created it
+        self._pooled = pooled
+        self._connection = None
+        # the time (i.e., time.time()) by which all calls need to finish; None means no deadline
+        self._deadline = deadline
+        # the alternative data layer servers for the hedged reads (i.e., get(), getMapEntry(), retrieveSet())
+        self._hedge_connect = [] if hedge_connect is None else hedge_connect
+        self._next_hedge_index = 0
 
         if for_mfn:
             self.keyspace = "sbox_" + sid
@@ -89,23 +633,127 @@ class DataLayerClient:
 
 
     def connect(self):
-        retry = 0.5 #s
+        if self._connection is None:
+            if self._pooled:
+                self._connection = _connection_pool.acquire(self.dladdress, self._deadline)
+            else:
+                self._connection = DataLayerConnection(self.dladdress, self._deadline)
+        else:
+            # reconnecting after a failure; the other clients sharing a pooled connection also use the new one
+            self._connection.close()
+            self._connection.open(self._deadline)
+
+    def set_deadline(self, deadline):
+        '''
+        Set the time (i.e., time.time()) by which all calls need to finish (None: no deadline).
+        A call that cannot finish by then raises DataLayerDeadlineExceeded.
+        '''
+        self._deadline = deadline
+
+    @property
+    def datalayer(self):
+        if self._connection is None:
+            # used again after shutdown()
+            self.connect()
+        elif self._pooled and self._connection.pid != os.getpid():
+            # the pooled connection belongs to the parent process
+            self._connection = _connection_pool.acquire(self.dladdress, self._deadline)
+
+        # every call goes through here, so that its timeout is the remaining time until the deadline
+        if self._deadline is not None:
+            self._connection.set_timeout(_get_remaining_millis(self._deadline))
+        elif self._connection.timeout is not None:
+            # the pooled connection is shared with a client with a deadline
+            self._connection.set_timeout(None)
+        return self._connection.datalayer
+
+    def _hedged_read(self, operation, *args):
+        # an idempotent read is sent also to an alternative data layer server,
+        # if there is no response after the usual (i.e., 95th percentile) latency of the operation
+        datalayer = self.datalayer
+        hedge_delay = None
+        if self._hedge_connect:
+            hedge_delay = _latency_stats.get_hedge_delay(operation)
+        if hedge_delay is None:
+            return getattr(datalayer, operation)(*args)
+
+        # the threads for both the primary and the hedge request
+        executor = _acquire_hedge_executor(2)
+        if executor is None:
+            return getattr(datalayer, operation)(*args)
+        primary = executor.submit(getattr(datalayer, operation), *args)
+        primary.add_done_callback(lambda future: _release_hedge_executor(1))
+        done, _ = wait([primary], timeout=hedge_delay)
+        if done:
+            _release_hedge_executor(1)
+            return primary.result()
+
+        hedge_address = self._hedge_connect[self._next_hedge_index % len(self._hedge_connect)]
+        self._next_hedge_index += 1
+        hedge = executor.submit(_send_pooled_request, hedge_address, operation, args, self._deadline)
+        hedge.add_done_callback(lambda future: _release_hedge_executor(1))
+        _latency_stats.record_hedge(operation, False)
+
+        # the first successful response wins
+        error = None
+        pending = set([primary, hedge])
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            if primary in done:
+                if primary.exception() is None:
+                    return primary.result()
+                # the error of the primary request decides whether the caller reconnects
+                error = primary.exception()
+            if hedge in done:
+                if hedge.exception() is None:
+                    _latency_stats.record_hedge(operation, True)
+                    if primary in pending or error is not None:
+                        # the response of the primary request would be read by the next call
+                        self._connection.abort()
+                        self._connection.open(self._deadline)
+                    return hedge.result()
+                if error is None:
+                    error = hedge.exception()
+        raise error
+
+    def _get_page(self, operation, args):
+        for retry in range(MAX_RETRIES):
+            try:
+                return getattr(self.datalayer, operation)(*args)
+            except TTransport.TTransportException as exc:
+                print("[DataLayerClient] Reconnecting because of failed " + operation + ": " + str(exc))
+                self.connect()
+                error = exc
+            except Exception as exc:
+                print("[DataLayerClient] failed " + operation + ": " + str(exc))
+                raise
+        # a silently truncated iteration would be indistinguishable from a complete one
+        raise error
+
+    def _iterate_pages(self, operation, args, page_size, locality):
+        # the server keeps a snapshot of the collection between the pages (see DataLayerServer.getPage());
+        # the next page is fetched on another connection, while the caller consumes the current one
+        executor = _get_prefetch_executor()
+        page = self._get_page(operation, args + ("", page_size, locality))
         while True:
+            if page.nextCursor == "":
+                yield page
+                return
+
+            page_args = args + (page.nextCursor, page_size, locality)
+            next_page = executor.submit(_send_pooled_request, self.dladdress, operation, page_args, self._deadline)
             try:
-                host, port = self.dladdress.split(':')
-                self.socket = TSocket.TSocket(host, int(port))
-                self.transport = TTransport.TFramedTransport(self.socket)
-                self.transport.open()
-                self.protocol = TCompactProtocol.TCompactProtocol(self.transport)
-                self.datalayer = DataLayerService.Client(self.protocol)
-                break
-            except Thrift.TException as exc:
-                if retry < 60:
-                    print("[DataLayerClient] Could not connect due to "+str(exc)+", retrying in "+str(retry)+"s")
-                    time.sleep(retry)
-                    retry = retry * 2
-                else:
-                    raise
+                yield page
+            except GeneratorExit:
+                # the caller has stopped the iteration early
+                next_page.cancel()
+                raise
+
+            try:
+                page = next_page.result()
+            except Exception as exc:
+                print("[DataLayerClient] failed to prefetch " + operation + ": " + str(exc))
+                page = self._get_page(operation, page_args)
 
     # (key, value) operations
     def put(self, key, value, locality=None, tableName=None):
@@ -114,11 +762,9 @@ class DataLayerClient:
         loc = self.locality if locality is None else locality
         table = self.tablename if tableName is None else tableName
         #print("[DataLayerClient] [PUT] keyspace=%s, tablename=%s putting key %s" % (self.keyspace,table,key))
-        if value is None:
-            value = ""
+        value = _encode_value(table, value)
         for retry in range(MAX_RETRIES):
             try:
-                value = value.encode()
                 row = KeyValuePair(key, value)
                 status = self.datalayer.insertRow(self.keyspace, table, row, loc)
                 break
@@ -131,7 +777,28 @@ class DataLayerClient:
 
         return status
 
-    def get(self, key, locality=None, tableName=None):
+    def putMultiple(self, key_value_map, locality=None, tableName=None):
+        # all (key, value) pairs in a single round trip
+        status = False
+        loc = self.locality if locality is None else locality
+        table = self.tablename if tableName is None else tableName
+        rows = []
+        for key in key_value_map:
+            rows.append(KeyValuePair(key, _encode_value(table, key_value_map[key])))
+        for retry in range(MAX_RETRIES):
+            try:
+                status = self.datalayer.insertRows(self.keyspace, table, rows, loc)
+                break
+            except TTransport.TTransportException as exc:
+                print("[DataLayerClient] Reconnecting because of failed putMultiple: " + str(exc))
+                self.connect()
+            except Exception as exc:
+                print("[DataLayerClient] failed putMultiple: " + str(exc))
+                raise
+
+        return status
+
+    def get(self, key, locality=None, tableName=None, raw=False):
         #print("Client keyspace=%s, tablename=%s fetching key %s" % (self.keyspace,self.tablename,key))
         val = None
         loc = self.locality if locality is None else locality
@@ -139,10 +806,9 @@ class DataLayerClient:
         #print("[DataLayerClient] [GET] keyspace=%s, tablename=%s getting key %s" % (self.keyspace,table,key))
         for retry in range(MAX_RETRIES):
             try:
-                result = self.datalayer.selectRow(self.keyspace, table, key, loc)
+                result = self._hedged_read("selectRow", self.keyspace, table, key, loc)
                 if result.key != "" and result.key == key:
-                    val = result.value
-                    val = val.decode()
+                    val = _decode_value(result.value, raw)
                 break
             except TTransport.TTransportException as exc:
                 print("[DataLayerClient] Reconnecting because of failed get: " + str(exc))
@@ -153,13 +819,46 @@ class DataLayerClient:
 
         return val
 
-    def delete(self, key, tableName=None):
+    def getMultiple(self, keys, locality=None, tableName=None, raw=False):
+        # all keys in a single round trip; returns the existing (key, value) pairs
+        key_value_map = {}
+        loc = self.locality if locality is None else locality
+        table = self.tablename if tableName is None else tableName
+        for retry in range(MAX_RETRIES):
+            try:
+                results = self.datalayer.selectRows(self.keyspace, table, list(keys), loc)
+                for result in results:
+                    if result.key != "":
+                        key_value_map[result.key] = _decode_value(result.value, raw)
+                break
+            except TTransport.TTransportException as exc:
+                print("[DataLayerClient] Reconnecting because of failed getMultiple: " + str(exc))
+                self.connect()
+            except Exception as exc:
+                print("[DataLayerClient] failed getMultiple: " + str(exc))
+                raise
+
+        return key_value_map
+
+    def iter_keys(self, prefix="", page_size=ITER_PAGE_SIZE, tableName=None, locality=None):
+        '''
+        Iterate over the keys of a table that start with the prefix in sorted order,
+        fetching page_size keys at a time.
+        '''
+        loc = self.locality if locality is None else locality
+        table = self.tablename if tableName is None else tableName
+        for page in self._iterate_pages("selectKeysPage", (self.keyspace, table, prefix), page_size, loc):
+            for key in page.keys:
+                yield key
+
+    def delete(self, key, tableName=None, locality=None):
         status = False
+        loc = self.locality if locality is None else locality
         table = self.tablename if tableName is None else tableName
         #print("[DataLayerClient] [DELETE] keyspace=%s, tablename=%s deleting key %s" % (self.keyspace,table,key))
         for retry in range(MAX_RETRIES):
             try:
-                status = self.datalayer.deleteRow(self.keyspace, table, key, self.locality)
+                status = self.datalayer.deleteRow(self.keyspace, table, key, loc)
                 break
             except TTransport.TTransportException as exc:
                 print("[DataLayerClient] Reconnecting because of failed delete: " + str(exc))
@@ -170,6 +869,24 @@ class DataLayerClient:
 
         return status
 
+    def deleteMultiple(self, keys, tableName=None, locality=None):
+        # all keys in a single round trip
+        status = False
+        loc = self.locality if locality is None else locality
+        table = self.tablename if tableName is None else tableName
+        for retry in range(MAX_RETRIES):
+            try:
+                status = self.datalayer.deleteRows(self.keyspace, table, list(keys), loc)
+                break
+            except TTransport.TTransportException as exc:
+                print("[DataLayerClient] Reconnecting because of failed deleteMultiple: " + str(exc))
+                self.connect()
+            except Exception as exc:
+                print("[DataLayerClient] failed deleteMultiple: " + str(exc))
+                raise
+
+        return status
+
     # map operations
     def createMap(self, mapname):
         status = False
@@ -189,11 +906,9 @@ class DataLayerClient:
     def putMapEntry(self, mapname, key, value, locality=None):
         status = False
         loc = self.locality if locality is None else locality
-        if value is None:
-            value = ""
+        value = _encode_value(self.maptablename, value)
         for retry in range(MAX_RETRIES):
             try:
-                value = value.encode()
                 row = KeyValuePair(key, value)
                 status = self.datalayer.putEntryToMap(self.keyspace, self.maptablename, mapname, row, loc)
                 break
@@ -206,14 +921,33 @@ class DataLayerClient:
 
         return status
 
+    def putMapEntries(self, mapname, key_value_map, locality=None):
+        # all entries in a single round trip
+        status = False
+        loc = self.locality if locality is None else locality
+        rows = []
+        for key in key_value_map:
+            rows.append(KeyValuePair(key, _encode_value(self.maptablename, key_value_map[key])))
+        for retry in range(MAX_RETRIES):
+            try:
+                status = self.datalayer.putEntriesToMap(self.keyspace, self.maptablename, mapname, rows, loc)
+                break
+            except TTransport.TTransportException as exc:
+                print("[DataLayerClient] Reconnecting because of failed putMapEntries: " + str(exc))
+                self.connect()
+            except Exception as exc:
+                print("[DataLayerClient] failed putMapEntries: " + str(exc))
+                raise
+
+        return status
+
     def getMapEntry(self, mapname, key):
         val = None
         for retry in range(MAX_RETRIES):
             try:
-                kvp = self.datalayer.getEntryFromMap(self.keyspace, self.maptablename, mapname, key, self.locality)
+                kvp = self._hedged_read("getEntryFromMap", self.keyspace, self.maptablename, mapname, key, self.locality)
                 if kvp.key != "" and kvp.key == key:
-                    val = kvp.value
-                    val = val.decode()
+                    val = _decode_value(kvp.value)
                 break
             except TTransport.TTransportException as exc:
                 print("[DataLayerClient] Reconnecting because of failed getMapEntry: " + str(exc))
@@ -224,6 +958,25 @@ class DataLayerClient:
 
         return val
 
+    def getMapEntries(self, mapname, keys):
+        # all entries in a single round trip; returns the existing (key, value) pairs
+        key_value_map = {}
+        for retry in range(MAX_RETRIES):
+            try:
+                kvps = self.datalayer.getEntriesFromMap(self.keyspace, self.maptablename, mapname, list(keys), self.locality)
+                for kvp in kvps:
+                    if kvp.key != "":
+                        key_value_map[kvp.key] = _decode_value(kvp.value)
+                break
+            except TTransport.TTransportException as exc:
+                print("[DataLayerClient] Reconnecting because of failed getMapEntries: " + str(exc))
+                self.connect()
+            except Exception as exc:
+                print("[DataLayerClient] failed getMapEntries: " + str(exc))
+                raise
+
+        return key_value_map
+
     def deleteMapEntry(self, mapname, key):
         status = False
         for retry in range(MAX_RETRIES):
@@ -238,6 +991,21 @@ class DataLayerClient:
                 raise
         return status
 
+    def deleteMapEntries(self, mapname, keys):
+        # all entries in a single round trip
+        status = False
+        for retry in range(MAX_RETRIES):
+            try:
+                status = self.datalayer.removeEntriesFromMap(self.keyspace, self.maptablename, mapname, list(keys), self.locality)
+                break
+            except TTransport.TTransportException as exc:
+                print("[DataLayerClient] Reconnecting because of failed deleteMapEntries: " + str(exc))
+                self.connect()
+            except Exception as exc:
+                print("[DataLayerClient] failed deleteMapEntries: " + str(exc))
+                raise
+        return status
+
     def containsMapKey(self, mapname, key):
         ret = False
         for retry in range(MAX_RETRIES):
@@ -270,15 +1038,16 @@ class DataLayerClient:
 
         return keys
 
-    def retrieveMap(self, mapname):
+    def retrieveMap(self, mapname, locality=None):
         mapentries = None
+        loc = self.locality if locality is None else locality
         for retry in range(MAX_RETRIES):
             try:
-                mapentries = self.datalayer.retrieveAllEntriesFromMap(self.keyspace, self.maptablename, mapname, self.locality)
+                mapentries = self.datalayer.retrieveAllEntriesFromMap(self.keyspace, self.maptablename, mapname, loc)
                 if mapentries.key != "" and mapentries.key == mapname:
                     mapentries = mapentries.entries
                     for key in mapentries:
-                        mapentries[key] = mapentries[key].decode()
+                        mapentries[key] = _decode_value(mapentries[key])
                 break
             except TTransport.TTransportException as exc:
                 print("[DataLayerClient] Reconnecting because of failed retrieveMap: " + str(exc))
@@ -289,6 +1058,16 @@ class DataLayerClient:
 
         return mapentries
 
+    def iter_map(self, mapname, page_size=ITER_PAGE_SIZE, locality=None):
+        '''
+        Iterate over the (key, value) pairs of a map in the order of the keys,
+        fetching page_size entries at a time instead of the whole map (see retrieveMap()).
+        '''
+        loc = self.locality if locality is None else locality
+        for page in self._iterate_pages("retrieveMapPage", (self.keyspace, self.maptablename, mapname), page_size, loc):
+            for entry in page.entries:
+                yield entry.key, _decode_value(entry.value)
+
     def clearMap(self, mapname):
         status = False
         for retry in range(MAX_RETRIES):
@@ -303,11 +1082,12 @@ class DataLayerClient:
                 raise
         return status
 
-    def deleteMap(self, mapname):
+    def deleteMap(self, mapname, locality=None):
         status = False
+        loc = self.locality if locality is None else locality
         for retry in range(MAX_RETRIES):
             try:
-                status = self.datalayer.deleteMap(self.keyspace, self.maptablename, mapname, self.locality)
+                status = self.datalayer.deleteMap(self.keyspace, self.maptablename, mapname, loc)
                 break
             except TTransport.TTransportException as exc:
                 print("[DataLayerClient] Reconnecting because of failed deleteMap: " + str(exc))
@@ -392,7 +1172,7 @@ class DataLayerClient:
         items = None
         for retry in range(MAX_RETRIES):
             try:
-                itemsset = self.datalayer.retrieveSet(self.keyspace, self.settablename, setname, self.locality)
+                itemsset = self._hedged_read("retrieveSet", self.keyspace, self.settablename, setname, self.locality)
                 if itemsset.key != "" and itemsset.key == setname:
                     items = itemsset.items
                 break
@@ -405,6 +1185,15 @@ class DataLayerClient:
 
         return items
 
+    def iter_set(self, setname, page_size=ITER_PAGE_SIZE):
+        '''
+        Iterate over the items of a set in sorted order,
+        fetching page_size items at a time instead of the whole set (see retrieveSet()).
+        '''
+        for page in self._iterate_pages("retrieveSetPage", (self.keyspace, self.settablename, setname), page_size, self.locality):
+            for item in page.keys:
+                yield item
+
     def clearSet(self, setname):
         status = False
         for retry in range(MAX_RETRIES):
@@ -558,9 +1347,10 @@ class DataLayerClient:
         return status
 
     def shutdown(self):
-        try:
-            self.transport.close()
-        except Thrift.TException as exc:
-            print(str(exc))
-        finally:
-            self.transport.close()
+        if self._connection is None:
+            return
+        if self._pooled:
+            _connection_pool.release(self._connection)
+        else:
+            self._connection.close()
+        self._connection = None
@@ -12,20 +12,53 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
-from DataLayerClient import DataLayerClient
+import socket
+import threading
+
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from ControlEvents import publish_control_event
+from DataLayerCache import DataLayerCache, get_cache_key
+from DataLayerClient import DataLayerClient, ITER_PAGE_SIZE
+
+# the maximum number of concurrent asynchronous operations of a function instance
+# (i.e., threads, each with its own data layer connection)
+ASYNC_MAX_WORKERS = 4
 
 class DataLayerOperator:
 
-    def __init__(self, suid, sid, wid, datalayer):
+    def __init__(self, suid, sid, wid, datalayer, cache_config=None, deadline=None, hedge_connect=None):
         self._storage_userid = suid
         self._sandboxid = sid
         self._workflowid = wid
         self._datalayer = datalayer
+        # the calls of the global data layer clients need to finish within the execution budget of the instance
+        self._deadline = deadline
+        # the alternative data layer servers for the hedged reads (see DataLayerClient)
+        self._hedge_connect = hedge_connect
+
+        # read-through cache in the local data layer for the tables listed in the workflow's cache configuration
+        # writes from this sandbox update the cache, which is shared by its function workers;
+        # the other sandboxes invalidate their entries upon a single control event per instance
+        self._cache = None
+        if cache_config is not None and cache_config.get("tables"):
+            self._cache = DataLayerCache(sid, datalayer, cache_config)
+        self._invalidated_cache_keys = set()
+        self._invalidated_cache_groups = set()
 
         # global data layer clients for either workflow-private data or user storage
         self._data_layer_client = None
         self._data_layer_client_private = None
 
+        # the asynchronous operations (e.g., put_async()) run on a small thread pool of the instance
+        # a data layer client cannot be shared by threads, so that the other threads get their own
+        self._owner_thread = threading.current_thread()
+        self._async_executor = None
+        self._async_futures = []
+        self._thread_local = threading.local()
+        self._thread_data_layer_clients = []
+        self._thread_data_layer_clients_lock = threading.Lock()
+
         # TODO (?): use the local data layer for operations regarding KV, maps, sets and counters instead of in-memory data structures (e.g., transient_data_output)
         # and store the operations/data for is_queued = True operations,
         # so that we can synchronize it with the global data layer
@@ -36,14 +69,19 @@ class DataLayerOperator:
         self.data_to_be_deleted = {}
         self.data_to_be_deleted_private = {}
 
-        self.map_output = {}
-        self.set_output = {}
-        self.counter_output = {}
-
-        self.map_output_delete = {}
-        self.set_output_delete = {}
-        self.counter_output_delete = {}
+        # in-memory overlays of the queued map, set and counter operations (i.e., is_queued = True)
+        # per is_private and name; the reads apply them on top of the data layer (i.e., "read your writes")
+        # maps: {"entries": {key: value}, "deleted": set of keys, "created": bool, "cleared": bool}
+        self.map_output = {False: {}, True: {}}
+        # sets: {"added": set of items, "removed": set of items, "created": bool, "cleared": bool}
+        self.set_output = {False: {}, True: {}}
+        # counters: {"count": initial count or None, "delta": the sum of the increments and decrements}
+        self.counter_output = {False: {}, True: {}}
 
+        # the names of the maps, sets and counters deleted with queued operations
+        self.map_output_delete = {False: set(), True: set()}
+        self.set_output_delete = {False: set(), True: set()}
+        self.counter_output_delete = {False: set(), True: set()}
 
     # TODO: update to use local data layer for (key, value) operations
     def put(self, key, value, is_private=False, is_queued=False, table=None):
@@ -59,6 +97,7 @@ class DataLayerOperator:
         else:
             data_layer_client = self._get_data_layer_client(is_private)
             data_layer_client.put(key, value, tableName=table)
+            self._update_cache(self._get_cache_key("kv", is_private, table, key), value)
 
     def get(self, key, is_private=False, table=None):
         # check first transient_output
@@ -78,9 +117,18 @@ class DataLayerOperator:
             value = self.transient_data_output.get(key)
 
         if value is None:
+            cache_key = self._get_cache_key("kv", is_private, table, key)
+            if cache_key is not None:
+                is_hit, value = self._cache.get(cache_key)
+                if is_hit:
+                    return value
+
             data_layer_client = self._get_data_layer_client(is_private)
             value = data_layer_client.get(key, tableName=table)
 
+            if cache_key is not None and value is not None:
+                self._cache.put(cache_key, value)
+
         return value
 
     def delete(self, key, is_private=False, is_queued=False, table=None):
@@ -94,47 +142,209 @@ class DataLayerOperator:
         else:
             data_layer_client = self._get_data_layer_client(is_private)
             data_layer_client.delete(key, tableName=table)
+            self._invalidate_cache(self._get_cache_key("kv", is_private, table, key))
+
+    # bulk (key, value) operations, each with a single round trip to the data layer
+    def multi_put(self, key_value_map, is_private=False, is_queued=False, table=None):
+        if is_queued:
+            for key in key_value_map:
+                self.put(key, key_value_map[key], is_private, is_queued=True)
+        else:
+            data_layer_client = self._get_data_layer_client(is_private)
+            data_layer_client.putMultiple(key_value_map, tableName=table)
+            for key in key_value_map:
+                self._update_cache(self._get_cache_key("kv", is_private, table, key), key_value_map[key])
+
+    def multi_get(self, keys, is_private=False, table=None):
+        values = {}
+
+        # check first transient_output and the cache, as in get()
+        if is_private:
+            transient_data_output = self.transient_data_output_private
+            data_to_be_deleted = self.data_to_be_deleted_private
+        else:
+            transient_data_output = self.transient_data_output
+            data_to_be_deleted = self.data_to_be_deleted
+
+        remaining_keys = []
+        for key in keys:
+            if key in data_to_be_deleted:
+                continue
+            if key in transient_data_output:
+                values[key] = transient_data_output[key]
+                continue
+            cache_key = self._get_cache_key("kv", is_private, table, key)
+            if cache_key is not None:
+                is_hit, value = self._cache.get(cache_key)
+                if is_hit:
+                    values[key] = value
+                    continue
+            remaining_keys.append(key)
+
+        if remaining_keys:
+            data_layer_client = self._get_data_layer_client(is_private)
+            remaining_values = data_layer_client.getMultiple(remaining_keys, tableName=table)
+            for key in remaining_values:
+                cache_key = self._get_cache_key("kv", is_private, table, key)
+                if cache_key is not None:
+                    self._cache.put(cache_key, remaining_values[key])
+            values.update(remaining_values)
+
+        return values
+
+    def multi_delete(self, keys, is_private=False, is_queued=False, table=None):
+        if is_queued:
+            for key in keys:
+                self.delete(key, is_private, is_queued=True)
+        else:
+            data_layer_client = self._get_data_layer_client(is_private)
+            data_layer_client.deleteMultiple(keys, tableName=table)
+            for key in keys:
+                self._invalidate_cache(self._get_cache_key("kv", is_private, table, key))
+
+    def iter_keys(self, prefix="", page_size=ITER_PAGE_SIZE, is_private=False, table=None):
+        # "read your writes": the queued operations are committed to the default table
+        written = set()
+        deleted = set()
+        if table is None:
+            transient_data_output = self.transient_data_output_private if is_private else self.transient_data_output
+            data_to_be_deleted = self.data_to_be_deleted_private if is_private else self.data_to_be_deleted
+            written = set(key for key in transient_data_output if key.startswith(prefix))
+            deleted = set(data_to_be_deleted)
+
+        dlc = self._get_data_layer_client(is_private)
+        for key in dlc.iter_keys(prefix, page_size, tableName=table):
+            if key in deleted:
+                continue
+            written.discard(key)
+            yield key
+
+        for key in sorted(written):
+            yield key
 
     # map operations
+    def _get_queued_map(self, mapname, is_private):
+        queued_map = self.map_output[is_private].get(mapname)
+        if queued_map is None:
+            queued_map = {"entries": {}, "deleted": set(), "created": False, "cleared": False}
+            self.map_output[is_private][mapname] = queued_map
+        return queued_map
+
     def createMap(self, mapname, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            self._get_queued_map(mapname, is_private)["created"] = True
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.createMap(mapname)
 
     def putMapEntry(self, mapname, key, value, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            queued_map = self._get_queued_map(mapname, is_private)
+            queued_map["entries"][key] = value
+            queued_map["deleted"].discard(key)
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.putMapEntry(mapname, key, value)
+            self._update_cache(self._get_cache_key("map", is_private, None, mapname, key), value, self._get_cache_key("map", is_private, None, mapname))
 
     def getMapEntry(self, mapname, key, is_private=False):
         value = None
 
-        # TODO: check transient data structure first
+        queued_map = self.map_output[is_private].get(mapname)
+        if queued_map is not None:
+            if key in queued_map["entries"]:
+                return queued_map["entries"][key]
+            if key in queued_map["deleted"] or queued_map["cleared"]:
+                return None
 
         if value is None:
+            cache_key = self._get_cache_key("map", is_private, None, mapname, key)
+            cache_group = self._get_cache_key("map", is_private, None, mapname)
+            if cache_key is not None:
+                is_hit, value = self._cache.get(cache_key, cache_group)
+                if is_hit:
+                    return value
+
             dlc = self._get_data_layer_client(is_private)
             value = dlc.getMapEntry(mapname, key)
 
+            if cache_key is not None and value is not None:
+                self._cache.put(cache_key, value, cache_group)
+
         return value
 
     def deleteMapEntry(self, mapname, key, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            queued_map = self._get_queued_map(mapname, is_private)
+            queued_map["entries"].pop(key, None)
+            queued_map["deleted"].add(key)
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.deleteMapEntry(mapname, key)
+            self._invalidate_cache(self._get_cache_key("map", is_private, None, mapname, key))
+
+    def multi_putMapEntries(self, mapname, key_value_map, is_private=False, is_queued=False):
+        if is_queued:
+            for key in key_value_map:
+                self.putMapEntry(mapname, key, key_value_map[key], is_private, is_queued=True)
+        else:
+            dlc = self._get_data_layer_client(is_private)
+            dlc.putMapEntries(mapname, key_value_map)
+            cache_group = self._get_cache_key("map", is_private, None, mapname)
+            for key in key_value_map:
+                self._update_cache(self._get_cache_key("map", is_private, None, mapname, key), key_value_map[key], cache_group)
+
+    def multi_getMapEntries(self, mapname, keys, is_private=False):
+        values = {}
+
+        queued_map = self.map_output[is_private].get(mapname)
+        cache_group = self._get_cache_key("map", is_private, None, mapname)
+        remaining_keys = []
+        for key in keys:
+            if queued_map is not None:
+                if key in queued_map["entries"]:
+                    values[key] = queued_map["entries"][key]
+                    continue
+                if key in queued_map["deleted"] or queued_map["cleared"]:
+                    continue
+            cache_key = self._get_cache_key("map", is_private, None, mapname, key)
+            if cache_key is not None:
+                is_hit, value = self._cache.get(cache_key, cache_group)
+                if is_hit:
+                    values[key] = value
+                    continue
+            remaining_keys.append(key)
+
+        if remaining_keys:
+            dlc = self._get_data_layer_client(is_private)
+            remaining_values = dlc.getMapEntries(mapname, remaining_keys)
+            for key in remaining_values:
+                cache_key = self._get_cache_key("map", is_private, None, mapname, key)
+                if cache_key is not None:
+                    self._cache.put(cache_key, remaining_values[key], cache_group)
+            values.update(remaining_values)
+
+        return values
+
+    def multi_deleteMapEntries(self, mapname, keys, is_private=False, is_queued=False):
+        if is_queued:
+            for key in keys:
+                self.deleteMapEntry(mapname, key, is_private, is_queued=True)
+        else:
+            dlc = self._get_data_layer_client(is_private)
+            dlc.deleteMapEntries(mapname, keys)
+            for key in keys:
+                self._invalidate_cache(self._get_cache_key("map", is_private, None, mapname, key))
 
     def containsMapKey(self, mapname, key, is_private=False):
         ret = False
 
-        # TODO: check transient data structure first
+        queued_map = self.map_output[is_private].get(mapname)
+        if queued_map is not None:
+            if key in queued_map["entries"]:
+                return True
+            if key in queued_map["deleted"] or queued_map["cleared"]:
+                return False
 
         if not ret:
             dlc = self._get_data_layer_client(is_private)
@@ -150,15 +360,22 @@ class DataLayerOperator:
         # 1. all created locally
         # 2. all existing globally minus the ones deleted locally
 
-        # TODO: 1. check local data layer first: get locally created and deleted
+        # 1. check the queued operations first: get locally created and deleted
+        queued_map = self.map_output[is_private].get(mapname)
 
         # 2. retrieve all existing globally
-        dlc = self._get_data_layer_client(is_private)
-        retmap2 = dlc.retrieveMap(mapname)
-        if retmap2 is not None:
-            for k in retmap2:
-                retmap[k] = retmap2[k]
-            # TODO: 3. remove the ones deleted locally
+        if queued_map is None or not queued_map["cleared"]:
+            dlc = self._get_data_layer_client(is_private)
+            retmap2 = dlc.retrieveMap(mapname)
+            if retmap2 is not None:
+                for k in retmap2:
+                    retmap[k] = retmap2[k]
+
+        # 3. remove the ones deleted locally
+        if queued_map is not None:
+            for k in queued_map["deleted"]:
+                retmap.pop(k, None)
+            retmap.update(queued_map["entries"])
 
         return retmap
 
@@ -170,32 +387,66 @@ class DataLayerOperator:
         # 1. all created locally
         # 2. all existing globally minus the ones deleted locally
 
-        # TODO: 1. check local data layer first: get locally created and deleted
+        # 1. check the queued operations first: get locally created and deleted
+        queued_map = self.map_output[is_private].get(mapname)
 
         # 2. retrieve all existing globally
-        dlc = self._get_data_layer_client(is_private)
-        k2 = dlc.getMapKeys(mapname)
-        if k2 is not None:
-            # TODO: 3. remove the ones deleted locally
-            keys = keys.union(k2)
+        if queued_map is None or not queued_map["cleared"]:
+            dlc = self._get_data_layer_client(is_private)
+            k2 = dlc.getMapKeys(mapname)
+            if k2 is not None:
+                keys = keys.union(k2)
+
+        # 3. remove the ones deleted locally
+        if queued_map is not None:
+            keys = keys.difference(queued_map["deleted"]).union(queued_map["entries"].keys())
 
         return keys
 
+    def iter_map(self, mapname, page_size=ITER_PAGE_SIZE, is_private=False):
+        # "read your writes" as in retrieveMap(), without retrieving the whole map at once;
+        # the queued entries that are not in the global map come last
+        entries = {}
+        deleted = set()
+        cleared = False
+        queued_map = self.map_output[is_private].get(mapname)
+        if queued_map is not None:
+            entries = dict(queued_map["entries"])
+            deleted = set(queued_map["deleted"])
+            cleared = queued_map["cleared"]
+
+        if not cleared:
+            dlc = self._get_data_layer_client(is_private)
+            for key, value in dlc.iter_map(mapname, page_size):
+                if key in deleted:
+                    continue
+                if key in entries:
+                    value = entries.pop(key)
+                yield key, value
+
+        for key in sorted(entries):
+            yield key, entries[key]
+
     def clearMap(self, mapname, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            queued_map = self._get_queued_map(mapname, is_private)
+            queued_map["entries"].clear()
+            queued_map["deleted"].clear()
+            queued_map["cleared"] = True
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.clearMap(mapname)
+            self._invalidate_cache_group(self._get_cache_key("map", is_private, None, mapname))
 
     def deleteMap(self, mapname, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            self.map_output_delete[is_private].add(mapname)
+            # later queued operations start from an empty map
+            self.map_output[is_private][mapname] = {"entries": {}, "deleted": set(), "created": False, "cleared": True}
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.deleteMap(mapname)
+            self._invalidate_cache_group(self._get_cache_key("map", is_private, None, mapname))
 
     def getMapNames(self, start_index=0, end_index=2147483647, is_private=False):
         maps = set()
@@ -205,48 +456,70 @@ class DataLayerOperator:
         # 1. all created locally
         # 2. all existing globally minus the ones deleted locally
 
-        # TODO: 1. check local data layer first: get locally created and deleted
+        # 1. check the queued operations first: get locally created and deleted
+        created, deleted = self._get_queued_names(self.map_output[is_private], self.map_output_delete[is_private], "entries")
 
         # 2. retrieve all existing globally
         dlc = self._get_data_layer_client(is_private)
         m2 = dlc.getMapNames(start_index, end_index)
         if m2 is not None:
-            # TODO: 3. remove the ones deleted locally
             maps = maps.union(m2)
 
+        # 3. remove the ones deleted locally
+        maps = maps.difference(deleted).union(created)
+
         return list(maps)
 
     # set operations
+    def _get_queued_set(self, setname, is_private):
+        queued_set = self.set_output[is_private].get(setname)
+        if queued_set is None:
+            queued_set = {"added": set(), "removed": set(), "created": False, "cleared": False}
+            self.set_output[is_private][setname] = queued_set
+        return queued_set
+
     def createSet(self, setname, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            self._get_queued_set(setname, is_private)["created"] = True
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.createSet(setname)
 
     def addSetEntry(self, setname, item, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            queued_set = self._get_queued_set(setname, is_private)
+            queued_set["added"].add(item)
+            queued_set["removed"].discard(item)
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.addSetEntry(setname, item)
+            self._invalidate_cache(self._get_cache_key("set", is_private, None, setname))
 
     def removeSetEntry(self, setname, item, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            queued_set = self._get_queued_set(setname, is_private)
+            queued_set["added"].discard(item)
+            queued_set["removed"].add(item)
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.removeSetEntry(setname, item)
+            self._invalidate_cache(self._get_cache_key("set", is_private, None, setname))
 
     def containsSetItem(self, setname, item, is_private=False):
         ret = False
 
-        # TODO: check transient data structure first
+        queued_set = self.set_output[is_private].get(setname)
+        if queued_set is not None:
+            if item in queued_set["added"]:
+                return True
+            if item in queued_set["removed"] or queued_set["cleared"]:
+                return False
 
         if not ret:
+            # a cached set is retrieved as a whole, so that all items can be checked in the cache
+            if self._get_cache_key("set", is_private, None, setname) is not None:
+                return item in self.retrieveSet(setname, is_private)
+
             dlc = self._get_data_layer_client(is_private)
             ret = dlc.containsSetItem(setname, item)
 
@@ -260,32 +533,77 @@ class DataLayerOperator:
         # 1. all created locally
         # 2. all existing globally minus the ones deleted locally
 
-        # TODO: 1. check local data layer first: get locally created and deleted
+        # 1. check the queued operations first: get locally created and deleted
+        queued_set = self.set_output[is_private].get(setname)
 
         # 2. retrieve all existing globally
+        if queued_set is None or not queued_set["cleared"]:
+            items = items.union(self._retrieve_global_set(setname, is_private))
+
+        # 3. remove the ones deleted locally
+        if queued_set is not None:
+            items = items.difference(queued_set["removed"]).union(queued_set["added"])
+
+        return items
+
+    def _retrieve_global_set(self, setname, is_private):
+        cache_key = self._get_cache_key("set", is_private, None, setname)
+        if cache_key is not None:
+            is_hit, cached_items = self._cache.get(cache_key)
+            if is_hit:
+                return set(cached_items)
+
         dlc = self._get_data_layer_client(is_private)
         i2 = dlc.retrieveSet(setname)
-        if i2 is not None:
-            # TODO: 3. remove the ones deleted locally
-            items = items.union(i2)
+        if cache_key is not None and i2 is not None:
+            self._cache.put(cache_key, list(i2))
+        if i2 is None:
+            return set()
+        return set(i2)
+
+    def iter_set(self, setname, page_size=ITER_PAGE_SIZE, is_private=False):
+        # "read your writes" as in retrieveSet(), without retrieving the whole set at once;
+        # the queued items that are not in the global set come last
+        added = set()
+        removed = set()
+        cleared = False
+        queued_set = self.set_output[is_private].get(setname)
+        if queued_set is not None:
+            added = set(queued_set["added"])
+            removed = set(queued_set["removed"])
+            cleared = queued_set["cleared"]
+
+        if not cleared:
+            dlc = self._get_data_layer_client(is_private)
+            for item in dlc.iter_set(setname, page_size):
+                if item in removed:
+                    continue
+                added.discard(item)
+                yield item
 
-        return items
+        for item in sorted(added):
+            yield item
 
     def clearSet(self, setname, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            queued_set = self._get_queued_set(setname, is_private)
+            queued_set["added"].clear()
+            queued_set["removed"].clear()
+            queued_set["cleared"] = True
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.clearSet(setname)
+            self._invalidate_cache(self._get_cache_key("set", is_private, None, setname))
 
     def deleteSet(self, setname, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            self.set_output_delete[is_private].add(setname)
+            # later queued operations start from an empty set
+            self.set_output[is_private][setname] = {"added": set(), "removed": set(), "created": False, "cleared": True}
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.deleteSet(setname)
+            self._invalidate_cache(self._get_cache_key("set", is_private, None, setname))
 
     def getSetNames(self, start_index=0, end_index=2147483647, is_private=False):
         sets = set()
@@ -295,22 +613,24 @@ class DataLayerOperator:
         # 1. all created locally
         # 2. all existing globally minus the ones deleted locally
 
-        # TODO: 1. check local data layer first: get locally created and deleted
+        # 1. check the queued operations first: get locally created and deleted
+        created, deleted = self._get_queued_names(self.set_output[is_private], self.set_output_delete[is_private], "added")
 
         # 2. retrieve all existing globally
         dlc = self._get_data_layer_client(is_private)
         s2 = dlc.getSetNames(start_index, end_index)
         if s2 is not None:
-            # TODO: 3. remove the ones deleted locally
             sets = sets.union(s2)
 
+        # 3. remove the ones deleted locally
+        sets = sets.difference(deleted).union(created)
+
         return list(sets)
 
     # counter operations
     def createCounter(self, countername, count, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            self.counter_output[is_private][countername] = {"count": count, "delta": 0}
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.createCounter(countername, count)
@@ -318,33 +638,46 @@ class DataLayerOperator:
     def getCounterValue(self, countername, is_private=False):
         value = 0
 
-        # TODO: check transient data structure first and apply any changes to the global value
+        # check the queued operations first and apply any changes to the global value
+        queued_counter = self.counter_output[is_private].get(countername)
+        if queued_counter is not None and queued_counter["count"] is not None:
+            return queued_counter["count"] + queued_counter["delta"]
 
-        dlc = self._get_data_layer_client(is_private)
-        value = dlc.getCounter(countername)
+        if countername not in self.counter_output_delete[is_private]:
+            dlc = self._get_data_layer_client(is_private)
+            value = dlc.getCounter(countername)
+
+        if queued_counter is not None:
+            value += queued_counter["delta"]
 
         return value
 
+    def _get_queued_counter(self, countername, is_private):
+        queued_counter = self.counter_output[is_private].get(countername)
+        if queued_counter is None:
+            queued_counter = {"count": None, "delta": 0}
+            self.counter_output[is_private][countername] = queued_counter
+        return queued_counter
+
     def incrementCounter(self, countername, increment, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            # the increments of a counter are coalesced into a single update
+            self._get_queued_counter(countername, is_private)["delta"] += increment
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.incrementCounter(countername, increment)
 
     def decrementCounter(self, countername, decrement, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            self._get_queued_counter(countername, is_private)["delta"] -= decrement
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.decrementCounter(countername, decrement)
 
     def deleteCounter(self, countername, is_private=False, is_queued=False):
         if is_queued:
-            # TODO: use transient data structure in memory when the operation is queued
-            pass
+            self.counter_output_delete[is_private].add(countername)
+            self.counter_output[is_private].pop(countername, None)
         else:
             dlc = self._get_data_layer_client(is_private)
             dlc.deleteCounter(countername)
@@ -357,15 +690,19 @@ class DataLayerOperator:
         # 1. all created locally
         # 2. all existing globally minus the ones deleted locally
 
-        # TODO: 1. check local data layer first: get locally created and deleted
+        # 1. check the queued operations first: get locally created and deleted
+        created = set(self.counter_output[is_private].keys())
+        deleted = self.counter_output_delete[is_private].difference(created)
 
         # 2. retrieve all existing globally
         dlc = self._get_data_layer_client(is_private)
         c2 = dlc.getCounterNames(start_index, end_index)
         if c2 is not None:
-            # TODO: 3. remove the ones deleted locally
             counters = counters.union(c2)
 
+        # 3. remove the ones deleted locally
+        counters = counters.difference(deleted).union(created)
+
         return list(counters)
 
     def get_transient_data_output(self, is_private=False):
@@ -388,22 +725,248 @@ class DataLayerOperator:
 
         return self.data_to_be_deleted
 
+    def _get_queued_names(self, queued_output, queued_deletes, items_name):
+        # the maps and sets that exist after the queued operations vs. the ones that have been deleted
+        created = set()
+        for name in queued_output:
+            if queued_output[name]["created"] or queued_output[name][items_name]:
+                created.add(name)
+        return created, queued_deletes.difference(created)
+
+    def _get_table_name(self, kind, is_private, table=None):
+        # the default table names of the DataLayerClient
+        if table is not None:
+            return table
+        if is_private:
+            return {"kv": "wf_", "map": "wf_maps_", "set": "wf_sets_"}[kind] + self._workflowid
+        return {"kv": "defaultTable", "map": "defaultMapTable", "set": "defaultSetTable"}[kind]
+
+    def _get_cache_key(self, kind, is_private, table, *names):
+        '''
+        Return the cache key of a data item, or None if its table is not cached.
+        '''
+        if self._cache is None:
+            return None
+        table = self._get_table_name(kind, is_private, table)
+        if not self._cache.is_cached_table(table):
+            return None
+        return get_cache_key(kind, is_private, table, names)
+
+    def _update_cache(self, cache_key, value, cache_group=None):
+        if cache_key is None:
+            return
+        self._cache.put(cache_key, value, cache_group)
+        self._invalidated_cache_keys.add(cache_key)
+
+    def _invalidate_cache(self, cache_key):
+        if cache_key is None:
+            return
+        self._cache.invalidate(cache_key)
+        self._invalidated_cache_keys.add(cache_key)
+
+    def _invalidate_cache_group(self, cache_group):
+        if cache_group is None:
+            return
+        self._cache.invalidate_group(cache_group)
+        self._invalidated_cache_groups.add(cache_group)
+
+    def _publish_cache_invalidations(self):
+        '''
+        Notify the other sandboxes of the workflow of the cached data items that have been written by the instance,
+        with a single control event (see ControlEvents), which their sandbox agents apply to their caches.
+        '''
+        if not self._invalidated_cache_keys and not self._invalidated_cache_groups:
+            return
+        invalidation = {}
+        invalidation["action"] = "invalidate-data-layer-cache"
+        invalidation["cacheKeys"] = list(self._invalidated_cache_keys)
+        invalidation["cacheGroups"] = list(self._invalidated_cache_groups)
+        # the cache of the sandbox that published the event is already up to date
+        invalidation["origin"] = socket.gethostname()
+        self._invalidated_cache_keys = set()
+        self._invalidated_cache_groups = set()
+
+        dlc = DataLayerClient(locality=1, for_mfn=True, sid=self._sandboxid, connect=self._datalayer, pooled=True)
+        try:
+            publish_control_event(dlc, invalidation)
+        finally:
+            dlc.shutdown()
+
+    def submit_async(self, function, *args, **kwargs):
+        '''
+        Run the operation on the instance's thread pool and return its future.
+        '''
+        if self._async_executor is None:
+            self._async_executor = ThreadPoolExecutor(max_workers=ASYNC_MAX_WORKERS)
+        if len(self._async_futures) >= 1024:
+            self._async_futures = [future for future in self._async_futures if not future.done()]
+        future = self._async_executor.submit(function, *args, **kwargs)
+        self._async_futures.append(future)
+        return future
+
+    def wait_for_async_operations(self):
+        '''
+        Wait for the pending asynchronous operations when the function instance finishes,
+        so that their effects are visible before its output is published.
+        Their exceptions are kept in their futures.
+        '''
+        if self._async_futures:
+            wait(self._async_futures)
+            self._async_futures = []
+
+        if self._async_executor is not None:
+            self._async_executor.shutdown(wait=True)
+            self._async_executor = None
+
+        self._publish_cache_invalidations()
+
+    def get_cache_stats(self):
+        if self._cache is None:
+            return None
+        return self._cache.get_stats()
+
+    def commit_queued_operations(self):
+        '''
+        Commit the queued operations (i.e., is_queued = True) to the data layer
+        when the function instance finishes.
+        '''
+        for is_private in [False, True]:
+            data_out = self.get_transient_data_output(is_private)
+            to_be_deleted = self.get_data_to_be_deleted(is_private)
+
+            if data_out:
+                self.multi_put(data_out, is_private)
+
+            if to_be_deleted:
+                self.multi_delete(list(to_be_deleted.keys()), is_private)
+
+            self._commit_queued_map_operations(is_private)
+            self._commit_queued_set_operations(is_private)
+            self._commit_queued_counter_operations(is_private)
+
+            data_out.clear()
+            to_be_deleted.clear()
+
+        self._publish_cache_invalidations()
+
+    def _commit_queued_map_operations(self, is_private):
+        queued_maps = self.map_output[is_private]
+        queued_deletes = self.map_output_delete[is_private]
+        if not queued_maps and not queued_deletes:
+            return
+
+        dlc = self._get_data_layer_client(is_private)
+        for mapname in queued_deletes:
+            self.deleteMap(mapname, is_private)
+
+        for mapname in queued_maps:
+            queued_map = queued_maps[mapname]
+            if queued_map["cleared"] and mapname not in queued_deletes:
+                self.clearMap(mapname, is_private)
+            if queued_map["created"]:
+                dlc.createMap(mapname)
+            if not queued_map["cleared"] and queued_map["deleted"]:
+                self.multi_deleteMapEntries(mapname, list(queued_map["deleted"]), is_private)
+            # all entries of a map in a single round trip
+            if queued_map["entries"]:
+                dlc.putMapEntries(mapname, queued_map["entries"])
+                cache_group = self._get_cache_key("map", is_private, None, mapname)
+                for key in queued_map["entries"]:
+                    self._update_cache(self._get_cache_key("map", is_private, None, mapname, key), queued_map["entries"][key], cache_group)
+
+        queued_maps.clear()
+        queued_deletes.clear()
+
+    def _commit_queued_set_operations(self, is_private):
+        queued_sets = self.set_output[is_private]
+        queued_deletes = self.set_output_delete[is_private]
+        if not queued_sets and not queued_deletes:
+            return
+
+        dlc = self._get_data_layer_client(is_private)
+        for setname in queued_deletes:
+            dlc.deleteSet(setname)
+
+        for setname in queued_sets:
+            queued_set = queued_sets[setname]
+            if queued_set["cleared"] and setname not in queued_deletes:
+                dlc.clearSet(setname)
+            if queued_set["created"]:
+                dlc.createSet(setname)
+            if not queued_set["cleared"]:
+                for item in queued_set["removed"]:
+                    dlc.removeSetEntry(setname, item)
+            for item in queued_set["added"]:
+                dlc.addSetEntry(setname, item)
+
+        # a cached set is invalidated once, instead of after each item
+        for setname in queued_deletes.union(queued_sets.keys()):
+            self._invalidate_cache(self._get_cache_key("set", is_private, None, setname))
+
+        queued_sets.clear()
+        queued_deletes.clear()
+
+    def _commit_queued_counter_operations(self, is_private):
+        queued_counters = self.counter_output[is_private]
+        queued_deletes = self.counter_output_delete[is_private]
+        if not queued_counters and not queued_deletes:
+            return
+
+        dlc = self._get_data_layer_client(is_private)
+        for countername in queued_deletes:
+            dlc.deleteCounter(countername)
+
+        for countername in queued_counters:
+            queued_counter = queued_counters[countername]
+            if queued_counter["count"] is not None:
+                dlc.createCounter(countername, queued_counter["count"] + queued_counter["delta"])
+            elif countername in queued_deletes:
+                # the updates after a delete start from 0, as in getCounterValue()
+                dlc.createCounter(countername, queued_counter["delta"])
+            elif queued_counter["delta"] > 0:
+                dlc.incrementCounter(countername, queued_counter["delta"])
+            elif queued_counter["delta"] < 0:
+                dlc.decrementCounter(countername, -queued_counter["delta"])
+
+        queued_counters.clear()
+        queued_deletes.clear()
+
     def _get_data_layer_client(self, is_private=False):
         '''
         Return the data layer client, so that it can be used to commit to the data layer
         when the function instance finishes.
         If it is not initialized yet, it will be initialized here.
         '''
-        # TODO: need also the locality information
+        if threading.current_thread() is not self._owner_thread:
+            return self._get_thread_data_layer_client(is_private)
+
         if is_private:
             if self._data_layer_client_private is None:
-                self._data_layer_client_private = DataLayerClient(locality=1, sid=self._sandboxid, wid=self._workflowid, is_wf_private=True, connect=self._datalayer)
+                self._data_layer_client_private = self._create_data_layer_client(is_private)
             return self._data_layer_client_private
 
         if self._data_layer_client is None:
-            self._data_layer_client = DataLayerClient(locality=1, suid=self._storage_userid, is_wf_private=False, connect=self._datalayer)
+            self._data_layer_client = self._create_data_layer_client(is_private)
         return self._data_layer_client
 
+    def _get_thread_data_layer_client(self, is_private):
+        clients = getattr(self._thread_local, "data_layer_clients", None)
+        if clients is None:
+            clients = {}
+            self._thread_local.data_layer_clients = clients
+
+        if is_private not in clients:
+            clients[is_private] = self._create_data_layer_client(is_private)
+            with self._thread_data_layer_clients_lock:
+                self._thread_data_layer_clients.append(clients[is_private])
+        return clients[is_private]
+
+    def _create_data_layer_client(self, is_private):
+        # TODO: need also the locality information
+        if is_private:
+            return DataLayerClient(locality=1, sid=self._sandboxid, wid=self._workflowid, is_wf_private=True, connect=self._datalayer, pooled=True, deadline=self._deadline, hedge_connect=self._hedge_connect)
+        return DataLayerClient(locality=1, suid=self._storage_userid, is_wf_private=False, connect=self._datalayer, pooled=True, deadline=self._deadline, hedge_connect=self._hedge_connect)
+
     def _shutdown_data_layer_client(self):
         '''
         Shut down the data layer client if it has been initialized
@@ -418,3 +981,12 @@ class DataLayerOperator:
             self._data_layer_client.shutdown()
             self._data_layer_client = None
 
+        with self._thread_data_layer_clients_lock:
+            for data_layer_client in self._thread_data_layer_clients:
+                data_layer_client.shutdown()
+            self._thread_data_layer_clients = []
+        self._thread_local = threading.local()
+
+        if self._cache is not None:
+            self._cache.shutdown()
+
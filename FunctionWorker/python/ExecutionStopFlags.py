@@ -0,0 +1,59 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import os
+import time
+
+# The set of stopped workflow executions in the sandbox, shared by all function workers and their instances
+# (including the already forked ones): each stopped execution is an empty marker file in shared memory.
+# Checking the flag is a stat() instead of a data layer round trip on every publish.
+STOP_FLAGS_FOLDER = "/dev/shm/mfn_execution_stop/"
+if not os.path.isdir("/dev/shm"):
+    STOP_FLAGS_FOLDER = "/tmp/mfn_execution_stop/"
+
+# the markers of stopped executions are evicted after this time (in seconds)
+STOP_FLAG_TTL = 3600.0
+
+def _get_marker_path(execution_id):
+    return STOP_FLAGS_FOLDER + execution_id.replace("/", "_")
+
+def set_execution_stopped(execution_id):
+    os.makedirs(STOP_FLAGS_FOLDER, exist_ok=True)
+    with open(_get_marker_path(execution_id), "w"):
+        pass
+
+def is_execution_stopped(execution_id):
+    return os.path.exists(_get_marker_path(execution_id))
+
+def evict_expired_stop_flags(ttl=STOP_FLAG_TTL):
+    '''
+    Removes the markers of the executions that have been stopped longer than ttl seconds ago.
+    Several function workers may evict concurrently.
+    '''
+    try:
+        marker_names = os.listdir(STOP_FLAGS_FOLDER)
+    except OSError:
+        return 0
+
+    num_evicted = 0
+    expiry = time.time() - ttl
+    for marker_name in marker_names:
+        marker_path = STOP_FLAGS_FOLDER + marker_name
+        try:
+            if os.path.getmtime(marker_path) < expiry:
+                os.remove(marker_path)
+                num_evicted += 1
+        except OSError:
+            pass
+    return num_evicted
@@ -12,18 +12,26 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
-from signal import signal, SIGCHLD, SIG_IGN, SIG_DFL
+from signal import signal, SIGCHLD, SIG_DFL
 import os
 import sys
 #import argparse
 import time
 import imp
 import json
+import gc
+import select
 import logging
 import socket
 import subprocess
 import shlex
+import multiprocessing
+import multiprocessing.connection
+import asyncio
+import concurrent.futures
+import threading
 #import hashlib
+from collections import deque
 from threading import Timer
 
 import thriftpy2
@@ -32,12 +40,14 @@ import thriftpy2
 
 from LocalQueueClient import LocalQueueClient
 from LocalQueueClientMessage import LocalQueueClientMessage
-#from DataLayerClient import DataLayerClient
+from DataLayerClient import DataLayerClient, get_latency_counters, get_compression_counters, set_compression_config, COUNTER_CALLS, COUNTER_TOTAL_MS, COUNTER_MAX_MS, COUNTER_ERRORS, COUNTER_HEDGED, COUNTER_HEDGE_WINS
+from ExecutionStopFlags import evict_expired_stop_flags, set_execution_stopped
 from MicroFunctionsLogWriter import MicroFunctionsLogWriter
 from MicroFunctionsAPI import MicroFunctionsAPI
 from StateUtils import StateUtils
 from SessionUtils import SessionUtils
 from PublicationUtils import PublicationUtils
+from LatencyHistogram import PhaseLatencyHistograms
 
 import py3utils
 
@@ -48,6 +58,9 @@ LOGGER_USERID = 'userid-unset'
 LOGGER_WORKFLOWNAME = 'workflow-name-unset'
 LOGGER_WORKFLOWID = 'workflow-id-unset'
 
+# per-thread logging context of the in-process (i.e., thread and asyncio) execution modes
+_INSTANCE_CONTEXT = threading.local()
+
 class LoggingFilter(logging.Filter):
     def filter(self, record):
         global LOGGER_HOSTNAME
@@ -59,7 +72,7 @@ class LoggingFilter(logging.Filter):
         record.timestamp = time.time()*1000000
         record.hostname = LOGGER_HOSTNAME
         record.containername = LOGGER_CONTAINERNAME
-        record.uuid = LOGGER_UUID
+        record.uuid = getattr(_INSTANCE_CONTEXT, "uuid", LOGGER_UUID)
         record.userid = LOGGER_USERID
         record.workflowname = LOGGER_WORKFLOWNAME
         record.workflowid = LOGGER_WORKFLOWID
@@ -69,9 +82,17 @@ class FunctionWorker:
 
     # TODO: scratch space for each function worker, possibly tmpfs path
     # each topic is defined as a function of (user, sandbox, workflow, function id). as a result, topic will identify the workflow.
-    def __init__(self, args_dict):
+    def __init__(self, args_dict, is_fused=False):
+        # a fused worker only executes instances inside the process of its previous function's worker
+        self._is_fused = is_fused
+
         self._POLL_MAX_NUM_MESSAGES = 500
         self._POLL_TIMEOUT = py3utils.ensure_long(10000)
+        # while all instances are busy: how long to wait for a free slot (in seconds) or a message (in milliseconds)
+        # before checking again, and how many messages to dequeue ahead to find the control messages (e.g., 'stop')
+        self._BUSY_WAIT_TIMEOUT = 0.1
+        self._BUSY_POLL_TIMEOUT = py3utils.ensure_long(100)
+        self._MAX_PENDING_MESSAGES = 64
 
         self._set_args(args_dict)
 
@@ -104,6 +125,17 @@ class FunctionWorker:
                     sys.stdout.flush()
                     os._exit(1)
 
+        # the next function fused with this one; its instances run right after ours in the same process
+        self._fused_worker = None
+        if self._fused_next_params is not None:
+            self._fused_worker = FunctionWorker(self._fused_next_params, is_fused=True)
+
+        # the instances report their timestamp maps to the worker via this pipe (see _report_instance_metrics())
+        self._metrics_pipe_w = None
+
+        if self._is_fused:
+            return
+
         # for retrieving new messages
         self.local_queue_client = LocalQueueClient(connect=self._queue)
 
@@ -114,7 +146,71 @@ class FunctionWorker:
         #self._map_name_key_pid = "KeyPidMap_" + self._hostname + "_" + self._function_topic.replace("-", "_").replace(".", "_")
         #self.local_data_layer_client = DataLayerClient(locality=0, sid=self._sandboxid, for_mfn=True, connect=self._datalayer)
 
-        signal(SIGCHLD, SIG_IGN)
+        # session functions are long-running and keep their own helper threads; always fork for them
+        if self._execution_mode != "fork" and self._is_session_function:
+            self._logger.info("[FunctionWorker] %s execution mode is not supported for session functions; using fork.", self._execution_mode)
+            self._execution_mode = "fork"
+
+        # the pool and in-process modes only run python task states; the other states and runtimes rely on per-instance processes
+        if self._execution_mode in ["pool", "thread", "asyncio"] and (self._function_runtime != "python 3.6" or not self._state_utils.isTaskState()):
+            self._logger.info("[FunctionWorker] %s execution mode is only supported for python task states; using fork.", self._execution_mode)
+            self._execution_mode = "fork"
+
+        # a fused instance changes the process' working directory and signal handlers
+        if self._execution_mode in ["thread", "asyncio"] and self._fused_worker is not None:
+            self._logger.info("[FunctionWorker] Fusion is not supported in %s execution mode; not fusing.", self._execution_mode)
+            self._fused_worker = None
+
+        # we keep track of the forked instances and reap them ourselves (see _reap_child_processes());
+        # in the in-process modes, the user code may also start (and wait for) its own child processes
+        signal(SIGCHLD, SIG_DFL)
+        if self._execution_mode in ["thread", "asyncio"]:
+            # the instances share the working directory of the worker
+            os.chdir(self._function_folder)
+
+        # pids of the forked instances (fork mode) or instance processes (pool mode) that have not been reaped yet
+        self._child_pids = set()
+
+        # worker pid -> connection; idle worker pids
+        self._pool_workers = {}
+        self._pool_idle = []
+
+        self._instance_executor = None
+        self._instance_slots = None
+        self._awaitable_handler = False
+        # asyncio mode: the maximum number of threads for the synchronous steps of the instances
+        self._MAX_ASYNCIO_STEP_THREADS = 8
+        self._event_loop = None
+        self._event_loop_thread = None
+        self._num_in_process = 0
+        self._num_in_process_lock = threading.Lock()
+
+        # instance statistics: currently running, peak running and dequeued, but not yet dispatched
+        self._num_peak_in_flight = 0
+        self._num_queued = 0
+        # the messages that have been dequeued while all instances were busy (see _get_and_handle_message())
+        self._pending_messages = deque()
+        self._STATS_LOG_INTERVAL = 60.0
+        self._last_stats_log_time = time.time()
+
+        # per state (i.e., including the fused ones) and per phase latency histograms of the instances
+        self._phase_histograms = PhaseLatencyHistograms()
+        self._phase_histograms_lock = threading.Lock()
+        # the data layer cache hits and misses of the instances
+        self._data_layer_cache_stats = {"hits": 0, "misses": 0}
+        # per data layer operation: [calls, total ms, max ms, errors, hedged, hedge wins] (see DataLayerClient)
+        self._data_layer_latency_counters = {}
+        # the compression counters of the data layer clients (see DataLayerCompressionStats)
+        self._data_layer_compression_counters = {}
+        self._METRICS_DUMP_INTERVAL = 10.0
+        self._last_metrics_dump_time = time.time()
+        self._metrics_filename = "/opt/mfn/logs/metrics_" + self._function_state_name + ".json"
+        self._metrics_buffer = b""
+        self._metrics_pipe_r, metrics_pipe_w = os.pipe()
+        os.set_blocking(self._metrics_pipe_r, False)
+        # an instance should rather drop its report than block when the pipe is full
+        os.set_blocking(metrics_pipe_w, False)
+        self._set_metrics_pipe(metrics_pipe_w)
 
         self._is_running = False
         #self._print_self()
@@ -157,6 +253,75 @@ class FunctionWorker:
 
         self._should_checkpoint = args["shouldcheckpoint"]
 
+        # whether to encapsulate the output in the binary message envelope instead of JSON
+        self._binary_envelope = False
+        if "binaryenvelope" in args:
+            self._binary_envelope = args["binaryenvelope"]
+
+        # the codec to encode the output with (see MessageCodecs)
+        self._codec = None
+        if "codec" in args:
+            self._codec = args["codec"]
+
+        # outputs larger than this are passed by reference via the data layer (0: disabled)
+        self._payload_ref_threshold = 0
+        if "payloadrefthreshold" in args:
+            self._payload_ref_threshold = int(args["payloadrefthreshold"])
+
+        # whether to store the results of synchronous executions in the data layer
+        self._persist_sync_results = False
+        if "persistsyncresults" in args:
+            self._persist_sync_results = args["persistsyncresults"]
+
+        # the configuration of the read-through cache of data layer tables (None: disabled)
+        self._data_layer_cache_config = None
+        if "datalayercache" in args:
+            self._data_layer_cache_config = args["datalayercache"]
+
+        self._data_layer_hedge_connect = None
+        if "datalayerhedge" in args:
+            self._data_layer_hedge_connect = args["datalayerhedge"]
+
+        # the time (ms) an instance is allowed to run (None: no limit); session functions are long-running
+        self._execution_budget_ms = None
+        if "executionbudgetms" in args and not self._is_session_function:
+            self._execution_budget_ms = args["executionbudgetms"]
+
+        # the tables whose values are compressed by the data layer clients of this worker (None: disabled)
+        if "datalayercompression" in args:
+            set_compression_config(args["datalayercompression"])
+
+        # the local journal to append the checkpoints to, instead of writing them to the data layer (None: disabled)
+        self._checkpoint_journal = None
+        if "checkpointjournal" in args:
+            self._checkpoint_journal = args["checkpointjournal"]
+
+        self._fused_next_params = None
+        if "fusednext" in args:
+            self._fused_next_params = args["fusednext"]
+
+        self._execution_mode = "fork"
+        if "executionmode" in args:
+            self._execution_mode = args["executionmode"]
+        execution_mode_parameters = {}
+        if "executionmodeparameters" in args and args["executionmodeparameters"] is not None:
+            execution_mode_parameters = args["executionmodeparameters"]
+
+        # pool mode: number of long-lived instance processes and
+        # the number of instances after which such a process is replaced (0: never)
+        self._pool_size = int(execution_mode_parameters.get("pool_size", multiprocessing.cpu_count()))
+        if self._pool_size < 1:
+            self._pool_size = 1
+        self._pool_recycle_after = int(execution_mode_parameters.get("recycle_after", 0))
+
+        # fork mode: maximum number of concurrently running instances (0: unlimited)
+        self._max_in_flight = int(execution_mode_parameters.get("max_in_flight", 0))
+
+        # thread and asyncio modes: maximum number of concurrently running instances
+        self._concurrency_limit = int(execution_mode_parameters.get("concurrency_limit", 100))
+        if self._concurrency_limit < 1:
+            self._concurrency_limit = 1
+
     def _setup_loggers(self):
         global LOGGER_HOSTNAME
         global LOGGER_CONTAINERNAME
@@ -182,10 +347,15 @@ class FunctionWorker:
         hdlr.setFormatter(formatter)
         self._logger.addHandler(hdlr)
 
-        global print
-        print = self._logger.info
-        sys.stdout = MicroFunctionsLogWriter(self._logger, logging.INFO)
-        sys.stderr = MicroFunctionsLogWriter(self._logger, logging.ERROR)
+        self._stdout = MicroFunctionsLogWriter(self._logger, logging.INFO)
+        self._stderr = MicroFunctionsLogWriter(self._logger, logging.ERROR)
+
+        # a fused worker's user code output is redirected only during its instances (see _handle_fused_instance)
+        if not self._is_fused:
+            global print
+            print = self._logger.info
+            sys.stdout = self._stdout
+            sys.stderr = self._stderr
 
     #FOR_DEBUGGING_ONLY
     def _print_self(self):
@@ -227,335 +397,696 @@ class FunctionWorker:
             timestamp_map = {}
             timestamp_map["t_start_fork"] = time.time() * 1000.0
 
+            # don't fork any further instances while the limit is reached
+            while self._max_in_flight > 0 and len(self._child_pids) >= self._max_in_flight:
+                self._wait_for_free_slot()
+
             instance_pid = os.fork()
 
             if instance_pid == 0:
-                global LOGGER_UUID
-                LOGGER_UUID = key
+                # short-lived instance: a collection would only touch (and hence copy) the pages shared with the parent
+                # session functions may run for a long time, so keep collecting there
+                if not self._is_session_function:
+                    gc.disable()
+                if self._handle_instance(key, encapsulated_value, timestamp_map):
+                    os._exit(0)
+                os._exit(1)
 
-                #self._print_self()  #FOR_DEBUGGING_ONLY
-                #self._logger.debug("[FunctionWorker] fork_and_handle_message, After fork" + str(encapsulated_value))
+            else:
+                # parent
+                # keep track of the running instances; they are reaped in the main loop
+                self._child_pids.add(instance_pid)
+                self._update_peak_in_flight()
+                # TODO: remove child process ids in the host agent, when the 'fin' message is received
+                # store (key, pid) mapping to the data layer to keep track of function instances
+                # TODO: maybe store this information in a forked process,
+                # so that we don't bottleneck/fail the parent functionworker
+                # TODO: need some component to remove the finished (key, instance_pid) tuples
+                #self._logger.debug("[FunctionWorker] key: " + key + " -> " + str(instance_pid))
+                #self._logger.debug("State Output instance PID: " + str(instance_pid) + str(has_error))
+                #self.local_data_layer_client.putMapEntry(self._map_name_key_pid, key, str(instance_pid))
+                pass
 
-                has_error = False
-                error_type = ""
+        except Exception as exc:
+            if instance_pid == 0:
+                self._logger.exception("Child exception: %s", str(exc))
+                os._exit(1)
+            else:
+                self._logger.exception("Fork exception: %s", str(instance_pid))
+                self._logger.exception(str(exc))
+                sys.stdout.flush()
 
-                timestamp_map["t_start_pubutils"] = time.time() * 1000.0
-                # 0. Setup publication utils
-                if not has_error:
-                    try:
-                        publication_utils = PublicationUtils(self._sandboxid, self._workflowid, self._function_topic, self._function_runtime, self._wf_next, self._wf_pot_next, self._wf_local, self._wf_function_list, self._wf_exit, self._should_checkpoint, self._state_utils, self._logger, self._queue, self._datalayer)
-                    except Exception as exc:
-                        self._logger.exception("PublicationUtils exception: %s\n%s", str(instance_pid), str(exc))
-                        publication_utils = None
-                        error_type = "PublicationUtils exception"
-                        has_error = True
+    def _handle_instance(self, key, encapsulated_value, timestamp_map, local_queue_client=None, backup_data_layer_client=None, in_process=False, fused_input=None):
+        """
+        Handle a single message as a function instance.
+        Runs either in a freshly forked child (fork mode), in a long-lived instance process (pool mode)
+        or in a thread of the worker process itself (thread and asyncio modes, i.e., in_process).
+        The pool mode passes its own queue and data layer clients to be reused across instances.
+        A fused instance gets its already decoded input and metadata via fused_input instead of encapsulated_value.
+        Returns True if the output was published, False otherwise.
+        """
+        # without an awaitable handler, the steps run to completion without yielding
+        steps = self._instance_steps(key, encapsulated_value, timestamp_map, local_queue_client, backup_data_layer_client, in_process, fused_input)
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+        steps.close()
+        raise RuntimeError("Instance steps yielded without an awaitable handler")
 
-                # _XXX_: move the following check at the end of execution
-                # there we have to have the output backups, so the initialization of data layer client
-                # happens anyway.
-                # if there was an error, we'll simply not publish the output to the next function
-                # and stop the workflow execution there
-                '''
-                # check the workflow stop flag
-                # if some other function execution had an error and we had been
-                # simultaneously triggered, we don't need to continue execution
-                timestamp_map["t_start_backdatalayer"] = time.time() * 1000.0
-                if not has_error:
+    def _instance_steps(self, key, encapsulated_value, timestamp_map, local_queue_client=None, backup_data_layer_client=None, in_process=False, fused_input=None, awaitable_handler=False):
+        """
+        The steps of a function instance (see _handle_instance()) as a generator.
+        With awaitable_handler (asyncio mode), the coroutine of the 'async def' handler is yielded
+        and its result (or exception) is expected to be sent (or thrown) back in (see _handle_async_instance()).
+        """
+        global LOGGER_UUID
+        instance_pid = os.getpid()
+        state_utils = self._state_utils
+        if in_process or local_queue_client is not None:
+            # the process handles more than one instance (i.e., in-process modes, pool and fused instances),
+            # so that the state utils must not carry over any per-instance changes
+            state_utils = self._state_utils.get_instance_copy()
+        if not in_process:
+            # in the in-process modes, the instances share the worker process; the logging context is per thread
+            LOGGER_UUID = key
+
+        #self._print_self()  #FOR_DEBUGGING_ONLY
+        #self._logger.debug("[FunctionWorker] fork_and_handle_message, After fork" + str(encapsulated_value))
+
+        has_error = False
+        error_type = ""
+        # also passed on to a fused next function
+        raw_state_output = None
+
+        timestamp_map["t_start_pubutils"] = time.time() * 1000.0
+        # 0. Setup publication utils
+        if not has_error:
+            try:
+                fused_next_topic = None
+                if self._fused_worker is not None:
+                    fused_next_topic = self._fused_worker._function_topic
+                publication_utils = PublicationUtils(self._sandboxid, self._workflowid, self._function_topic, self._function_runtime, self._wf_next, self._wf_pot_next, self._wf_local, self._wf_function_list, self._wf_exit, self._should_checkpoint, state_utils, self._logger, self._queue, self._datalayer, local_queue_client, backup_data_layer_client, fused_next_topic, self._binary_envelope, self._codec, self._payload_ref_threshold, self._checkpoint_journal, self._persist_sync_results)
+            except Exception as exc:
+                self._logger.exception("PublicationUtils exception: %s\n%s", str(instance_pid), str(exc))
+                publication_utils = None
+                error_type = "PublicationUtils exception"
+                has_error = True
+
+        # _XXX_: move the following check at the end of execution
+        # there we have to have the output backups, so the initialization of data layer client
+        # happens anyway.
+        # if there was an error, we'll simply not publish the output to the next function
+        # and stop the workflow execution there
+        '''
+        # check the workflow stop flag
+        # if some other function execution had an error and we had been
+        # simultaneously triggered, we don't need to continue execution
+        timestamp_map["t_start_backdatalayer"] = time.time() * 1000.0
+        if not has_error:
+            try:
+                dlc_backup = publication_utils.get_backup_data_layer_client()
+                timestamp_map["t_start_backdatalayer_r"] = time.time() * 1000.0
+                workflow_exec_stop = dlc_backup.get("workflow_execution_stop_" + key)
+                if workflow_exec_stop is not None and workflow_exec_stop != "":
+                    self._logger.info("Not continuing because workflow execution has been stopped... %s", key)
+                    publication_utils.shutdown_backup_data_layer_client()
+                    os._exit(0)
+            except Exception as exc:
+                self._logger.exception("PublicationUtils data layer client exception: %s\n%s", str(instance_pid), str(exc))
+                publication_utils = None
+                error_type = "PublicationUtils data layer client exception"
+                has_error = True
+        '''
+        # Start of pre-processing
+
+        # 1. Decapsulate the input.
+        # The actual user input is encapsulated in a dict of the form {"__mfnuserdata": actual_user_input, "__mfnmetadata": mfn_specific_metadata}
+        # This encapsulation is invisible to the user and is added, maintained, and removed by the hostagent and functionworker.
+        #self._logger.debug("[FunctionWorker] Received encapsulated input:" + str(type(encapsulated_value)) + ":" + encapsulated_value)
+        timestamp_map["t_start_decapsulate"] = time.time() * 1000.0
+        if not has_error:
+            try:
+                if fused_input is not None:
+                    # fused with the previous function: the input is already decoded in memory
+                    raw_state_input, metadata = fused_input
+                else:
+                    value, metadata = publication_utils.decapsulate_input(encapsulated_value)
+                if "state_counter" not in metadata:
+                    metadata["state_counter"] = 1
+                else:
+                    metadata["state_counter"] += 1
+                #self._logger.debug("[FunctionWorker] fork_and_handle_message, metadata[state_counter]: " + str(metadata["state_counter"]))
+
+                #self._logger.debug("[FunctionWorker] Received state input:" + str(type(value)) + ":" + value)
+                #self._logger.debug("[FunctionWorker] Enclosed metadata:" + str(type(metadata)) + ":" + str(metadata))
+
+                # pass the metadata to the publication_utils, so that we can use it for sending immediate triggers
+                publication_utils.set_metadata(metadata)
+            except Exception as exc:
+                self._logger.exception("User input decapsulation error: %s\n%s", str(instance_pid), str(exc))
+                error_type = "User Input Decapsulation Error"
+                has_error = True
+
+        timestamp_map["t_start_chdir"] = time.time() * 1000.0
+        # in-process instances cannot change signal handlers and share the working directory,
+        # which is set once at startup
+        if not in_process:
+            signal(SIGCHLD, SIG_DFL)
+            if state_utils.isTaskState():
+                os.chdir(self._function_folder)
+
+        # 2. Decode input. Input (value) must be a valid JSON Text.
+        # Note: JSON Text is not the same as JSON string. JSON string a one variable type that can be contained inside a JSON Text.
+        # Double quote delimited strings are valid JSON Texts, representing JSON strings. Examples below:
+        # (variable 'value' refers is the input to fork_and_handle_message)
+        #
+        # value='abcdefghi'  is a python string, NOT a valid JSON Text (this will throw an error)
+        #
+        # value='"abcdefghi"' is a valid JSON Text representation of the string python 'abcdefghi'
+        #   user code will receive <type 'str'> or <type 'unicode'> as input
+        #
+        # value='{"x":1}'  is a JSON Text representation of <type 'dict'>.
+        #   user code will receive a <type 'dict'> as input
+        timestamp_map["t_start_decodeinput"] = time.time() * 1000.0
+        if not has_error and fused_input is None:
+            try:
+                raw_state_input = publication_utils.decode_input(value, metadata)
+                #self._logger.debug("[FunctionWorker] Decoded state input:" + str(type(raw_state_input)) + ":" + str(raw_state_input))
+            except Exception as exc:
+                self._logger.exception("State Input Decoding exception: %s\n%s", str(instance_pid), str(exc))
+                error_type = "State Input Decoding exception"
+                has_error = True
+
+        # 3. Apply InputPath, if available
+        timestamp_map["t_start_inputpath"] = time.time() * 1000.0
+        if not has_error:
+            try:
+                function_input = state_utils.applyInputPath(raw_state_input)
+                #self._logger.debug("[FunctionWorker] User code input(After InputPath processing):" + str(type(function_input)) + ":" + str(function_input))
+            except Exception as exc:
+                self._logger.exception("InputPath processing exception: %s\n%s", str(instance_pid), str(exc))
+                error_type = "InputPath processing exception"
+                has_error = True
+
+        # Start of function setup (i.e., session utils, MicroFunctionsAPI)
+
+        timestamp_map["t_start_sessutils"] = time.time() * 1000.0
+        # 4. Setup session related stuff here if necessary
+        session_utils = None
+        if not has_error:
+            # set up session related stuff here, if this is a session workflow/function
+            # do this after fork(), so that we don't bottleneck the parent
+            # 1. a session id
+            # 2. a session function instance id
+            # TODO: 3. other metadata (e.g., direct data pipe endpoints)
+            # 4. health check mechanism (e.g., a thread in session_utils?)
+            # 5. Telemetry can be handled by the function instance writing to the data layer, or sending out a message immediately
+            # (see MicroFunctionsAPI.send_to_running_function_in_session() with send_now = True)
+            if self._is_session_workflow:
+                # set a given session id if it is present in the incoming event
+                # for all messages coming to a session
+                session_id = None
+                if "sessionId" in function_input and function_input["sessionId"] != "" and function_input["sessionId"] is not None:
+                    session_id = function_input["sessionId"]
+                elif "session_id" in function_input and function_input["session_id"] != "" and function_input["session_id"] is not None:
+                    session_id = function_input["session_id"]
+
+                session_utils = SessionUtils(self._hostname, self._userid, self._sandboxid, self._workflowid, self._logger, self._function_state_name, self._function_topic, key, session_id, publication_utils, self._queue, self._datalayer, self._internal_endpoint)
+
+                if self._is_session_function:
                     try:
-                        dlc_backup = publication_utils.get_backup_data_layer_client()
-                        timestamp_map["t_start_backdatalayer_r"] = time.time() * 1000.0
-                        workflow_exec_stop = dlc_backup.get("workflow_execution_stop_" + key)
-                        if workflow_exec_stop is not None and workflow_exec_stop != "":
-                            self._logger.info("Not continuing because workflow execution has been stopped... %s", key)
-                            publication_utils.shutdown_backup_data_layer_client()
-                            os._exit(0)
+                        session_utils.setup_session_function(self._session_function_parameters)
                     except Exception as exc:
-                        self._logger.exception("PublicationUtils data layer client exception: %s\n%s", str(instance_pid), str(exc))
-                        publication_utils = None
-                        error_type = "PublicationUtils data layer client exception"
+                        self._logger.exception("Session function instantiation exception: %s\n%s", str(instance_pid), str(exc))
+                        error_type = "sessionFunctionId error"
                         has_error = True
-                '''
-                # Start of pre-processing
-
-                # 1. Decapsulate the input.
-                # The actual user input is encapsulated in a dict of the form {"__mfnuserdata": actual_user_input, "__mfnmetadata": mfn_specific_metadata}
-                # This encapsulation is invisible to the user and is added, maintained, and removed by the hostagent and functionworker.
-                #self._logger.debug("[FunctionWorker] Received encapsulated input:" + str(type(encapsulated_value)) + ":" + encapsulated_value)
-                timestamp_map["t_start_decapsulate"] = time.time() * 1000.0
-                if not has_error:
+
+        timestamp_map["t_start_sapi"] = time.time() * 1000.0
+        # 5. Setup the MicroFunctionsAPI object
+        sapi = None
+        if not has_error:
+            try:
+                # pass the SessionUtils object for API calls to send a message to other running functions?
+                # MicroFunctionsAPI object checks before sending a message (i.e., allow only if this is_session_workflow is True)
+                # Maybe allow only if the destination is a session function? Requires a list of session functions and passing them to the MicroFunctionsAPI and SessionUtils
+                # Nonetheless, currently, MicroFunctionsAPI and SessionUtils write warning messages to the workflow log to indicate such problems
+                # (e.g., when this is not a workflow session or session function, when the destination running function instance does not exist)
+                sapi = MicroFunctionsAPI(self._storage_userid, self._sandboxid, self._workflowid, self._function_state_name, key, publication_utils, self._is_session_workflow, self._is_session_function, session_utils, self._logger, self._datalayer, self._external_endpoint, self._internal_endpoint, self._userid, self._usertoken, self._data_layer_cache_config, self._data_layer_hedge_connect, self._execution_budget_ms)
+                # need this to retrieve and publish the in-memory, transient data (i.e., stored/deleted via is_queued = True)
+                publication_utils.set_sapi(sapi)
+            except Exception as exc:
+                self._logger.exception("MicroFunctionsAPI exception: %s\n%s", str(instance_pid), str(exc))
+                error_type = "MicroFunctionsAPI exception"
+                has_error = True
+
+        timestamp_map["t_start"] = time.time() * 1000.0
+        # todo add catch retry
+        #a = state_utils.get_retry_data()
+        #b = state_utils.get_catcher_data()
+        #self._logger.debug("CatchRetry Data: " + json.dumps(state_utils.get_retry_data()))
+        #self._logger.debug("CatchRetry Data2: " + str(type((state_utils.get_retry_data()))))
+        #retrydata = state_utils.get_retry_data()
+
+        # 6. Execute function
+        if not has_error:
+            #self._logger.debug("[FunctionWorker] Before isTaskState, query: " + str(state_utils.isTaskState()))
+            if self._function_runtime == "python 3.6":
+                if state_utils.isTaskState() and self.code:
+                    function_output = None
                     try:
-                        value, metadata = publication_utils.decapsulate_input(encapsulated_value)
-                        if "state_counter" not in metadata:
-                            metadata["state_counter"] = 1
+                        # TODO: acknowledgement for session function instance creation
+                        # if this is a session function, we'll keep running until the end of that function instance (e.g., session end)
+                        # need a way to 'acknowledge' that the session function instance is running, so that the host agent also knows
+                        # that the triggering message has indeed created a new instance
+                        # if we do not send such acknowledgement, the host agent will keep thinking it has not been handled (e.g., after a restart)
+                        # and will try to recreate the session function instance again (and again).
+                        exec_arguments = {}
+                        exec_arguments["function"] = self.code.handle
+                        exec_arguments["function_input"] = function_input
+                        if awaitable_handler:
+                            function_output = yield state_utils.exec_function_catch_retry_async(exec_arguments, sapi)
                         else:
-                            metadata["state_counter"] += 1
-                        #self._logger.debug("[FunctionWorker] fork_and_handle_message, metadata[state_counter]: " + str(metadata["state_counter"]))
-
-                        #self._logger.debug("[FunctionWorker] Received state input:" + str(type(value)) + ":" + value)
-                        #self._logger.debug("[FunctionWorker] Enclosed metadata:" + str(type(metadata)) + ":" + str(metadata))
-
-                        # pass the metadata to the publication_utils, so that we can use it for sending immediate triggers
-                        publication_utils.set_metadata(metadata)
+                            function_output = state_utils.exec_function_catch_retry(self._function_runtime, exec_arguments, sapi)
                     except Exception as exc:
-                        self._logger.exception("User input decapsulation error: %s\n%s", str(instance_pid), str(exc))
-                        error_type = "User Input Decapsulation Error"
+                        self._logger.exception("User code exception: %s\n%s", str(instance_pid), str(exc))
+                        sys.stdout.flush()
+                        error_type = "User code exception: " + str(exc.__class__.__name__)
                         has_error = True
 
-                timestamp_map["t_start_chdir"] = time.time() * 1000.0
-                signal(SIGCHLD, SIG_DFL)
-                if self._state_utils.isTaskState():
-                    os.chdir(self._function_folder)
-
-                # 2. Decode input. Input (value) must be a valid JSON Text.
-                # Note: JSON Text is not the same as JSON string. JSON string a one variable type that can be contained inside a JSON Text.
-                # Double quote delimited strings are valid JSON Texts, representing JSON strings. Examples below:
-                # (variable 'value' refers is the input to fork_and_handle_message)
-                #
-                # value='abcdefghi'  is a python string, NOT a valid JSON Text (this will throw an error)
-                #
-                # value='"abcdefghi"' is a valid JSON Text representation of the string python 'abcdefghi'
-                #   user code will receive <type 'str'> or <type 'unicode'> as input
-                #
-                # value='{"x":1}'  is a JSON Text representation of <type 'dict'>.
-                #   user code will receive a <type 'dict'> as input
-                timestamp_map["t_start_decodeinput"] = time.time() * 1000.0
-                if not has_error:
+                else:
+                    # Processing for Non 'Task' states
                     try:
-                        raw_state_input = publication_utils.decode_input(value)
-                        #self._logger.debug("[FunctionWorker] Decoded state input:" + str(type(raw_state_input)) + ":" + str(raw_state_input))
-                    except Exception as exc:
-                        self._logger.exception("State Input Decoding exception: %s\n%s", str(instance_pid), str(exc))
-                        error_type = "State Input Decoding exception"
-                        has_error = True
+                        self._logger.debug("[FunctionWorker] Before evaluateNonTaskState, input: " + str(function_input) + str(metadata))
+                        #TODO: catch-retry for non-task functions?
+                        function_output, metadata_updated = state_utils.evaluateNonTaskState(function_input, key, metadata, sapi)
+                        metadata = metadata_updated
+                        # update metadata in the publication utils
+                        publication_utils.set_metadata(metadata)
 
-                # 3. Apply InputPath, if available
-                timestamp_map["t_start_inputpath"] = time.time() * 1000.0
-                if not has_error:
-                    try:
-                        function_input = self._state_utils.applyInputPath(raw_state_input)
-                        #self._logger.debug("[FunctionWorker] User code input(After InputPath processing):" + str(type(function_input)) + ":" + str(function_input))
+                        #self._logger.debug("[FunctionWorker] After evaluateNonTaskState, result: " + str(function_output) + str(function_input))
                     except Exception as exc:
-                        self._logger.exception("InputPath processing exception: %s\n%s", str(instance_pid), str(exc))
-                        error_type = "InputPath processing exception"
+                        self._logger.exception("NonTaskState evaluation exception: %s\n%s", str(instance_pid), str(exc))
+                        error_type = "NonTaskState evaluation exception"
                         has_error = True
+            elif self._function_runtime == "java":
+                exec_arguments = {}
 
-                # Start of function setup (i.e., session utils, MicroFunctionsAPI)
-
-                timestamp_map["t_start_sessutils"] = time.time() * 1000.0
-                # 4. Setup session related stuff here if necessary
-                session_utils = None
-                if not has_error:
-                    # set up session related stuff here, if this is a session workflow/function
-                    # do this after fork(), so that we don't bottleneck the parent
-                    # 1. a session id
-                    # 2. a session function instance id
-                    # TODO: 3. other metadata (e.g., direct data pipe endpoints)
-                    # 4. health check mechanism (e.g., a thread in session_utils?)
-                    # 5. Telemetry can be handled by the function instance writing to the data layer, or sending out a message immediately
-                    # (see MicroFunctionsAPI.send_to_running_function_in_session() with send_now = True)
-                    if self._is_session_workflow:
-                        # set a given session id if it is present in the incoming event
-                        # for all messages coming to a session
-                        session_id = None
-                        if "sessionId" in function_input and function_input["sessionId"] != "" and function_input["sessionId"] is not None:
-                            session_id = function_input["sessionId"]
-                        elif "session_id" in function_input and function_input["session_id"] != "" and function_input["session_id"] is not None:
-                            session_id = function_input["session_id"]
-
-                        session_utils = SessionUtils(self._hostname, self._userid, self._sandboxid, self._workflowid, self._logger, self._function_state_name, self._function_topic, key, session_id, publication_utils, self._queue, self._datalayer, self._internal_endpoint)
-
-                        if self._is_session_function:
-                            try:
-                                session_utils.setup_session_function(self._session_function_parameters)
-                            except Exception as exc:
-                                self._logger.exception("Session function instantiation exception: %s\n%s", str(instance_pid), str(exc))
-                                error_type = "sessionFunctionId error"
-                                has_error = True
-
-                timestamp_map["t_start_sapi"] = time.time() * 1000.0
-                # 5. Setup the MicroFunctionsAPI object
-                if not has_error:
-                    try:
-                        # pass the SessionUtils object for API calls to send a message to other running functions?
-                        # MicroFunctionsAPI object checks before sending a message (i.e., allow only if this is_session_workflow is True)
-                        # Maybe allow only if the destination is a session function? Requires a list of session functions and passing them to the MicroFunctionsAPI and SessionUtils
-                        # Nonetheless, currently, MicroFunctionsAPI and SessionUtils write warning messages to the workflow log to indicate such problems
-                        # (e.g., when this is not a workflow session or session function, when the destination running function instance does not exist)
-                        sapi = MicroFunctionsAPI(self._storage_userid, self._sandboxid, self._workflowid, self._function_state_name, key, publication_utils, self._is_session_workflow, self._is_session_function, session_utils, self._logger, self._datalayer, self._external_endpoint, self._internal_endpoint, self._userid, self._usertoken)
-                        # need this to retrieve and publish the in-memory, transient data (i.e., stored/deleted via is_queued = True)
-                        publication_utils.set_sapi(sapi)
-                    except Exception as exc:
-                        self._logger.exception("MicroFunctionsAPI exception: %s\n%s", str(instance_pid), str(exc))
-                        error_type = "MicroFunctionsAPI exception"
-                        has_error = True
+                api_uds = "/tmp/" + self._function_state_name + "_" + key + ".uds"
 
-                timestamp_map["t_start"] = time.time() * 1000.0
-                # todo add catch retry
-                #a = self._state_utils.get_retry_data()
-                #b = self._state_utils.get_catcher_data()
-                #self._logger.debug("CatchRetry Data: " + json.dumps(self._state_utils.get_retry_data()))
-                #self._logger.debug("CatchRetry Data2: " + str(type((self._state_utils.get_retry_data()))))
-                #retrydata = self._state_utils.get_retry_data()
-
-                # 6. Execute function
-                if not has_error:
-                    #self._logger.debug("[FunctionWorker] Before isTaskState, query: " + str(self._state_utils.isTaskState()))
-                    if self._function_runtime == "python 3.6":
-                        if self._state_utils.isTaskState() and self.code:
-                            function_output = None
-                            try:
-                                # TODO: acknowledgement for session function instance creation
-                                # if this is a session function, we'll keep running until the end of that function instance (e.g., session end)
-                                # need a way to 'acknowledge' that the session function instance is running, so that the host agent also knows
-                                # that the triggering message has indeed created a new instance
-                                # if we do not send such acknowledgement, the host agent will keep thinking it has not been handled (e.g., after a restart)
-                                # and will try to recreate the session function instance again (and again).
-                                exec_arguments = {}
-                                exec_arguments["function"] = self.code.handle
-                                exec_arguments["function_input"] = function_input
-                                function_output = self._state_utils.exec_function_catch_retry(self._function_runtime, exec_arguments, sapi)
-                            except Exception as exc:
-                                self._logger.exception("User code exception: %s\n%s", str(instance_pid), str(exc))
-                                sys.stdout.flush()
-                                error_type = "User code exception: " + str(exc.__class__.__name__)
-                                has_error = True
+                exec_arguments["api_uds"] = api_uds
+                exec_arguments["thriftAPIService"] = self._api_thrift.MicroFunctionsAPIService
 
-                        else:
-                            # Processing for Non 'Task' states
-                            try:
-                                self._logger.debug("[FunctionWorker] Before evaluateNonTaskState, input: " + str(function_input) + str(metadata))
-                                #TODO: catch-retry for non-task functions?
-                                function_output, metadata_updated = self._state_utils.evaluateNonTaskState(function_input, key, metadata, sapi)
-                                metadata = metadata_updated
-                                # update metadata in the publication utils
-                                publication_utils.set_metadata(metadata)
-
-                                #self._logger.debug("[FunctionWorker] After evaluateNonTaskState, result: " + str(function_output) + str(function_input))
-                            except Exception as exc:
-                                self._logger.exception("NonTaskState evaluation exception: %s\n%s", str(instance_pid), str(exc))
-                                error_type = "NonTaskState evaluation exception"
-                                has_error = True
-                    elif self._function_runtime == "java":
-                        exec_arguments = {}
+                # serialize the input to the java worker
+                java_input = {}
+                java_input["key"] = key
+                java_input["event"] = function_input
+                java_input["APIServerSocketFilename"] = api_uds
 
-                        api_uds = "/tmp/" + self._function_state_name + "_" + key + ".uds"
+                java_input = json.dumps(java_input)
 
-                        exec_arguments["api_uds"] = api_uds
-                        exec_arguments["thriftAPIService"] = self._api_thrift.MicroFunctionsAPIService
+                exec_arguments["function_input"] = java_input
 
-                        # serialize the input to the java worker
-                        java_input = {}
-                        java_input["key"] = key
-                        java_input["event"] = function_input
-                        java_input["APIServerSocketFilename"] = api_uds
+                function_output = state_utils.exec_function_catch_retry(self._function_runtime, exec_arguments, sapi)
 
-                        java_input = json.dumps(java_input)
+        timestamp_map["t_end"] = timestamp_map["t_start_resultpath"] = time.time() * 1000.0
 
-                        exec_arguments["function_input"] = java_input
+        #self._logger.debug("[FunctionWorker] User code output:" + str(type(function_output)) + ":" + str(function_output))
+        # Start of post-processing
 
-                        function_output = self._state_utils.exec_function_catch_retry(self._function_runtime, exec_arguments, sapi)
+        # 7. Apply ResultPath, if available
+        if not has_error:
+            try:
+                raw_state_input_midway = state_utils.applyResultPath(raw_state_input, function_output)
+                #self._logger.debug("[FunctionWorker] After ResultPath processing:" + str(type(raw_state_input_midway)) + ":" + str(raw_state_input_midway))
+            except Exception as exc:
+                self._logger.exception("ResultPath processing exception: %s\n%s", str(instance_pid), str(exc))
+                error_type = "ResultPath processing exception"
+                has_error = True
+
+        # 8. Apply OutputPath, if available
+        timestamp_map["t_start_outputpath"] = time.time() * 1000.0
+        if not has_error:
+            try:
+                raw_state_output = state_utils.applyOutputPath(raw_state_input_midway)
+                #self._logger.debug("[FunctionWorker] After OutputPath processing:" + str(type(raw_state_output)) + ":" + str(raw_state_output))
+            except Exception as exc:
+                self._logger.exception("OutputPath processing exception: %s\n%s", str(instance_pid), str(exc))
+                error_type = "OutputPath processing exception"
+                has_error = True
+
+        # 9. Produce output string (value_output) from raw_state_output
+        #   (Data sent to publish output should also be a JSON Text.)
+        timestamp_map["t_start_encodeoutput"] = time.time() * 1000.0
+        value_output = 'null'
+        if not has_error:
+            try:
+                value_output = publication_utils.encode_output(raw_state_output)
+                #self._logger.debug("[FunctionWorker] Encoded state output:" + str(type(value_output)) + ":" + value_output)
+            except Exception as exc:
+                self._logger.exception("State Output Encoding exception: %s\n%s", str(instance_pid), str(exc))
+                error_type = "State Output Encoding exception"
+                has_error = True
+
+        # 10. If current state is a terminal state inside a parallel branch then store output and decrement counter
+        timestamp_map["t_start_branchterminal"] = time.time() * 1000.0
+        if not has_error:
+            try:
+                state_utils.processBranchTerminalState(key, publication_utils.get_json_output(value_output), metadata, sapi) # not supposed to have a return value
+            except Exception as exc:
+                self._logger.exception("ProcessBranchTerminalState: %s\n%s", str(instance_pid), str(exc))
+                error_type = "ProcessBranchTerminalState exception"
+                has_error = True
 
-                timestamp_map["t_end"] = timestamp_map["t_start_resultpath"] = time.time() * 1000.0
+        # the memory usage of the instance's process is only meaningful if it is not shared with other instances
+        if not in_process:
+            timestamp_map.update(self._get_instance_memory_usage())
 
-                #self._logger.debug("[FunctionWorker] User code output:" + str(type(function_output)) + ":" + str(function_output))
-                # Start of post-processing
+        if sapi is not None:
+            data_layer_cache_stats = sapi._get_data_layer_cache_stats()
+            if data_layer_cache_stats is not None:
+                timestamp_map["dlcache_hits"] = data_layer_cache_stats["hits"]
+                timestamp_map["dlcache_misses"] = data_layer_cache_stats["misses"]
 
-                # 7. Apply ResultPath, if available
-                if not has_error:
-                    try:
-                        raw_state_input_midway = self._state_utils.applyResultPath(raw_state_input, function_output)
-                        #self._logger.debug("[FunctionWorker] After ResultPath processing:" + str(type(raw_state_input_midway)) + ":" + str(raw_state_input_midway))
-                    except Exception as exc:
-                        self._logger.exception("ResultPath processing exception: %s\n%s", str(instance_pid), str(exc))
-                        error_type = "ResultPath processing exception"
-                        has_error = True
+        #self._logger.exception("Before publish, has_error: " + str(has_error))
 
-                # 8. Apply OutputPath, if available
-                timestamp_map["t_start_outputpath"] = time.time() * 1000.0
-                if not has_error:
-                    try:
-                        raw_state_output = self._state_utils.applyOutputPath(raw_state_input_midway)
-                        #self._logger.debug("[FunctionWorker] After OutputPath processing:" + str(type(raw_state_output)) + ":" + str(raw_state_output))
-                    except Exception as exc:
-                        self._logger.exception("OutputPath processing exception: %s\n%s", str(instance_pid), str(exc))
-                        error_type = "OutputPath processing exception"
-                        has_error = True
+        # Start of output publishing
+        try:
+            # _XXX_: a potential race condition here with the session_utils helper thread
+            # if the long-running function finishes and publishes the output,
+            # the local queue client there is shut down at the end of the publishing
+            # but the helper thread may not still have exited its polling loop for session update messages
+            # hence may try to send another heartbeat message with the publication_utils local queue client
 
-                # 9. Produce output string (value_output) from raw_state_output
-                #   (Data sent to publish output should also be a JSON Text.)
-                timestamp_map["t_start_encodeoutput"] = time.time() * 1000.0
-                value_output = 'null'
-                if not has_error:
-                    try:
-                        value_output = publication_utils.encode_output(raw_state_output)
-                        #self._logger.debug("[FunctionWorker] Encoded state output:" + str(type(value_output)) + ":" + value_output)
-                    except Exception as exc:
-                        self._logger.exception("State Output Encoding exception: %s\n%s", str(instance_pid), str(exc))
-                        error_type = "State Output Encoding exception"
-                        has_error = True
+            # need a way to sync the cleanup of the local queue client?
+            # 1. shutdown the helper thread before publishing
+            # 2. ensure in the helper thread no other heartbeat is published when it just exits the polling loop
+            if session_utils is not None and self._is_session_function:
+                session_utils.shutdown_helper_thread()
 
-                # 10. If current state is a terminal state inside a parallel branch then store output and decrement counter
-                timestamp_map["t_start_branchterminal"] = time.time() * 1000.0
-                if not has_error:
-                    try:
-                        self._state_utils.processBranchTerminalState(key, value_output, metadata, sapi) # not supposed to have a return value
-                    except Exception as exc:
-                        self._logger.exception("ProcessBranchTerminalState: %s\n%s", str(instance_pid), str(exc))
-                        error_type = "ProcessBranchTerminalState exception"
-                        has_error = True
+            if publication_utils is not None:
+                publication_utils.publish_output_direct(key, value_output, has_error, error_type, timestamp_map, raw_state_output)
+                self._report_instance_metrics(timestamp_map, in_process)
 
-                #self._logger.exception("Before publish, has_error: " + str(has_error))
+            # remove session function metadata from the session metadata tables if this is a session function
+            if session_utils is not None and self._is_session_function:
+                session_utils.cleanup()
 
-                # Start of output publishing
-                try:
-                    # _XXX_: a potential race condition here with the session_utils helper thread
-                    # if the long-running function finishes and publishes the output,
-                    # the local queue client there is shut down at the end of the publishing
-                    # but the helper thread may not still have exited its polling loop for session update messages
-                    # hence may try to send another heartbeat message with the publication_utils local queue client
+            # execute the fused next function in this process on the in-memory output
+            if self._fused_worker is not None and publication_utils is not None:
+                for fused_key, fused_value, fused_metadata in publication_utils.get_fused_triggers():
+                    self._fused_worker._handle_fused_instance(fused_key, fused_value, fused_metadata, local_queue_client, backup_data_layer_client)
 
-                    # need a way to sync the cleanup of the local queue client?
-                    # 1. shutdown the helper thread before publishing
-                    # 2. ensure in the helper thread no other heartbeat is published when it just exits the polling loop
-                    if session_utils is not None and self._is_session_function:
-                        session_utils.shutdown_helper_thread()
+            return True
+
+        except Exception as exc:
+            self._logger.exception("Publication exception: %s\n%s", str(instance_pid), str(exc))
+            sys.stdout.flush()
+            return False
+
+    def _start_instance_pool(self):
+        self._logger.info("[FunctionWorker] Starting instance pool: size: %s, recycle after: %s", str(self._pool_size), str(self._pool_recycle_after))
+        for i in range(self._pool_size):
+            self._fork_pool_worker()
+
+    def _fork_pool_worker(self):
+        parent_conn, child_conn = multiprocessing.Pipe()
+        worker_pid = os.fork()
+        if worker_pid == 0:
+            parent_conn.close()
+            # we don't need the other instances' connections
+            for conn in self._pool_workers.values():
+                conn.close()
+            exit_code = 1
+            try:
+                exit_code = self._run_pool_worker(child_conn)
+            except Exception as exc:
+                self._logger.exception("Pool instance exception: %s", str(exc))
+                sys.stdout.flush()
+            os._exit(exit_code)
 
-                    if publication_utils is not None:
-                        publication_utils.publish_output_direct(key, value_output, has_error, error_type, timestamp_map)
+        child_conn.close()
+        self._child_pids.add(worker_pid)
+        self._pool_workers[worker_pid] = parent_conn
+        self._pool_idle.append(worker_pid)
 
-                    # remove session function metadata from the session metadata tables if this is a session function
-                    if session_utils is not None and self._is_session_function:
-                        session_utils.cleanup()
+    def _run_pool_worker(self, conn):
+        signal(SIGCHLD, SIG_DFL)
 
-                    os._exit(0)
+        # connections that are reused by all instances handled by this process
+        local_queue_client = LocalQueueClient(connect=self._queue)
+        # locality = -1 means that the writes happen to the local data layer first and then asynchronously to the global data layer
+        backup_data_layer_client = DataLayerClient(locality=-1, for_mfn=True, sid=self._sandboxid, connect=self._datalayer, pooled=True)
 
+        num_handled = 0
+        while True:
+            try:
+                request = conn.recv()
+            except EOFError:
+                # parent is gone
+                break
+
+            action = request[0]
+            if action == "stop":
+                break
+            elif action == "update-local-functions":
+                self._update_local_functions(request[1])
+            elif action == "message":
+                key, encapsulated_value, timestamp_map = request[1], request[2], request[3]
+                timestamp_map["t_start_pool"] = time.time() * 1000.0
+                try:
+                    self._handle_instance(key, encapsulated_value, timestamp_map, local_queue_client, backup_data_layer_client)
                 except Exception as exc:
-                    self._logger.exception("Publication exception: %s\n%s", str(instance_pid), str(exc))
+                    self._logger.exception("Pool instance exception: %s", str(exc))
                     sys.stdout.flush()
-                    os._exit(1)
 
-            else:
-                # parent
-                # ignore children's exit signal, which allows the init to reap them
-                # TODO: store child process ids, so that we can keep track of running instances
-                # remove child process ids in the host agent, when the 'fin' message is received
-                # store (key, pid) mapping to the data layer to keep track of function instances
-                # TODO: maybe store this information in a forked process,
-                # so that we don't bottleneck/fail the parent functionworker
-                # TODO: need some component to remove the finished (key, instance_pid) tuples
-                #self._logger.debug("[FunctionWorker] key: " + key + " -> " + str(instance_pid))
-                #self._logger.debug("State Output instance PID: " + str(instance_pid) + str(has_error))
-                #self.local_data_layer_client.putMapEntry(self._map_name_key_pid, key, str(instance_pid))
-                pass
+                num_handled += 1
+                if self._pool_recycle_after > 0 and num_handled >= self._pool_recycle_after:
+                    conn.send(("recycle",))
+                    break
+                conn.send(("done",))
+
+        local_queue_client.shutdown()
+        backup_data_layer_client.shutdown()
+        conn.close()
+        return 0
+
+    def _replace_pool_worker(self, worker_pid):
+        # the exited instance process is reaped in the main loop
+        conn = self._pool_workers.pop(worker_pid)
+        conn.close()
+        if worker_pid in self._pool_idle:
+            self._pool_idle.remove(worker_pid)
+        if self._is_running:
+            self._fork_pool_worker()
+
+    def _collect_pool_replies(self, timeout):
+        busy = {}
+        for worker_pid, conn in self._pool_workers.items():
+            if worker_pid not in self._pool_idle:
+                busy[conn] = worker_pid
+
+        if not busy:
+            return
+
+        for conn in multiprocessing.connection.wait(list(busy.keys()), timeout):
+            worker_pid = busy[conn]
+            try:
+                reply = conn.recv()
+            except EOFError:
+                self._logger.error("[FunctionWorker] Pool instance exited unexpectedly: %s", str(worker_pid))
+                self._replace_pool_worker(worker_pid)
+                continue
+
+            if reply[0] == "done":
+                self._pool_idle.append(worker_pid)
+            elif reply[0] == "recycle":
+                self._replace_pool_worker(worker_pid)
+
+    def _dispatch_to_instance_pool(self, key, encapsulated_value):
+        try:
+            # same name as in the fork mode, so that the tracing stays comparable
+            timestamp_map = {}
+            timestamp_map["t_start_fork"] = time.time() * 1000.0
+
+            self._collect_pool_replies(0)
+            while True:
+                # all instances are busy; don't dequeue any further messages until one becomes available
+                while not self._pool_idle:
+                    self._collect_pool_replies(None)
+
+                # most recently used instance first, so that it is still warm
+                worker_pid = self._pool_idle.pop()
+                try:
+                    self._pool_workers[worker_pid].send(("message", key, encapsulated_value, timestamp_map))
+                    self._update_peak_in_flight()
+                    break
+                except OSError as exc:
+                    self._logger.error("[FunctionWorker] Could not dispatch to pool instance: %s (%s); replacing...", str(worker_pid), str(exc))
+                    self._replace_pool_worker(worker_pid)
 
         except Exception as exc:
-            if instance_pid == 0:
-                self._logger.exception("Child exception: %s", str(exc))
-                os._exit(1)
+            self._logger.exception("Pool dispatch exception: %s", str(exc))
+            sys.stdout.flush()
+
+    def _stop_instance_pool(self):
+        for worker_pid, conn in self._pool_workers.items():
+            try:
+                conn.send(("stop",))
+            except OSError as exc:
+                self._logger.error("[FunctionWorker] Could not stop pool instance: %s (%s)", str(worker_pid), str(exc))
+            conn.close()
+        self._pool_workers = {}
+        self._pool_idle = []
+
+
+    def _start_instance_executor(self):
+        # asyncio mode with an 'async def' handler: the instances are coroutines on the event loop
+        # and the executor's threads only run their synchronous steps (e.g., decoding the input, publishing the output)
+        self._awaitable_handler = self._execution_mode == "asyncio" and asyncio.iscoroutinefunction(getattr(getattr(self, "code", None), "handle", None))
+        num_threads = self._concurrency_limit
+        if self._awaitable_handler:
+            num_threads = min(self._concurrency_limit, self._MAX_ASYNCIO_STEP_THREADS)
+
+        self._logger.info("[FunctionWorker] Starting in-process instance executor: mode: %s, concurrency limit: %s, threads: %s", self._execution_mode, str(self._concurrency_limit), str(num_threads))
+        self._instance_slots = threading.BoundedSemaphore(self._concurrency_limit)
+        self._instance_executor = concurrent.futures.ThreadPoolExecutor(max_workers=num_threads)
+
+        if self._execution_mode == "asyncio":
+            # 'async def' handlers of all instances are awaited on this loop
+            self._event_loop = asyncio.new_event_loop()
+            self._event_loop_thread = threading.Thread(target=self._event_loop.run_forever)
+            self._event_loop_thread.daemon = True
+            self._event_loop_thread.start()
+            self._state_utils.set_event_loop(self._event_loop)
+
+    def _handle_in_process_instance(self, key, encapsulated_value, timestamp_map):
+        _INSTANCE_CONTEXT.uuid = key
+        try:
+            return self._handle_instance(key, encapsulated_value, timestamp_map, in_process=True)
+        finally:
+            del _INSTANCE_CONTEXT.uuid
+
+    async def _handle_async_instance(self, key, encapsulated_value, timestamp_map):
+        # the synchronous steps run on the executor; the handler's coroutine is awaited on the event loop without holding a thread
+        steps = self._instance_steps(key, encapsulated_value, timestamp_map, in_process=True, awaitable_handler=True)
+        handler_output = None
+        handler_exc = None
+        while True:
+            is_done, result = await self._event_loop.run_in_executor(self._instance_executor, self._advance_instance_steps, key, steps, handler_output, handler_exc)
+            if is_done:
+                return result
+            try:
+                handler_output = await result
+                handler_exc = None
+            except Exception as exc:
+                handler_output = None
+                handler_exc = exc
+
+    def _advance_instance_steps(self, key, steps, handler_output, handler_exc):
+        # StopIteration cannot be propagated through a future
+        _INSTANCE_CONTEXT.uuid = key
+        try:
+            if handler_exc is not None:
+                return False, steps.throw(handler_exc)
+            return False, steps.send(handler_output)
+        except StopIteration as stop:
+            return True, stop.value
+        finally:
+            del _INSTANCE_CONTEXT.uuid
+
+    def _instance_done(self, future):
+        with self._num_in_process_lock:
+            self._num_in_process -= 1
+        self._instance_slots.release()
+        exc = future.exception()
+        if exc is not None:
+            self._logger.error("In-process instance exception: %s", str(exc))
+
+    def _submit_to_instance_executor(self, key, encapsulated_value):
+        timestamp_map = {}
+        timestamp_map["t_start_fork"] = time.time() * 1000.0
+
+        # don't dequeue any further messages while the concurrency limit is reached
+        self._instance_slots.acquire()
+        try:
+            with self._num_in_process_lock:
+                self._num_in_process += 1
+            self._update_peak_in_flight()
+            if self._awaitable_handler:
+                future = asyncio.run_coroutine_threadsafe(self._handle_async_instance(key, encapsulated_value, timestamp_map), self._event_loop)
             else:
-                self._logger.exception("Fork exception: %s", str(instance_pid))
-                self._logger.exception(str(exc))
-                sys.stdout.flush()
+                future = self._instance_executor.submit(self._handle_in_process_instance, key, encapsulated_value, timestamp_map)
+            future.add_done_callback(self._instance_done)
+        except Exception as exc:
+            with self._num_in_process_lock:
+                self._num_in_process -= 1
+            self._instance_slots.release()
+            self._logger.exception("In-process instance submission exception: %s", str(exc))
+            sys.stdout.flush()
+
+    def _stop_instance_executor(self):
+        if self._awaitable_handler:
+            # the instances on the event loop still need the executor for their remaining steps
+            for i in range(self._concurrency_limit):
+                self._instance_slots.acquire()
+        self._instance_executor.shutdown(wait=True)
+        if self._event_loop is not None:
+            self._event_loop.call_soon_threadsafe(self._event_loop.stop)
+            self._event_loop_thread.join()
+            self._event_loop.close()
+
+    def _freeze_heap(self):
+        # the user code, state definitions and all the modules have been loaded and parsed by now
+        # collect once and move the surviving objects into the permanent generation,
+        # so that the collections in the instances do not touch (i.e., copy-on-write) the pages shared with the parent
+        gc.collect()
+        if hasattr(gc, "freeze"):
+            # python 3.7+
+            gc.freeze()
+            self._logger.info("[FunctionWorker] Frozen objects: %s", str(gc.get_freeze_count()))
+
+    def _get_instance_memory_usage(self):
+        # Pss: proportional share of the pages (shared pages are divided among the processes sharing them)
+        # Private_Dirty: pages only this process uses and has written (i.e., copied or newly allocated)
+        usage = {}
+        try:
+            with open("/proc/self/smaps_rollup", "r") as smapsf:
+                for line in smapsf:
+                    tokens = line.split()
+                    if tokens[0] == "Rss:":
+                        usage["mem_rss_kb"] = int(tokens[1])
+                    elif tokens[0] == "Pss:":
+                        usage["mem_pss_kb"] = int(tokens[1])
+                    elif tokens[0] == "Private_Dirty:":
+                        usage["mem_private_dirty_kb"] = int(tokens[1])
+        except Exception as exc:
+            # smaps_rollup requires linux 4.14+
+            self._logger.debug("Could not read memory usage: %s", str(exc))
+        return usage
+
+    def _update_local_functions(self, local_functions):
+        self._wf_local = local_functions
+        if self._fused_worker is not None:
+            self._fused_worker._update_local_functions(local_functions)
+
+    def _handle_fused_instance(self, key, raw_state_input, metadata, local_queue_client=None, backup_data_layer_client=None):
+        timestamp_map = {}
+        timestamp_map["t_start_fork"] = timestamp_map["t_start_fused"] = time.time() * 1000.0
+
+        # the user code output of this function goes to its own log
+        stdout = sys.stdout
+        stderr = sys.stderr
+        sys.stdout = self._stdout
+        sys.stderr = self._stderr
+        try:
+            return self._handle_instance(key, None, timestamp_map, local_queue_client, backup_data_layer_client, fused_input=(raw_state_input, metadata))
+        except Exception as exc:
+            self._logger.exception("Fused instance exception: %s", str(exc))
+            return False
+        finally:
+            sys.stdout = stdout
+            sys.stderr = stderr
 
     def _process_update(self, value):
         try:
@@ -566,18 +1097,32 @@ class FunctionWorker:
 
             if action == "stop":
                 self.shutdown()
+            elif action == "stop-execution":
+                # an execution that has been stopped in this or another sandbox (see ControlEvents)
+                set_execution_stopped(update["executionId"])
             elif action == "update-local-functions":
-                self._wf_local = update["localFunctions"]
+                self._update_local_functions(update["localFunctions"])
+                # the instance processes of the pool have their own copy
+                for worker_pid, conn in self._pool_workers.items():
+                    try:
+                        conn.send(("update-local-functions", self._wf_local))
+                    except OSError as exc:
+                        self._logger.error("[FunctionWorker] Could not update pool instance: %s (%s)", str(worker_pid), str(exc))
         except Exception as exc:
             self._logger.error("Could not parse update message: %s; ignored...", str(exc))
 
-    def _handle_message(self, lqm):
+    def _handle_message(self, lqm=None, lqcm=None):
         try:
-            lqcm = LocalQueueClientMessage(lqm=lqm)
+            if lqcm is None:
+                lqcm = LocalQueueClientMessage(lqm=lqm)
             key = lqcm.get_key()
             value = lqcm.get_value()
             if key == "0l":
                 self._process_update(value)
+            elif self._execution_mode == "pool":
+                self._dispatch_to_instance_pool(key, value)
+            elif self._execution_mode in ["thread", "asyncio"]:
+                self._submit_to_instance_executor(key, value)
             else:
                 self._fork_and_handle_message(key, value)
         except Exception as exc:
@@ -585,10 +1130,253 @@ class FunctionWorker:
             sys.stdout.flush()
             os._exit(1)
 
+    def _get_num_free_slots(self):
+        # the number of instances that can start right away
+        if self._execution_mode == "pool":
+            self._collect_pool_replies(0)
+            return len(self._pool_idle)
+        elif self._execution_mode in ["thread", "asyncio"]:
+            return self._concurrency_limit - self._num_in_process
+        if self._max_in_flight <= 0:
+            return self._POLL_MAX_NUM_MESSAGES
+        self._reap_child_processes()
+        return self._max_in_flight - len(self._child_pids)
+
+    def _wait_for_free_slot(self):
+        # bounded, so that the main loop keeps handling the control messages and its periodic tasks
+        # even if an instance hangs
+        if self._execution_mode == "pool":
+            self._collect_pool_replies(self._BUSY_WAIT_TIMEOUT)
+        elif self._execution_mode in ["thread", "asyncio"]:
+            if self._instance_slots.acquire(timeout=self._BUSY_WAIT_TIMEOUT):
+                self._instance_slots.release()
+        else:
+            deadline = time.time() + self._BUSY_WAIT_TIMEOUT
+            num_in_flight = len(self._child_pids)
+            while True:
+                self._reap_child_processes()
+                if len(self._child_pids) < num_in_flight or time.time() >= deadline:
+                    break
+                time.sleep(0.01)
+
     def _get_and_handle_message(self):
-        lqm = self.local_queue_client.getMessage(self._function_topic, self._POLL_TIMEOUT)
-        if lqm is not None:
-            self._handle_message(lqm)
+        # the messages stay in the queue (i.e., not in the memory of this worker) while all instances are busy,
+        # except for a few that are dequeued to look for control messages (see below)
+        num_free_slots = self._get_num_free_slots()
+        while self._pending_messages and num_free_slots > 0:
+            self._handle_message(lqcm=self._pending_messages.popleft())
+            num_free_slots -= 1
+
+        if num_free_slots > 0:
+            # retrieve all available messages (up to the number of free slots) with a single round trip
+            # the queue service only blocks until the first message arrives and then returns whatever else is already queued,
+            # so that a lone message is not held back waiting for a batch to fill up
+            lqm_list = self.local_queue_client.getMultipleMessages(self._function_topic, min(self._POLL_MAX_NUM_MESSAGES, num_free_slots), self._POLL_TIMEOUT)
+            # the messages have already been removed from the queue,
+            # so handle all of them even if one of them is a 'stop' update
+            self._num_queued = len(lqm_list)
+            for lqm in lqm_list:
+                self._num_queued -= 1
+                self._handle_message(lqm)
+        elif len(self._pending_messages) < self._MAX_PENDING_MESSAGES:
+            # all instances are busy: handle the control messages right away (e.g., 'stop', 'update-local-functions')
+            # and keep the others until a slot is free
+            lqm_list = self.local_queue_client.getMultipleMessages(self._function_topic, self._MAX_PENDING_MESSAGES - len(self._pending_messages), self._BUSY_POLL_TIMEOUT)
+            for lqm in lqm_list:
+                lqcm = LocalQueueClientMessage(lqm=lqm)
+                if lqcm.get_key() == "0l":
+                    self._handle_message(lqcm=lqcm)
+                else:
+                    self._pending_messages.append(lqcm)
+            self._wait_for_free_slot()
+        else:
+            self._wait_for_free_slot()
+
+        self._reap_child_processes()
+
+        if time.time() - self._last_stats_log_time >= self._STATS_LOG_INTERVAL:
+            self._log_instance_stats()
+            evict_expired_stop_flags()
+
+        self._collect_instance_metrics()
+        if time.time() - self._last_metrics_dump_time >= self._METRICS_DUMP_INTERVAL:
+            self._dump_instance_metrics()
+
+    def _reap_child_processes(self, block=False):
+        # only the forked instances and instance processes are our children
+        # (i.e., don't interfere with the child processes of the user code in the in-process modes)
+        options = 0 if block else os.WNOHANG
+        while self._child_pids:
+            try:
+                cpid, status = os.waitpid(-1, options)
+            except ChildProcessError:
+                self._child_pids.clear()
+                break
+            if cpid == 0:
+                break
+            self._child_pids.discard(cpid)
+            # after waiting for one, collect only the ones that have already exited
+            options = os.WNOHANG
+
+    def _get_num_in_flight(self):
+        if self._execution_mode == "pool":
+            return len(self._pool_workers) - len(self._pool_idle)
+        elif self._execution_mode in ["thread", "asyncio"]:
+            return self._num_in_process
+        return len(self._child_pids)
+
+    def _update_peak_in_flight(self):
+        num_in_flight = self._get_num_in_flight()
+        if num_in_flight > self._num_peak_in_flight:
+            self._num_peak_in_flight = num_in_flight
+
+    def get_instance_stats(self):
+        stats = {}
+        stats["current"] = self._get_num_in_flight()
+        stats["peak"] = self._num_peak_in_flight
+        stats["queued"] = self._num_queued + len(self._pending_messages)
+        return stats
+
+    def _set_metrics_pipe(self, metrics_pipe_w):
+        self._metrics_pipe_w = metrics_pipe_w
+        if self._fused_worker is not None:
+            self._fused_worker._set_metrics_pipe(metrics_pipe_w)
+
+    def _record_data_layer_cache_stats(self, counters):
+        self._data_layer_cache_stats["hits"] += counters.get("dlcache_hits", 0)
+        self._data_layer_cache_stats["misses"] += counters.get("dlcache_misses", 0)
+
+    def _record_data_layer_latency_counters(self, latency_counters):
+        for operation in latency_counters:
+            counters = self._data_layer_latency_counters.get(operation)
+            if counters is None:
+                self._data_layer_latency_counters[operation] = list(latency_counters[operation])
+                continue
+            for i, value in enumerate(latency_counters[operation]):
+                if i == COUNTER_MAX_MS:
+                    counters[i] = max(counters[i], value)
+                else:
+                    counters[i] += value
+
+    def _record_data_layer_compression_counters(self, compression_counters):
+        for name in compression_counters:
+            self._data_layer_compression_counters[name] = self._data_layer_compression_counters.get(name, 0) + compression_counters[name]
+
+    def _get_data_layer_compression_summary(self):
+        summary = dict(self._data_layer_compression_counters)
+        bytes_out = summary.get("bytes_out", 0)
+        summary["ratio"] = summary.get("bytes_in", 0) / bytes_out if bytes_out > 0 else 0.0
+        return summary
+
+    def _get_data_layer_latency_summary(self):
+        summary = {}
+        for operation in self._data_layer_latency_counters:
+            counters = self._data_layer_latency_counters[operation]
+            summary[operation] = {}
+            summary[operation]["calls"] = counters[COUNTER_CALLS]
+            summary[operation]["avg_ms"] = counters[COUNTER_TOTAL_MS] / counters[COUNTER_CALLS] if counters[COUNTER_CALLS] > 0 else 0.0
+            summary[operation]["max_ms"] = counters[COUNTER_MAX_MS]
+            summary[operation]["errors"] = counters[COUNTER_ERRORS]
+            summary[operation]["hedged"] = counters[COUNTER_HEDGED]
+            summary[operation]["hedge_wins"] = counters[COUNTER_HEDGE_WINS]
+        return summary
+
+    def _report_instance_metrics(self, timestamp_map, in_process):
+        if in_process:
+            with self._phase_histograms_lock:
+                self._phase_histograms.record_timestamp_map(self._function_state_name, timestamp_map)
+                self._record_data_layer_cache_stats(timestamp_map)
+            return
+
+        if self._metrics_pipe_w is None:
+            return
+
+        timestamps = {}
+        counters = {}
+        for name in timestamp_map:
+            if name[:2] == "t_":
+                timestamps[name] = timestamp_map[name]
+            elif name[:8] == "dlcache_":
+                counters[name] = timestamp_map[name]
+        # the data layer calls of this instance's process since the previous instance (including the publishing)
+        latency_counters = get_latency_counters(reset=True)
+        for operation in latency_counters:
+            counters["dlop_" + operation] = latency_counters[operation]
+        compression_counters = get_compression_counters(reset=True)
+        for name in compression_counters:
+            if compression_counters[name]:
+                counters["dlz_" + name] = compression_counters[name]
+        report = (json.dumps([self._function_state_name, timestamps, counters]) + "\n").encode()
+
+        # writes up to PIPE_BUF bytes are atomic, so that the reports of concurrent instances do not interleave
+        if len(report) > select.PIPE_BUF:
+            return
+        try:
+            os.write(self._metrics_pipe_w, report)
+        except OSError:
+            # the pipe is full
+            pass
+
+    def _collect_instance_metrics(self):
+        while True:
+            try:
+                data = os.read(self._metrics_pipe_r, 65536)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            self._metrics_buffer += data
+
+        # a report may have been split across reads
+        reports = self._metrics_buffer.split(b"\n")
+        self._metrics_buffer = reports.pop()
+
+        with self._phase_histograms_lock:
+            for report in reports:
+                try:
+                    report = json.loads(report.decode())
+                    self._phase_histograms.record_timestamp_map(report[0], report[1])
+                    if len(report) > 2:
+                        self._record_data_layer_cache_stats(report[2])
+                        latency_counters = {}
+                        compression_counters = {}
+                        for name in report[2]:
+                            if name[:5] == "dlop_":
+                                latency_counters[name[5:]] = report[2][name]
+                            elif name[:4] == "dlz_":
+                                compression_counters[name[4:]] = report[2][name]
+                        self._record_data_layer_latency_counters(latency_counters)
+                        self._record_data_layer_compression_counters(compression_counters)
+                except Exception as exc:
+                    self._logger.debug("Could not parse instance metrics: %s", str(exc))
+
+    def _dump_instance_metrics(self):
+        self._last_metrics_dump_time = time.time()
+        self._collect_instance_metrics()
+
+        metrics = {}
+        metrics["timestamp"] = time.time() * 1000.0
+        with self._phase_histograms_lock:
+            metrics["histograms"] = self._phase_histograms.get_summary()
+            metrics["data_layer_cache"] = dict(self._data_layer_cache_stats)
+            # the data layer calls of this process (e.g., in-process instances)
+            self._record_data_layer_latency_counters(get_latency_counters(reset=True))
+            metrics["data_layer_latency"] = self._get_data_layer_latency_summary()
+            self._record_data_layer_compression_counters(get_compression_counters(reset=True))
+            metrics["data_layer_compression"] = self._get_data_layer_compression_summary()
+
+        # replace the file at once, so that readers never see a partial dump
+        try:
+            tmp_filename = self._metrics_filename + ".tmp"
+            with open(tmp_filename, "w") as metricsf:
+                json.dump(metrics, metricsf)
+            os.rename(tmp_filename, self._metrics_filename)
+        except Exception as exc:
+            self._logger.error("Could not dump instance metrics: %s", str(exc))
+
+    def _log_instance_stats(self):
+        self._last_stats_log_time = time.time()
+        self._logger.info("[FunctionWorker] Instance stats: %s, %s", self._function_state_name, json.dumps(self.get_instance_stats()))
 
     def run(self):
         self._is_running = True
@@ -599,9 +1387,22 @@ class FunctionWorker:
             + ", sandbox: " + self._sandboxid \
             + ", pid: " + str(os.getpid()))
 
+        if self._execution_mode in ["fork", "pool"]:
+            self._freeze_heap()
+
+        if self._execution_mode == "pool":
+            self._start_instance_pool()
+        elif self._execution_mode in ["thread", "asyncio"]:
+            self._start_instance_executor()
+
         while self._is_running:
             self._get_and_handle_message()
 
+        if self._execution_mode == "pool":
+            self._stop_instance_pool()
+        elif self._execution_mode in ["thread", "asyncio"]:
+            self._stop_instance_executor()
+
         self._logger.debug("[FunctionWorker] Waiting for child processes to finish:" \
             + self._function_state_name \
             + ", user: " + self._userid \
@@ -614,6 +1415,9 @@ class FunctionWorker:
         self.wait_for_child_processes()
         t.cancel()
 
+        self._log_instance_stats()
+        self._dump_instance_metrics()
+
         self._logger.info("[FunctionWorker] Exit:" \
             + self._function_state_name \
             + ", user: " + self._userid \
@@ -656,34 +1460,17 @@ class FunctionWorker:
             return '', '', -1
 
     def wait_for_child_processes(self):
-        pid = os.getpid()
-        out, err, retcode = self.runCmd('pgrep -P ' + str(pid))
-        if retcode != 0:
-            self._logger.error("[FunctionWorker] wait_for_child_processes: Failed to get children process ids")
-            return
-
-        children_pids = set(out.split())
-        self._logger.debug("[FunctionWorker] wait_for_child_processes: Parent pid: " + str(pid) + "  Children_pid: " + str(children_pids))
+        self._logger.debug("[FunctionWorker] wait_for_child_processes: Parent pid: " + str(os.getpid()) + "  Children_pid: " + str(self._child_pids))
 
-        if len(children_pids) == 0:
-            self._logger.debug("[FunctionWorker] wait_for_child_processes: No remaining pids to wait for")
-            return
-
-        while True:
+        while self._child_pids:
             try:
-                cpid, status = os.waitpid(-1, 0)
-                self._logger.debug("[FunctionWorker] wait_for_child_processes: Status change for pid: " + str(cpid) + " Status: " + str(status))
-                if str(cpid) not in children_pids:
-                    #print('wait_for_child_processes: ' + str(cpid) + "Not found in children_pids")
-                    continue
-                children_pids.remove(str(cpid))
-                if len(children_pids) == 0:
-                    self._logger.debug("[FunctionWorker] wait_for_child_processes: No remaining pids to wait for")
-                    break
+                self._reap_child_processes(block=True)
             except Exception as e:
                 self._logger.error('[FunctionWorker] wait_for_child_processes: ' + str(e))
                 break
 
+        self._logger.debug("[FunctionWorker] wait_for_child_processes: No remaining pids to wait for")
+
     def shutdown(self):
         self._logger.debug("[FunctionWorker] Shutdown command received:" \
             + self._function_state_name \
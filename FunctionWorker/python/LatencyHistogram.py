@@ -0,0 +1,149 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+# the order of the timestamps in the timestamp map of a function instance (see FunctionWorker and PublicationUtils)
+# each phase is named after its starting timestamp and lasts until the next timestamp that is present
+PHASE_TIMESTAMPS = [
+    "t_start_fork",
+    "t_start_fused",
+    "t_start_pool",
+    "t_start_pubutils",
+    "t_start_decapsulate",
+    "t_start_chdir",
+    "t_start_decodeinput",
+    "t_start_inputpath",
+    "t_start_sessutils",
+    "t_start_sapi",
+    "t_start",
+    "t_end",
+    "t_start_outputpath",
+    "t_start_encodeoutput",
+    "t_start_branchterminal",
+    "t_pub_start",
+    "t_start_asyncwait",
+    "t_start_dlcbackup",
+    "t_start_encapsulate",
+    "t_start_resultmap",
+    "t_start_storeoutput",
+    "t_start_generatenextlist",
+    "t_start_dlcbackup_err",
+    "t_start_dlcbackup_err_flag",
+    "t_start_pubnextlist",
+    "t_start_pubbatch",
+    "t_start_backtrigger",
+    "t_pub_end"
+]
+
+TOTAL_PHASE = "total"
+
+class LatencyHistogram:
+    '''
+    A histogram with log-linear buckets (similar to HDR histograms):
+    values are bucketed with a fixed relative precision (i.e., 2^-sub_bucket_bits),
+    so that a wide range of latencies can be recorded in a small, sparse map.
+    The values are latencies in milliseconds; they are recorded with microsecond resolution.
+    '''
+    def __init__(self, sub_bucket_bits=5):
+        self._sub_bucket_bits = sub_bucket_bits
+        self._sub_bucket_count = 1 << sub_bucket_bits
+        self._buckets = {}
+        self._count = 0
+        self._sum = 0.0
+        self._min = None
+        self._max = None
+
+    def _get_bucket_index(self, value):
+        if value < self._sub_bucket_count:
+            return value
+        shift = value.bit_length() - self._sub_bucket_bits
+        return (shift << self._sub_bucket_bits) + (value >> shift)
+
+    def _get_bucket_value(self, index):
+        shift = index >> self._sub_bucket_bits
+        if shift == 0:
+            return index
+        lower = (index & (self._sub_bucket_count - 1)) << shift
+        # middle of the bucket
+        return lower + ((1 << shift) >> 1)
+
+    def record(self, value_ms):
+        if value_ms < 0.0:
+            value_ms = 0.0
+        index = self._get_bucket_index(int(value_ms * 1000.0))
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+
+        self._count += 1
+        self._sum += value_ms
+        if self._min is None or value_ms < self._min:
+            self._min = value_ms
+        if self._max is None or value_ms > self._max:
+            self._max = value_ms
+
+    def get_percentile(self, percentile):
+        if self._count == 0:
+            return None
+        threshold = self._count * percentile / 100.0
+        seen = 0
+        for index in sorted(self._buckets.keys()):
+            seen += self._buckets[index]
+            if seen >= threshold:
+                return min(self._get_bucket_value(index) / 1000.0, self._max)
+        return self._max
+
+    def get_summary(self, percentiles=(50.0, 90.0, 99.0, 99.9)):
+        summary = {}
+        summary["count"] = self._count
+        if self._count > 0:
+            summary["mean"] = self._sum / self._count
+            summary["min"] = self._min
+            summary["max"] = self._max
+            for percentile in percentiles:
+                summary["p" + str(percentile).rstrip("0").rstrip(".")] = self.get_percentile(percentile)
+        return summary
+
+class PhaseLatencyHistograms:
+    '''
+    Per state and per phase latency histograms, recorded from the timestamp maps of function instances.
+    '''
+    def __init__(self):
+        # state name -> phase -> LatencyHistogram
+        self._histograms = {}
+
+    def _get_histogram(self, state_name, phase):
+        if state_name not in self._histograms:
+            self._histograms[state_name] = {}
+        state_histograms = self._histograms[state_name]
+        if phase not in state_histograms:
+            state_histograms[phase] = LatencyHistogram()
+        return state_histograms[phase]
+
+    def record_timestamp_map(self, state_name, timestamp_map):
+        previous = None
+        for timestamp in PHASE_TIMESTAMPS:
+            if timestamp not in timestamp_map:
+                continue
+            if previous is not None:
+                self._get_histogram(state_name, previous).record(timestamp_map[timestamp] - timestamp_map[previous])
+            previous = timestamp
+
+        if "t_start_fork" in timestamp_map and "t_pub_end" in timestamp_map:
+            self._get_histogram(state_name, TOTAL_PHASE).record(timestamp_map["t_pub_end"] - timestamp_map["t_start_fork"])
+
+    def get_summary(self):
+        summary = {}
+        for state_name in self._histograms:
+            summary[state_name] = {}
+            for phase in self._histograms[state_name]:
+                summary[state_name][phase] = self._histograms[state_name][phase].get_summary()
+        return summary
@@ -21,7 +21,9 @@ from thrift.transport import TTransport
 from thrift.protocol import TCompactProtocol
 
 from local_queue.service import LocalQueueService
-from local_queue.service.ttypes import LocalQueueMessage
+from local_queue.service.ttypes import LocalQueueMessage, LocalQueueTopicMessage
+
+UNIX_SOCKET_PREFIX = "unix://"
 
 class LocalQueueClient:
     '''
@@ -32,8 +34,12 @@ class LocalQueueClient:
 
     '''
     def __init__(self, connect="127.0.0.1:4999"):
-        host, port = connect.split(':')
-        self.socket = TSocket.TSocket(host, int(port))
+        # the queue service may also listen on a unix domain socket (i.e., unix:///path/to/socket)
+        if connect.startswith(UNIX_SOCKET_PREFIX):
+            self.socket = TSocket.TSocket(unix_socket=connect[len(UNIX_SOCKET_PREFIX):])
+        else:
+            host, port = connect.split(':')
+            self.socket = TSocket.TSocket(host, int(port))
         self.transport = TTransport.TFramedTransport(self.socket)
         self.protocol = TCompactProtocol.TCompactProtocol(self.transport)
         self.queue = LocalQueueService.Client(self.protocol)
@@ -57,7 +63,9 @@ class LocalQueueClient:
     def addMessage(self, topic, lqcm, ack):
         status = True
         message = LocalQueueMessage()
-        message.payload = lqcm.get_serialized().encode()
+        message.payload = lqcm.get_serialized()
+        if isinstance(message.payload, str):
+            message.payload = message.payload.encode()
         try:
             if ack:
                 status = self.queue.addMessage(topic, message)
@@ -74,6 +82,32 @@ class LocalQueueClient:
 
         return status
 
+    def addMessages(self, topic_lqcm_list):
+        '''
+        Adds the (topic, message) pairs with a single round trip (acknowledged).
+        Returns the status of each message; all False if the call failed.
+        '''
+        messages = []
+        for topic, lqcm in topic_lqcm_list:
+            message = LocalQueueMessage()
+            message.payload = lqcm.get_serialized()
+            if isinstance(message.payload, str):
+                message.payload = message.payload.encode()
+            messages.append(LocalQueueTopicMessage(topic=topic, message=message))
+
+        try:
+            statuses = self.queue.addMessages(messages)
+        except TTransport.TTransportException as exc:
+            print("[LocalQueueClient] Reconnecting because of failed addMessages: " + str(exc))
+            statuses = [False] * len(messages)
+            self.shutdown()
+            self.connect()
+        except Exception as exc:
+            print("[LocalQueueClient] failed addMessages: " + str(exc))
+            raise
+
+        return statuses
+
     def getMessage(self, topic, timeout):
         try:
             lqm = self.queue.getAndRemoveMessage(topic, timeout)
@@ -14,6 +14,8 @@
 
 from struct import pack, unpack
 
+from MessageEnvelope import ENVELOPE_MAGIC
+
 class LocalQueueClientMessage:
     '''
     This class defines the message data structure used by the function worker.
@@ -32,15 +34,23 @@ class LocalQueueClientMessage:
             self._serialize()
 
     def _serialize(self):
-        length = 4 + len(self._key)
-        self._serialized = pack('!I', length)
-        self._serialized = self._serialized + self._key.encode() + self._value.encode()
-        self._serialized = self._serialized.decode()
+        key = self._key.encode()
+        length = 4 + len(key)
+        if isinstance(self._value, bytes):
+            # binary message envelope (see MessageEnvelope); keep it as bytes all the way to the queue
+            self._serialized = b"".join([pack('!I', length), key, self._value])
+        else:
+            self._serialized = pack('!I', length)
+            self._serialized = self._serialized + key + self._value.encode()
+            self._serialized = self._serialized.decode()
 
     def _deserialize(self):
         length = unpack('!I', self._serialized[0:4])[0]
         self._key = self._serialized[4:length].decode()
-        self._value = self._serialized[length:].decode()
+        if self._serialized[length:length+len(ENVELOPE_MAGIC)] == ENVELOPE_MAGIC:
+            self._value = self._serialized[length:]
+        else:
+            self._value = self._serialized[length:].decode()
 
     def get_key(self):
         return self._key
@@ -0,0 +1,132 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import importlib
+import json
+
+# the codec that encoded the user data of a message is recorded in its metadata under this key
+# (no entry means the stdlib json codec, i.e., messages from the frontend or from older workers)
+CODEC_METADATA_KEY = "__mfn_codec"
+
+DEFAULT_CODEC = "json"
+
+def _import_optional(module_name):
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        return None
+
+class JSONCodec:
+    '''
+    The stdlib json module; always available and the fallback for all other codecs.
+    '''
+    name = "json"
+    # text codecs produce JSON text (str), which every other text codec can also decode
+    is_text = True
+
+    def is_available(self):
+        return True
+
+    def encode(self, obj):
+        return json.dumps(obj)
+
+    def decode(self, data):
+        return json.loads(data)
+
+class UJSONCodec:
+    name = "ujson"
+    is_text = True
+
+    def __init__(self):
+        self._ujson = _import_optional("ujson")
+
+    def is_available(self):
+        return self._ujson is not None
+
+    def encode(self, obj):
+        return self._ujson.dumps(obj, escape_forward_slashes=False)
+
+    def decode(self, data):
+        return self._ujson.loads(data)
+
+class ORJSONCodec:
+    name = "orjson"
+    is_text = True
+
+    def __init__(self):
+        self._orjson = _import_optional("orjson")
+
+    def is_available(self):
+        return self._orjson is not None
+
+    def encode(self, obj):
+        return self._orjson.dumps(obj).decode()
+
+    def decode(self, data):
+        return self._orjson.loads(data)
+
+class MsgPackCodec:
+    '''
+    MessagePack produces bytes, so it can only be used with the binary message envelope (see MessageEnvelope).
+    '''
+    name = "msgpack"
+    is_text = False
+
+    def __init__(self):
+        self._msgpack = _import_optional("msgpack")
+
+    def is_available(self):
+        return self._msgpack is not None
+
+    def encode(self, obj):
+        return self._msgpack.packb(obj, use_bin_type=True)
+
+    def decode(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        return self._msgpack.unpackb(data, raw=False)
+
+_CODECS = {}
+
+def register_codec(codec):
+    _CODECS[codec.name] = codec
+
+def get_codec(name, binary_envelope=False):
+    '''
+    Returns the codec to encode messages with; falls back to the json codec
+    if the requested codec is unknown, not installed or needs the binary message envelope.
+    '''
+    codec = _CODECS.get(name)
+    if codec is None or not codec.is_available() or (not codec.is_text and not binary_envelope):
+        codec = _CODECS[DEFAULT_CODEC]
+    return codec
+
+def get_decoder(name):
+    '''
+    Returns the codec to decode a message that has been encoded with the named codec.
+    Any JSON text can be decoded by the json codec, so only binary codecs are strictly required.
+    '''
+    if name is None:
+        name = DEFAULT_CODEC
+    codec = _CODECS.get(name)
+    if codec is not None and codec.is_available():
+        return codec
+    if codec is not None and not codec.is_text:
+        raise Exception("Codec not available to decode message: " + name)
+    return _CODECS[DEFAULT_CODEC]
+
+register_codec(JSONCodec())
+register_codec(UJSONCodec())
+register_codec(ORJSONCodec())
+register_codec(MsgPackCodec())
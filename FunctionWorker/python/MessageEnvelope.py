@@ -0,0 +1,62 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import json
+
+from struct import pack, unpack_from
+
+# The binary message envelope carries the user data of a message next to its metadata
+# without JSON-encoding (and escaping) the user data a second time:
+# 4 bytes magic, 1 byte version, 4 bytes (uint32, big endian) metadata length,
+# the metadata as JSON text and the raw user data bytes.
+# The magic starts with a null byte, so that it can never be confused with the JSON encapsulation
+# (i.e., {"__mfnuserdata": ..., "__mfnmetadata": ...}), which is still accepted everywhere.
+# The frontend parses the same format (see Sandbox/frontend/frontend.go).
+ENVELOPE_MAGIC = b"\x00MFE"
+ENVELOPE_VERSION = 1
+ENVELOPE_HEADER_LENGTH = 9
+
+def is_binary_envelope(data):
+    return isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[0:4]) == ENVELOPE_MAGIC
+
+def pack_envelope(userdata, metadata):
+    if isinstance(userdata, str):
+        userdata = userdata.encode()
+    # the metadata may already be serialized as JSON text
+    if not isinstance(metadata, str):
+        metadata = json.dumps(metadata)
+    encoded_metadata = metadata.encode()
+    header = ENVELOPE_MAGIC + pack('!BI', ENVELOPE_VERSION, len(encoded_metadata))
+    return b"".join([header, encoded_metadata, userdata])
+
+def unpack_envelope(data):
+    '''
+    Returns the user data (as str) and the metadata (as dict) of a binary envelope.
+    The user data is decoded directly from the buffer without an intermediate copy.
+    '''
+    if len(data) < ENVELOPE_HEADER_LENGTH or bytes(data[0:4]) != ENVELOPE_MAGIC:
+        raise ValueError("Not a binary message envelope.")
+
+    version, metadata_length = unpack_from('!BI', data, 4)
+    if version != ENVELOPE_VERSION:
+        raise ValueError("Unsupported binary message envelope version: " + str(version))
+
+    userdata_offset = ENVELOPE_HEADER_LENGTH + metadata_length
+    if len(data) < userdata_offset:
+        raise ValueError("Truncated binary message envelope.")
+
+    view = memoryview(data)
+    metadata = json.loads(str(view[ENVELOPE_HEADER_LENGTH:userdata_offset], "utf-8"))
+    userdata = str(view[userdata_offset:], "utf-8")
+    return userdata, metadata
@@ -16,13 +16,17 @@
 The MicroFunctions API accessible by functions.
 '''
 
-from DataLayerClient import DataLayerClient
+from DataLayerClient import DataLayerClient, ITER_PAGE_SIZE
 from DataLayerOperator import DataLayerOperator
 from MicroFunctionsExceptions import MicroFunctionsWorkflowException, MicroFunctionsSessionAPIException, MicroFunctionsUserLogException, MicroFunctionsDataLayerException
 
 import py3utils
 import requests
 import json
+import time
+
+def _is_page_size(page_size):
+    return isinstance(page_size, int) and not isinstance(page_size, bool) and page_size > 0
 
 class MicroFunctionsAPI:
     '''
@@ -35,7 +39,7 @@ class MicroFunctionsAPI:
     - communication with other (sesssion or regular) functions during execution
     - session customization
     '''
-    def __init__(self, uid, sid, wid, funcstatename, key, publication_utils, is_session_workflow, is_session_function, session_utils, logger, datalayer, external_endpoint, internal_endpoint, useremail, usertoken):
+    def __init__(self, uid, sid, wid, funcstatename, key, publication_utils, is_session_workflow, is_session_function, session_utils, logger, datalayer, external_endpoint, internal_endpoint, useremail, usertoken, data_layer_cache_config=None, data_layer_hedge_connect=None, execution_budget_ms=None):
         '''
         Initialize data structures for MicroFunctionsAPI object created for a function instance.
 
@@ -49,6 +53,9 @@ class MicroFunctionsAPI:
             datalayer (string): host:port of the local data layer server
             external_endpoint (string): external endpoint of this sandbox
             useremail (string): email address of the user
+            data_layer_cache_config (dict): the tables to be cached in the local data layer with their TTL and maximum number of entries
+            data_layer_hedge_connect (list): host:port of the alternative data layer servers for hedged reads
+            execution_budget_ms (int): the time the instance is allowed to run; None means no limit
 
         Returns:
             None
@@ -61,7 +68,12 @@ class MicroFunctionsAPI:
         self._useremail = useremail
         self._usertoken = usertoken
 
-        self._data_layer_operator = DataLayerOperator(uid, sid, wid, self._datalayer)
+        # the data layer calls of the instance need to finish within its execution budget, if it is configured
+        self._deadline = None
+        if execution_budget_ms is not None:
+            self._deadline = time.time() + execution_budget_ms / 1000.0
+
+        self._data_layer_operator = DataLayerOperator(uid, sid, wid, self._datalayer, data_layer_cache_config, self._deadline, data_layer_hedge_connect)
 
         # for sending immediate triggers to other functions
         self._publication_utils = publication_utils
@@ -686,11 +698,14 @@ class MicroFunctionsAPI:
         Return the remaining time this function instance is allowed to continue running.
         The time is returned in milliseconds.
         This function exists for AWS Lambda compatibility.
-        As of 10.04.2018, the maximum time a function instance can execute is not limited.
-        This will change in the future.
+        The time a function instance can execute is only limited, if the workflow configures an execution budget;
+        the data layer operations of the instance then fail when it is exhausted.
+        Otherwise, 5 minutes are returned.
         '''
-        # 5 minutes always
-        return 300000
+        if self._deadline is None:
+            # 5 minutes always
+            return 300000
+        return max(0, int((self._deadline - time.time()) * 1000.0))
 
     def log(self, text, level="INFO"):
         '''
@@ -798,6 +813,31 @@ class MicroFunctionsAPI:
             errmsg = errmsg + "\nOptionally, is_private (boolean) is also accepted; default is False."
             raise MicroFunctionsDataLayerException(errmsg)
 
+    def iter_keys(self, prefix="", page_size=ITER_PAGE_SIZE, is_private=False, tableName=None):
+        '''
+        Iterate over the keys of the data items that start with a prefix.
+        The keys are fetched from the data layer page_size at a time, while the previous page is being consumed.
+        As with get(), the keys are consistent with what this function instance does with the data items.
+
+        Args:
+            prefix (string): the prefix of the keys; default: "" (i.e., all keys)
+            page_size (int): the number of keys to be fetched with a single round trip to the data layer; default: 1000
+            is_private (boolean): whether the keys should be read from the private data layer of the workflow; default: False
+            tableName (string): name of the table whose keys are to be iterated over. By default, it is the default table.
+
+        Returns:
+            Generator of the keys in sorted order
+
+        Raises:
+            MicroFunctionsDataLayerException: when the prefix is not a string or page_size is not a positive integer.
+        '''
+        if py3utils.is_string(prefix) and _is_page_size(page_size) and isinstance(is_private, bool):
+            return self._data_layer_operator.iter_keys(prefix, page_size, is_private, table=tableName)
+        else:
+            errmsg = "MicroFunctionsAPI.iter_keys(prefix) accepts a string as 'prefix'."
+            errmsg = errmsg + "\nOptionally, page_size (positive int) and is_private (boolean) are also accepted; defaults are 1000 and False."
+            raise MicroFunctionsDataLayerException(errmsg)
+
     def delete(self, key, is_private=False, is_queued=False, tableName=None):
         '''
         Alias for remove(key, is_private, is_queued, tableName).
@@ -834,6 +874,77 @@ class MicroFunctionsAPI:
             errmsg = errmsg + "\nOptionally, is_private (boolean) and is_queued (boolean) are also accepted; defaults are False."
             raise MicroFunctionsDataLayerException(errmsg)
 
+    def multi_put(self, key_value_map, is_private=False, is_queued=False, tableName=None):
+        '''
+        Store multiple data items with a single round trip to the data layer.
+        Queued puts (i.e., is_queued = True) behave like put().
+
+        Args:
+            key_value_map (dict): the (key, value) pairs of the data items
+            is_private (boolean): whether the items should be written to the private data layer of the workflow; default: False
+            is_queued (boolean): whether the put operation should be reflected on the data layer after the execution finish; default: False
+            tableName (string): name of the table where to put the keys. By default, they will be put in the default table.
+
+        Returns:
+            None
+
+        Raises:
+            MicroFunctionsDataLayerException: when the keys and/or values are not strings.
+        '''
+        if isinstance(key_value_map, dict) and py3utils.are_strings(key_value_map.keys()) and py3utils.are_strings(key_value_map.values()) and isinstance(is_private, bool) and isinstance(is_queued, bool):
+            self._data_layer_operator.multi_put(key_value_map, is_private, is_queued, table=tableName)
+        else:
+            errmsg = "MicroFunctionsAPI.multi_put(key_value_map) accepts a dict with strings as keys and values as 'key_value_map'."
+            errmsg = errmsg + "\nOptionally, is_private (boolean) and is_queued (boolean) are also accepted; defaults are False."
+            raise MicroFunctionsDataLayerException(errmsg)
+
+    def multi_get(self, keys, is_private=False, tableName=None):
+        '''
+        Load the values of multiple keys with a single round trip to the data layer.
+        As with get(), the values are consistent with what this function instance does with the data items.
+
+        Args:
+            keys (list): the keys of the data items
+            is_private (boolean): whether the items should be read from the private data layer of the workflow; default: False
+            tableName (string): name of the table where to get the keys from. By default, they will be fetched from the default table.
+
+        Returns:
+            The (key, value) pairs of the data items (dict); the keys that are not present are omitted.
+
+        Raises:
+            MicroFunctionsDataLayerException: when the keys are not strings.
+        '''
+        if isinstance(keys, (list, tuple, set)) and py3utils.are_strings(keys) and isinstance(is_private, bool):
+            return self._data_layer_operator.multi_get(keys, is_private, table=tableName)
+        else:
+            errmsg = "MicroFunctionsAPI.multi_get(keys) accepts a list of strings as 'keys'."
+            errmsg = errmsg + "\nOptionally, is_private (boolean) is also accepted; default is False."
+            raise MicroFunctionsDataLayerException(errmsg)
+
+    def multi_delete(self, keys, is_private=False, is_queued=False, tableName=None):
+        '''
+        Delete multiple data items with a single round trip to the data layer.
+        Queued deletes (i.e., is_queued = True) behave like delete().
+
+        Args:
+            keys (list): the keys of the data items
+            is_private (boolean): whether the items should be deleted from the private data layer of the workflow; default: False
+            is_queued (boolean): whether the delete operation should be reflected on the data layer after the execution finish; default: False
+            tableName (string): name of the table where to delete the keys from. By default, they will be deleted from the default table.
+
+        Returns:
+            None
+
+        Raises:
+            MicroFunctionsDataLayerException: when the keys are not strings.
+        '''
+        if isinstance(keys, (list, tuple, set)) and py3utils.are_strings(keys) and isinstance(is_private, bool) and isinstance(is_queued, bool):
+            self._data_layer_operator.multi_delete(list(keys), is_private, is_queued, table=tableName)
+        else:
+            errmsg = "MicroFunctionsAPI.multi_delete(keys) accepts a list of strings as 'keys'."
+            errmsg = errmsg + "\nOptionally, is_private (boolean) and is_queued (boolean) are also accepted; defaults are False."
+            raise MicroFunctionsDataLayerException(errmsg)
+
     # map operations sanity checking
     def createMap(self, mapname, is_private=False, is_queued=False):
         # _XXX_: the backend at the data layer does not create
@@ -932,6 +1043,74 @@ class MicroFunctionsAPI:
             errmsg = errmsg + "\nOptionally, is_private (boolean) and is_queued (boolean) are also accepted; defaults are False."
             raise MicroFunctionsDataLayerException(errmsg)
 
+    def multi_putMapEntries(self, mapname, key_value_map, is_private=False, is_queued=False):
+        '''
+        Put multiple entries into a map with a single round trip to the data layer.
+
+        Args:
+            mapname (string): the name of the map
+            key_value_map (dict): the (key, value) pairs of the entries
+            is_private (boolean): whether the map should be written to the private data layer of the workflow; default: False
+            is_queued (boolean): whether the put operation should be reflected on the data layer after the execution finish; default: False
+
+        Returns:
+            None
+
+        Raises:
+            MicroFunctionsDataLayerException: when the mapname, keys and/or values are not strings.
+        '''
+        if py3utils.is_string(mapname) and isinstance(key_value_map, dict) and py3utils.are_strings(key_value_map.keys()) and py3utils.are_strings(key_value_map.values()) and isinstance(is_private, bool) and isinstance(is_queued, bool):
+            self._data_layer_operator.multi_putMapEntries(mapname, key_value_map, is_private, is_queued)
+        else:
+            errmsg = "MicroFunctionsAPI.multi_putMapEntries(mapname, key_value_map) accepts a string as 'mapname' and a dict with strings as keys and values as 'key_value_map'."
+            errmsg = errmsg + "\nOptionally, is_private (boolean) and is_queued (boolean) are also accepted; defaults are False."
+            raise MicroFunctionsDataLayerException(errmsg)
+
+    def multi_getMapEntries(self, mapname, keys, is_private=False):
+        '''
+        Get multiple entries of a map with a single round trip to the data layer.
+
+        Args:
+            mapname (string): the name of the map
+            keys (list): the keys of the entries
+            is_private (boolean): whether the map should be read from the private data layer of the workflow; default: False
+
+        Returns:
+            The (key, value) pairs of the entries (dict); the keys that do not exist are omitted.
+
+        Raises:
+            MicroFunctionsDataLayerException: when the mapname and/or keys are not strings.
+        '''
+        if py3utils.is_string(mapname) and isinstance(keys, (list, tuple, set)) and py3utils.are_strings(keys) and isinstance(is_private, bool):
+            return self._data_layer_operator.multi_getMapEntries(mapname, keys, is_private)
+        else:
+            errmsg = "MicroFunctionsAPI.multi_getMapEntries(mapname, keys) accepts a string as 'mapname' and a list of strings as 'keys'."
+            errmsg = errmsg + "\nOptionally, is_private (boolean) is also accepted; default is False."
+            raise MicroFunctionsDataLayerException(errmsg)
+
+    def multi_deleteMapEntries(self, mapname, keys, is_private=False, is_queued=False):
+        '''
+        Delete multiple entries of a map with a single round trip to the data layer.
+
+        Args:
+            mapname (string): the name of the map
+            keys (list): the keys of the entries
+            is_private (boolean): whether the map should be written to the private data layer of the workflow; default: False
+            is_queued (boolean): whether the delete operation should be reflected on the data layer after the execution finish; default: False
+
+        Returns:
+            None
+
+        Raises:
+            MicroFunctionsDataLayerException: when the mapname and/or keys are not strings.
+        '''
+        if py3utils.is_string(mapname) and isinstance(keys, (list, tuple, set)) and py3utils.are_strings(keys) and isinstance(is_private, bool) and isinstance(is_queued, bool):
+            self._data_layer_operator.multi_deleteMapEntries(mapname, list(keys), is_private, is_queued)
+        else:
+            errmsg = "MicroFunctionsAPI.multi_deleteMapEntries(mapname, keys) accepts a string as 'mapname' and a list of strings as 'keys'."
+            errmsg = errmsg + "\nOptionally, is_private (boolean) and is_queued (boolean) are also accepted; defaults are False."
+            raise MicroFunctionsDataLayerException(errmsg)
+
     def containsMapKey(self, mapname, key, is_private=False):
         '''
         Args:
@@ -973,6 +1152,31 @@ class MicroFunctionsAPI:
             errmsg = errmsg + "\nOptionally, is_private (boolean) is also accepted; default is False."
             raise MicroFunctionsDataLayerException(errmsg)
 
+    def iter_map(self, mapname, page_size=ITER_PAGE_SIZE, is_private=False):
+        '''
+        Iterate over the entries of a map without retrieving the whole map at once (see retrieveMap()).
+        The entries are fetched from the data layer page_size at a time, while the previous page is being consumed.
+        As with retrieveMap(), the entries are consistent with what this function instance does with the map.
+
+        Args:
+            mapname (string): the name of the map to be iterated over
+            page_size (int): the number of entries to be fetched with a single round trip to the data layer; default: 1000
+            is_private (boolean): whether the map should be retrieved from the private data layer of the workflow; default: False
+
+        Returns:
+            Generator of the (key, value) pairs of the map in the order of the keys
+
+        Raises:
+            MicroFunctionsDataLayerException: when the mapname is not a string or page_size is not a positive integer.
+
+        '''
+        if py3utils.is_string(mapname) and _is_page_size(page_size) and isinstance(is_private, bool):
+            return self._data_layer_operator.iter_map(mapname, page_size, is_private)
+        else:
+            errmsg = "MicroFunctionsAPI.iter_map(mapname) accepts a string as 'mapname'."
+            errmsg = errmsg + "\nOptionally, page_size (positive int) and is_private (boolean) are also accepted; defaults are 1000 and False."
+            raise MicroFunctionsDataLayerException(errmsg)
+
     def clearMap(self, mapname, is_private=False, is_queued=False):
         '''
         Args:
@@ -1175,6 +1379,31 @@ class MicroFunctionsAPI:
             errmsg = errmsg + "\nOptionally, is_private (boolean) is also accepted; default is False."
             raise MicroFunctionsDataLayerException(errmsg)
 
+    def iter_set(self, setname, page_size=ITER_PAGE_SIZE, is_private=False):
+        '''
+        Iterate over the items of a set without retrieving the whole set at once (see retrieveSet()).
+        The items are fetched from the data layer page_size at a time, while the previous page is being consumed.
+        As with retrieveSet(), the items are consistent with what this function instance does with the set.
+
+        Args:
+            setname (string): the name of the set to be iterated over
+            page_size (int): the number of items to be fetched with a single round trip to the data layer; default: 1000
+            is_private (boolean): whether the set should be retrieved from the private data layer of the workflow; default: False
+
+        Returns:
+            Generator of the items of the set in sorted order
+
+        Raises:
+            MicroFunctionsDataLayerException: when the setname is not a string or page_size is not a positive integer.
+
+        '''
+        if py3utils.is_string(setname) and _is_page_size(page_size) and isinstance(is_private, bool):
+            return self._data_layer_operator.iter_set(setname, page_size, is_private)
+        else:
+            errmsg = "MicroFunctionsAPI.iter_set(setname) accepts a string as 'setname'."
+            errmsg = errmsg + "\nOptionally, page_size (positive int) and is_private (boolean) are also accepted; defaults are 1000 and False."
+            raise MicroFunctionsDataLayerException(errmsg)
+
     def clearSet(self, setname, is_private=False, is_queued=False):
         '''
         Args:
@@ -1372,6 +1601,100 @@ class MicroFunctionsAPI:
             errmsg = errmsg + "\nOptionally, is_private (boolean) is also accepted; default is False."
             raise MicroFunctionsDataLayerException(errmsg)
 
+    def put_async(self, key, value, is_private=False, is_queued=False, tableName=None):
+        '''
+        Asynchronous version of put(key, value, is_private, is_queued, tableName).
+        The operation runs concurrently with the function and other asynchronous operations.
+        Asynchronous operations that are still pending when the function returns
+        are waited for before the output of the function instance is published.
+
+        Returns:
+            future (concurrent.futures.Future): its result() is None;
+                it raises the exception of put() (e.g., MicroFunctionsDataLayerException), if any.
+        '''
+        return self._data_layer_operator.submit_async(self.put, key, value, is_private, is_queued, tableName)
+
+    def get_async(self, key, is_private=False, tableName=None):
+        '''
+        Asynchronous version of get(key, is_private, tableName).
+
+        Returns:
+            future (concurrent.futures.Future): its result() is the value of the data item.
+        '''
+        return self._data_layer_operator.submit_async(self.get, key, is_private, tableName)
+
+    def delete_async(self, key, is_private=False, is_queued=False, tableName=None):
+        '''
+        Asynchronous version of delete(key, is_private, is_queued, tableName).
+
+        Returns:
+            future (concurrent.futures.Future): its result() is None.
+        '''
+        return self._data_layer_operator.submit_async(self.delete, key, is_private, is_queued, tableName)
+
+    def multi_put_async(self, key_value_map, is_private=False, is_queued=False, tableName=None):
+        '''
+        Asynchronous version of multi_put(key_value_map, is_private, is_queued, tableName).
+
+        Returns:
+            future (concurrent.futures.Future): its result() is None.
+        '''
+        return self._data_layer_operator.submit_async(self.multi_put, key_value_map, is_private, is_queued, tableName)
+
+    def multi_get_async(self, keys, is_private=False, tableName=None):
+        '''
+        Asynchronous version of multi_get(keys, is_private, tableName).
+
+        Returns:
+            future (concurrent.futures.Future): its result() is the dictionary of the data items.
+        '''
+        return self._data_layer_operator.submit_async(self.multi_get, keys, is_private, tableName)
+
+    def putMapEntry_async(self, mapname, key, value, is_private=False, is_queued=False):
+        '''
+        Asynchronous version of putMapEntry(mapname, key, value, is_private, is_queued).
+
+        Returns:
+            future (concurrent.futures.Future): its result() is None.
+        '''
+        return self._data_layer_operator.submit_async(self.putMapEntry, mapname, key, value, is_private, is_queued)
+
+    def getMapEntry_async(self, mapname, key, is_private=False):
+        '''
+        Asynchronous version of getMapEntry(mapname, key, is_private).
+
+        Returns:
+            future (concurrent.futures.Future): its result() is the value of the map entry.
+        '''
+        return self._data_layer_operator.submit_async(self.getMapEntry, mapname, key, is_private)
+
+    def getCounterValue_async(self, countername, is_private=False):
+        '''
+        Asynchronous version of getCounterValue(countername, is_private).
+
+        Returns:
+            future (concurrent.futures.Future): its result() is the value of the counter.
+        '''
+        return self._data_layer_operator.submit_async(self.getCounterValue, countername, is_private)
+
+    def incrementCounter_async(self, countername, increment, is_private=False, is_queued=False):
+        '''
+        Asynchronous version of incrementCounter(countername, increment, is_private, is_queued).
+
+        Returns:
+            future (concurrent.futures.Future): its result() is None.
+        '''
+        return self._data_layer_operator.submit_async(self.incrementCounter, countername, increment, is_private, is_queued)
+
+    def decrementCounter_async(self, countername, decrement, is_private=False, is_queued=False):
+        '''
+        Asynchronous version of decrementCounter(countername, decrement, is_private, is_queued).
+
+        Returns:
+            future (concurrent.futures.Future): its result() is None.
+        '''
+        return self._data_layer_operator.submit_async(self.decrementCounter, countername, decrement, is_private, is_queued)
+
     def get_transient_data_output(self, is_private=False):
         '''
         Return the transient data, so that it can be committed to the data layer
@@ -1386,6 +1709,27 @@ class MicroFunctionsAPI:
         '''
         return self._data_layer_operator.get_data_to_be_deleted(is_private)
 
+    def _commit_queued_operations(self):
+        '''
+        Commit the queued operations to the data layer
+        when the function instance finishes.
+        '''
+        self._data_layer_operator.commit_queued_operations()
+
+    def _wait_for_async_operations(self):
+        '''
+        Wait for the pending asynchronous data layer operations
+        when the function instance finishes.
+        '''
+        self._data_layer_operator.wait_for_async_operations()
+
+    def _get_data_layer_cache_stats(self):
+        '''
+        Return the hits and misses of the data layer cache of the function instance
+        (None if no table is cached).
+        '''
+        return self._data_layer_operator.get_cache_stats()
+
     def _get_data_layer_client(self, is_private=False):
         '''
         Return the data layer client, so that it can be used to commit to the data layer
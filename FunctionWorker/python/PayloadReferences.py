@@ -0,0 +1,64 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import time
+
+# Large outputs are stored in the data layer and passed by reference (see PublicationUtils._store_payload_reference()).
+# Each reference is recorded at the locality of its value:
+# 1) in the map of its workflow execution, so that the references can be deleted when the execution finishes, and
+# 2) in the expiry bucket of the time it was stored, so that the sandbox agent deletes it after its TTL
+# (see SandboxAgent/payload_reference_sweeper.py), even if the execution never finishes (e.g., lost messages)
+# or its checkpoints are kept (i.e., the input backups point to the references).
+PAYLOAD_REF_TTL = 3600.0
+PAYLOAD_REF_BUCKET_INTERVAL = 300.0
+
+def get_payload_refs_map_name(execution_id):
+    return "payload_refs_" + execution_id
+
+def get_expiry_bucket(timestamp):
+    return int(timestamp // PAYLOAD_REF_BUCKET_INTERVAL)
+
+def get_expiry_bucket_map_name(bucket):
+    return "payload_refs_expiry_" + str(bucket)
+
+def get_last_expired_bucket(now, ttl=PAYLOAD_REF_TTL):
+    # all references in a bucket are older than the TTL once the bucket has ended before (now - ttl)
+    return get_expiry_bucket(now - ttl) - 1
+
+def record_payload_reference(dlc, execution_id, ref_key, locality):
+    dlc.putMapEntry(get_payload_refs_map_name(execution_id), ref_key, "", locality=locality)
+    dlc.putMapEntry(get_expiry_bucket_map_name(get_expiry_bucket(time.time())), ref_key, execution_id, locality=locality)
+
+def delete_execution_payload_references(dlc, execution_id, locality):
+    refs_map_name = get_payload_refs_map_name(execution_id)
+    refs = dlc.retrieveMap(refs_map_name, locality=locality)
+    if refs:
+        dlc.deleteMultiple(list(refs.keys()), locality=locality)
+    dlc.deleteMap(refs_map_name, locality=locality)
+
+def delete_expired_payload_references(dlc, bucket, locality):
+    '''
+    Delete the references that have been stored during the expiry bucket, and the maps of their executions.
+    Returns the number of the deleted references.
+    '''
+    bucket_map_name = get_expiry_bucket_map_name(bucket)
+    refs = dlc.retrieveMap(bucket_map_name, locality=locality)
+    if not refs:
+        return 0
+    dlc.deleteMultiple(list(refs.keys()), locality=locality)
+    # the later references of these executions are in later buckets
+    for execution_id in set(refs.values()):
+        dlc.deleteMap(get_payload_refs_map_name(execution_id), locality=locality)
+    dlc.deleteMap(bucket_map_name, locality=locality)
+    return len(refs)
@@ -12,21 +12,41 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
-import copy
 import json
 import time
 
 import requests
 
+from CheckpointJournal import append_checkpoint
+from ControlEvents import publish_control_event
 from DataLayerClient import DataLayerClient
+from ExecutionStopFlags import is_execution_stopped, set_execution_stopped
 from LocalQueueClient import LocalQueueClient
 from LocalQueueClientMessage import LocalQueueClientMessage
+from MessageCodecs import CODEC_METADATA_KEY, DEFAULT_CODEC, get_codec, get_decoder
+from MessageEnvelope import is_binary_envelope, pack_envelope, unpack_envelope
 from MicroFunctionsExceptions import MicroFunctionsException
+from PayloadReferences import delete_execution_payload_references, record_payload_reference
 
 import py3utils
 
+# the metadata key of the reference to an input that has been stored in the data layer instead of being sent
+PAYLOAD_REF_METADATA_KEY = "__mfn_payload_ref"
+
+class TriggerMetadata(dict):
+    '''
+    The metadata of a trigger to a next function: the metadata of the function instance (base),
+    which is shared by all triggers and not modified, and the trigger's own entries (overlay).
+    It is a (shallow) dict with all entries, but its serialization reuses the one of the base.
+    '''
+    def __init__(self, base, overlay):
+        dict.__init__(self, base)
+        self.update(overlay)
+        self.base = base
+        self.overlay = overlay
+
 class PublicationUtils():
-    def __init__(self, sandboxid, workflowid, functopic, funcruntime, wfnext, wfpotnext, wflocal, wflist, wfexit, cpon, stateutils, logger, queue, datalayer):
+    def __init__(self, sandboxid, workflowid, functopic, funcruntime, wfnext, wfpotnext, wflocal, wflist, wfexit, cpon, stateutils, logger, queue, datalayer, local_queue_client=None, backup_data_layer_client=None, fused_next_topic=None, binary_envelope=False, codec=None, payload_ref_threshold=0, checkpoint_journal=None, persist_sync_results=False):
         self._logger = logger
 
         self._function_topic = functopic
@@ -46,6 +66,27 @@ class PublicationUtils():
         # whether we should store backups of triggers before publishing the output
         self._should_checkpoint = cpon
 
+        # whether the output should be encapsulated in the binary message envelope (see MessageEnvelope)
+        # instead of the JSON encapsulation; the input is accepted in both forms
+        self._binary_envelope = binary_envelope
+
+        # the codec to encode the output with (see MessageCodecs); the input is decoded with the codec
+        # recorded in its metadata, so that states with different codecs can be chained
+        self._codec = get_codec(codec, binary_envelope)
+
+        # outputs larger than this (in bytes; 0: disabled) are stored once in the data layer
+        # and only a reference is sent to the next functions
+        self._payload_ref_threshold = payload_ref_threshold
+        self._payload_refs = []
+
+        # the local journal to append the checkpoints to (see CheckpointJournal);
+        # the sandbox agent replicates them to the data layer in the background
+        self._checkpoint_journal = checkpoint_journal
+
+        # the result of a synchronous execution goes to the waiting frontend via the exit topic,
+        # so it is only stored in the data layer if requested (asynchronous results are always stored)
+        self._persist_sync_results = persist_sync_results
+
         # the topic to send out messages to remote functions
         # TODO: pub_topic_global becomes a new request to another sandbox?
         # via header?
@@ -60,13 +101,37 @@ class PublicationUtils():
         self._local_queue_client = None
         self._datalayer = datalayer
 
+        # long-lived instance processes (i.e., the 'pool' execution mode) hand in their own clients,
+        # so that the connections are reused across instances and are not shut down after publishing
+        self._is_local_queue_client_shared = False
+        if local_queue_client is not None:
+            self._local_queue_client = local_queue_client
+            self._is_local_queue_client_shared = True
+
         self._sapi = None
 
         self._output_counter_map = {}
 
         self._dynamic_workflow = []
 
+        # the next function that is fused with this one (i.e., executed in the same process on the in-memory output)
+        # triggers to it are not sent via the local queue, but collected here as (key, raw value, metadata)
+        self._fused_next_topic = fused_next_topic
+        self._fused_triggers = []
+
+        # when not None, messages to the local queue are collected here as (topic, message)
+        # and added with a single call (see _flush_local_queue_messages)
+        self._local_queue_batch = None
+
+        # the serialization of the metadata shared by the triggers (see TriggerMetadata)
+        self._base_metadata_json = {}
+
         self._backup_data_layer_client = None
+        self._is_backup_data_layer_client_shared = False
+        if backup_data_layer_client is not None:
+            self._backup_data_layer_client = backup_data_layer_client
+            self._is_backup_data_layer_client_shared = True
+
         self._execution_info_map_name = None
         self._next_backup_list = []
 
@@ -79,14 +144,17 @@ class PublicationUtils():
     def set_metadata(self, metadata):
         self._metadata = metadata
         self._execution_info_map_name = "execution_info_map_" + self._metadata["__execution_id"]
+        self._base_metadata_json = {}
 
     def update_metadata(self, metadata_name, metadata_value, is_privileged=False):
+        self._base_metadata_json = {}
         if is_privileged:
             self._metadata[metadata_name] = metadata_value
         else:
-            if "__mfnusermetadata" not in self._metadata:
-                self._metadata["__mfnusermetadata"] = {}
-            self._metadata["__mfnusermetadata"][metadata_name] = metadata_value
+            # the metadata may be shared with the triggers of another function instance (e.g., fused), so don't update in place
+            user_metadata = dict(self._metadata.get("__mfnusermetadata", {}))
+            user_metadata[metadata_name] = metadata_value
+            self._metadata["__mfnusermetadata"] = user_metadata
 
     def _get_local_queue_client(self):
         if self._local_queue_client is None:
@@ -94,17 +162,17 @@ class PublicationUtils():
         return self._local_queue_client
 
     def _shutdown_local_queue_client(self):
-        if self._local_queue_client is not None:
+        if self._local_queue_client is not None and not self._is_local_queue_client_shared:
             self._local_queue_client.shutdown()
 
     def get_backup_data_layer_client(self):
         if self._backup_data_layer_client is None:
             # locality = -1 means that the writes happen to the local data layer first and then asynchronously to the global data layer
-            self._backup_data_layer_client = DataLayerClient(locality=-1, for_mfn=True, sid=self._sandboxid, connect=self._datalayer)
+            self._backup_data_layer_client = DataLayerClient(locality=-1, for_mfn=True, sid=self._sandboxid, connect=self._datalayer, pooled=True)
         return self._backup_data_layer_client
 
     def shutdown_backup_data_layer_client(self):
-        if self._backup_data_layer_client is not None:
+        if self._backup_data_layer_client is not None and not self._is_backup_data_layer_client_shared:
             self._backup_data_layer_client.shutdown()
 
     def convert_api_message_to_python_object(self, message):
@@ -175,7 +243,13 @@ class PublicationUtils():
 
         return is_valid, is_privileged, errmsg
 
-    def decode_input(self, encoded_input):
+    def decode_input(self, encoded_input, metadata=None):
+        codec_name = None
+        if metadata is not None:
+            codec_name = metadata.get(CODEC_METADATA_KEY)
+            if PAYLOAD_REF_METADATA_KEY in metadata:
+                # the previous function passed the (large) input by reference
+                encoded_input = self._resolve_payload_reference(metadata[PAYLOAD_REF_METADATA_KEY])
         if encoded_input == '':
             encoded_input = '{}'
         #if isinstance(encoded_input,dict):
@@ -190,7 +264,7 @@ class PublicationUtils():
         #self._logger.debug("received user input in decode_input: " + str(encoded_input))
         try:
            #if isinstance(encoded_input,str):
-            raw_state_input = json.loads(encoded_input)
+            raw_state_input = get_decoder(codec_name).decode(encoded_input)
             #if isinstance(encoded_input,dict):
             #    raw_state_input = encoded_input
             return raw_state_input
@@ -202,10 +276,18 @@ class PublicationUtils():
 
     def encode_output(self, raw_state_output):
         #Produce output JSON Text from raw_state_output
+        #(or bytes, if the codec is a binary one)
         try:
-            value_output = json.dumps(raw_state_output)
+            value_output = self._codec.encode(raw_state_output)
             return value_output
         except Exception as exc:
+            if self._codec.name != DEFAULT_CODEC:
+                # fall back to json for this output (e.g., types that the codec doesn't support)
+                self._logger.warning("Codec %s could not encode state output, falling back to %s: %s", self._codec.name, DEFAULT_CODEC, str(exc))
+                try:
+                    return json.dumps(raw_state_output)
+                except Exception as exc2:
+                    raise Exception("Error while encoding state output: " + str(exc2))
             #self._logger.exception("Error while encoding state output")
             #self._logger.exception(exc)
             raise Exception("Error while encoding state output: " + str(exc))
@@ -216,8 +298,14 @@ class PublicationUtils():
         # "__mfnmetadata": system_specific_metadata }
         # This encapsulation is invisible to the user and is added,
         # maintained, and removed by the frontend and function worker.
+        # Alternatively, the input is a binary message envelope (see MessageEnvelope).
 
-        if encoded_encapsulated_input == '':
+        if is_binary_envelope(encoded_encapsulated_input):
+            try:
+                return unpack_envelope(encoded_encapsulated_input)
+            except Exception as exc:
+                raise MicroFunctionsException("Unable to decode encapsulated user input: " + str(exc))
+        elif encoded_encapsulated_input == '':
             #self._logger.exception("Invalid encapsulation of user input")
             raise MicroFunctionsException("Invalid encapsulation of user input.")
         else:
@@ -231,16 +319,120 @@ class PublicationUtils():
                 #self._logger.exception(e)
                 raise MicroFunctionsException("Unable to decode encapsulated user input: " + str(exc))
 
-    def encapsulate_output(self, encoded_state_output, metadata):
+    def encapsulate_output(self, encoded_state_output, metadata, binary_envelope=None, payload_ref=None):
+        if binary_envelope is None:
+            binary_envelope = self._binary_envelope
         try:
-            value = {"__mfnuserdata": encoded_state_output, "__mfnmetadata":  metadata}
-            value_output = json.dumps(value)
+            if not binary_envelope and payload_ref is None:
+                encoded_state_output = self.get_json_output(encoded_state_output)
+            metadata_json = self._get_message_metadata_json(encoded_state_output, metadata, payload_ref)
+            if payload_ref is not None:
+                # the output has been stored in the data layer; only the reference is sent
+                encoded_state_output = ""
+            if binary_envelope:
+                return pack_envelope(encoded_state_output, metadata_json)
+            # same as json.dumps({"__mfnuserdata": ..., "__mfnmetadata": ...}) without serializing the metadata again
+            value_output = '{"__mfnuserdata": ' + json.dumps(encoded_state_output) + ', "__mfnmetadata": ' + metadata_json + '}'
             return value_output
         except Exception as exc:
             #self._logger.exception("Error while encoding state output")
             #self._logger.exception(e)
             raise MicroFunctionsException("Error while encoding state output: " + str(exc))
 
+    def get_json_output(self, encoded_state_output):
+        # the output as JSON Text, where it leaves the function workers
+        # (e.g., the workflow result, parallel branch outputs, messages embedded in JSON)
+        if isinstance(encoded_state_output, str):
+            return encoded_state_output
+        return json.dumps(self._codec.decode(encoded_state_output))
+
+    def _get_message_metadata(self, encoded_state_output, metadata, payload_ref=None):
+        # JSON Text (str) may also come from the json fallback of a binary codec
+        codec_name = self._codec.name
+        if isinstance(encoded_state_output, str) and not self._codec.is_text:
+            codec_name = DEFAULT_CODEC
+
+        # the metadata of the input is passed on to the outputs, so remove the input's entries
+        if codec_name == DEFAULT_CODEC and payload_ref is None:
+            if CODEC_METADATA_KEY not in metadata and PAYLOAD_REF_METADATA_KEY not in metadata:
+                return metadata
+        metadata = dict(metadata)
+        metadata.pop(CODEC_METADATA_KEY, None)
+        metadata.pop(PAYLOAD_REF_METADATA_KEY, None)
+        if codec_name != DEFAULT_CODEC:
+            metadata[CODEC_METADATA_KEY] = codec_name
+        if payload_ref is not None:
+            metadata[PAYLOAD_REF_METADATA_KEY] = payload_ref
+        return metadata
+
+    def _get_message_metadata_json(self, encoded_state_output, metadata, payload_ref=None):
+        if not isinstance(metadata, TriggerMetadata) or metadata.base is not self._metadata:
+            return json.dumps(self._get_message_metadata(encoded_state_output, metadata, payload_ref))
+
+        # serialize the base once for all triggers and only the overlay (incl. codec and payload reference) per trigger
+        overlay = self._get_message_metadata(encoded_state_output, metadata.overlay, payload_ref)
+        base_key = tuple(sorted(metadata.overlay.keys()))
+        if base_key not in self._base_metadata_json:
+            excluded_keys = set(base_key) | set([CODEC_METADATA_KEY, PAYLOAD_REF_METADATA_KEY])
+            base = {key: value for key, value in metadata.base.items() if key not in excluded_keys}
+            self._base_metadata_json[base_key] = json.dumps(base)
+        base_json = self._base_metadata_json[base_key]
+
+        overlay_json = json.dumps(overlay)
+        if overlay_json == "{}":
+            return base_json
+        if base_json == "{}":
+            return overlay_json
+        return base_json[:-1] + ", " + overlay_json[1:]
+
+    def _should_persist_result(self):
+        return self._persist_sync_results or self._metadata.get("__async_execution", True)
+
+    def _store_payload_reference(self, encoded_state_output, is_local):
+        # store a large output only once per locality, even if it is sent to multiple next functions
+        # local next functions read it from the local data layer; others from the global one
+        locality = 0 if is_local else 1
+        for stored_output, payload_ref in self._payload_refs:
+            if stored_output is encoded_state_output and payload_ref["locality"] == locality:
+                return payload_ref
+
+        ref_key = "payload_" + self._metadata["__function_execution_id"] + "_" + self._function_topic + "_" + str(len(self._payload_refs))
+        dlc = self.get_backup_data_layer_client()
+        dlc.put(ref_key, encoded_state_output, locality=locality)
+        # keep track of the reference, so that it is deleted when the workflow execution finishes or after its TTL
+        record_payload_reference(dlc, self._metadata["__execution_id"], ref_key, locality)
+
+        payload_ref = {"key": ref_key, "locality": locality}
+        self._payload_refs.append((encoded_state_output, payload_ref))
+        return payload_ref
+
+    def _resolve_payload_reference(self, payload_ref):
+        dlc = self.get_backup_data_layer_client()
+        # all codecs can decode bytes
+        encoded_input = dlc.get(payload_ref["key"], locality=payload_ref["locality"], raw=True)
+        if encoded_input is None:
+            raise Exception("Input passed by reference not found: " + payload_ref["key"])
+        return encoded_input
+
+    def _exceeds_payload_ref_threshold(self, encoded_state_output):
+        # the threshold is in bytes; a str only needs to be encoded when its length alone does not decide
+        if len(encoded_state_output) > self._payload_ref_threshold:
+            return True
+        if isinstance(encoded_state_output, bytes) or len(encoded_state_output) * 4 <= self._payload_ref_threshold:
+            return False
+        return len(encoded_state_output.encode("utf-8")) > self._payload_ref_threshold
+
+    def _delete_payload_references(self):
+        # called when the workflow execution finishes (i.e., publishing to the workflow exit, also with an error)
+        # or when publishing is skipped because the execution has been stopped
+        # with checkpointing, the input backups point to the references, so they are only deleted after their TTL
+        # (i.e., by the sandbox agent; see PayloadReferences)
+        if self._should_checkpoint:
+            return
+        dlc = self.get_backup_data_layer_client()
+        for locality in [0, 1]:
+            delete_execution_payload_references(dlc, self._metadata["__execution_id"], locality)
+
     def get_dynamic_workflow(self):
         '''
         Return the dynamically generated workflow information,
@@ -255,36 +447,20 @@ class PublicationUtils():
         trigger["value"] = self.encode_output(trigger["value"])
         self._dynamic_workflow.append(trigger)
 
-    def _convert_function_output_static_workflow(self, function_output):
+    def get_fused_triggers(self):
+        return self._fused_triggers
+
+    def _convert_function_output_static_workflow(self, function_output, raw_function_output=None):
         converted_function_output = []
         for wfnext in self._wf_next:
-            converted_function_output.append({"next": wfnext, "value": function_output})
+            trigger = {"next": wfnext, "value": function_output}
+            if self._fused_next_topic is not None and self._prefix + wfnext == self._fused_next_topic:
+                trigger["raw_value"] = raw_function_output
+            converted_function_output.append(trigger)
         return converted_function_output
 
     def _store_output_data(self):
-        data_out = self._sapi.get_transient_data_output()
-        to_be_deleted = self._sapi.get_data_to_be_deleted()
-
-        if data_out or to_be_deleted:
-            dlc = self._sapi._get_data_layer_client()
-
-            for k in data_out:
-                dlc.put(k, data_out.get(k))
-
-            for k in to_be_deleted:
-                dlc.delete(k)
-
-        data_out_private = self._sapi.get_transient_data_output(is_private=True)
-        to_be_deleted_private = self._sapi.get_data_to_be_deleted(is_private=True)
-
-        if data_out_private or to_be_deleted_private:
-            dlc_private = self._sapi._get_data_layer_client(is_private=True)
-
-            for k in data_out_private:
-                dlc_private.put(k, data_out_private.get(k))
-
-            for k in to_be_deleted_private:
-                dlc_private.delete(k)
+        self._sapi._commit_queued_operations()
 
         self._sapi._shutdown_data_layer_client()
 
@@ -293,11 +469,23 @@ class PublicationUtils():
         # and send it to the local queue topic via the local queue client
         lqcm = LocalQueueClientMessage(key=key, value=value)
 
+        if self._local_queue_batch is not None:
+            self._local_queue_batch.append((lqtopic, lqcm))
+            return
+
         #lqcpub.addMessage(lqtopic, lqcm, False)
         ack = lqcpub.addMessage(lqtopic, lqcm, True)
         while not ack:
             ack = lqcpub.addMessage(lqtopic, lqcm, True)
 
+    def _flush_local_queue_messages(self, lqcpub):
+        pending = self._local_queue_batch
+        self._local_queue_batch = None
+        # retry only the messages that could not be added
+        while pending:
+            statuses = lqcpub.addMessages(pending)
+            pending = [topic_lqcm for topic_lqcm, ack in zip(pending, statuses) if not ack]
+
     def _send_remote_message(self, remote_address, message_type, lqtopic, key, value):
         # form a http request to send to remote host
         # need to set async=true in request URL, so that the frontend does not have a sync object waiting
@@ -339,7 +527,8 @@ class PublicationUtils():
             metadata["__async_execution"] = self._metadata["__async_execution"]
             output["topicNext"] = next
 
-        output["value"] = self.encapsulate_output(function_output["value"], metadata)
+        # this output is embedded in a JSON message, so it cannot be a binary envelope
+        output["value"] = self.encapsulate_output(function_output["value"], metadata, binary_envelope=False)
 
         outkey = self._metadata["__execution_id"]
         # publish to pub manager's separate queue for global next
@@ -358,8 +547,8 @@ class PublicationUtils():
         next_function_execution_id = self._metadata["__function_execution_id"] + "_" + str(output_instance_id)
         self._output_counter_map[topic_next] += 1
 
-        trigger_metadata = copy.deepcopy(self._metadata)
-        trigger_metadata["__function_execution_id"] = next_function_execution_id
+        # no copy of the (shared) metadata of this function instance; only the entries that differ per trigger
+        trigger_metadata = TriggerMetadata(self._metadata, {"__function_execution_id": next_function_execution_id})
 
         #self._logger.debug("trigger metadata: " + str(trigger_metadata))
 
@@ -382,7 +571,7 @@ class PublicationUtils():
                 self._send_local_queue_message(lqcpub, next, key, trigger["value"])
             else:
                 # send it to the remote host with a special header
-                self._send_remote_message(trigger["remote_address"], "session_update", next, key, trigger["value"])
+                self._send_remote_message(trigger["remote_address"], "session_update", next, key, self.get_json_output(trigger["value"]))
             return (None, None)
         elif "is_privileged" in trigger and trigger["is_privileged"]:
             # next[0:6] == "async_"
@@ -396,7 +585,25 @@ class PublicationUtils():
 
             next_function_execution_id, trigger_metadata = self._generate_trigger_metadata(topic_next)
 
-            output["value"] = self.encapsulate_output(trigger["value"], trigger_metadata)
+            if topic_next == self._fused_next_topic and "raw_value" in trigger:
+                # the next function will be executed in this process on the in-memory output
+                if timestamp_map is not None:
+                    timestamp_map['t_pub_fused'] = time.time() * 1000.0
+                self._fused_triggers.append((key, trigger["raw_value"], trigger_metadata))
+                # only needed for the input backup of the next function
+                if self._should_checkpoint:
+                    output["value"] = self.encapsulate_output(trigger["value"], trigger_metadata)
+                return (next_function_execution_id, output)
+
+            payload_ref = None
+            if next == self._wf_exit:
+                # the frontend hands the workflow result to the client as is
+                trigger["value"] = self.get_json_output(trigger["value"])
+            elif self._payload_ref_threshold > 0 and self._exceeds_payload_ref_threshold(trigger["value"]):
+                if timestamp_map is not None:
+                    timestamp_map['t_pub_payloadref'] = time.time() * 1000.0
+                payload_ref = self._store_payload_reference(trigger["value"], topic_next in self._wf_local)
+            output["value"] = self.encapsulate_output(trigger["value"], trigger_metadata, payload_ref=payload_ref)
 
             # check whether next is local or not
             if topic_next in self._wf_local:
@@ -413,10 +620,10 @@ class PublicationUtils():
                     if self._metadata["__execution_id"] != key:
                         key = self._metadata["__execution_id"]
 
-                    dlc = self.get_backup_data_layer_client()
-
                     # store the workflow's final result
-                    dlc.put("result_" + key, output["value"])
+                    if self._should_persist_result():
+                        dlc = self.get_backup_data_layer_client()
+                        dlc.put("result_" + key, output["value"])
                     #self._logger.debug("[__mfn_backup] [exitresult] [%s] %s", "result_" + key, output["value"])
 
                     # _XXX_: this is not handled properly by the frontend
@@ -430,6 +637,10 @@ class PublicationUtils():
                     timestamp_map['exitsize'] = len(output["value"])
                 self._send_local_queue_message(lqcpub, topic_next, key, output["value"])
 
+                # after the result has been sent, so that it is not delayed
+                if isExitTopic and self._payload_ref_threshold > 0:
+                    self._delete_payload_references()
+
             return (next_function_execution_id, output)
 
     def _store_trigger_backups(self, dlc, input_backup_map, current_function_instance_id, store_next_backup_list=False):
@@ -438,9 +649,8 @@ class PublicationUtils():
         # use this set to describe the execution details
 
         if self._execution_info_map_name is not None:
-            # dump the backups into the data layer
-            for input_backup_key in input_backup_map:
-                dlc.putMapEntry(self._execution_info_map_name, input_backup_key, input_backup_map[input_backup_key])
+            # dump the backups into the data layer with a single call
+            backup_entries = dict(input_backup_map)
 
             # if there is any new next, store them
             # if a next was generated by sending a message immediately,
@@ -450,7 +660,26 @@ class PublicationUtils():
             # at the end of execution, they will have been appended to our list
             # in memory and we will store the backup once for the entire list
             if store_next_backup_list:
-                dlc.putMapEntry(self._execution_info_map_name, "next_" + current_function_instance_id, json.dumps(self._next_backup_list))
+                backup_entries["next_" + current_function_instance_id] = json.dumps(self._next_backup_list)
+
+            if self._checkpoint_journal is not None and backup_entries:
+                append_checkpoint(self._checkpoint_journal, self._execution_info_map_name, backup_entries)
+            elif len(backup_entries) == 1:
+                for backup_key in backup_entries:
+                    dlc.putMapEntry(self._execution_info_map_name, backup_key, backup_entries[backup_key])
+            elif backup_entries:
+                dlc.putMapEntries(self._execution_info_map_name, backup_entries)
+
+    def _publish_stop_event(self, key):
+        # the function workers of all sandboxes of the workflow set the stop flag when they get the event
+        stop = {}
+        stop["action"] = "stop-execution"
+        stop["executionId"] = key
+        dlc = DataLayerClient(locality=1, for_mfn=True, sid=self._sandboxid, connect=self._datalayer, pooled=True)
+        try:
+            publish_control_event(dlc, stop)
+        finally:
+            dlc.shutdown()
 
     def _send_message_to_recovery_manager(self, key, message_type, topic, func_exec_id, has_error, error_type, lqcpub):
         return
@@ -512,9 +741,15 @@ class PublicationUtils():
     # publish directly to the next function's topic, accumulate backups
     # publish backups at the end with a 'fin' flag, which also indicates that all have been published
     # also, handle global queue events
-    def publish_output_direct(self, key, value_output, has_error, error_type, timestamp_map):
+    def publish_output_direct(self, key, value_output, has_error, error_type, timestamp_map, raw_state_output=None):
         timestamp_map["t_pub_start"] = timestamp_map["t_start_pub"] = time.time() * 1000.0
 
+        # the effects of the asynchronous data layer operations of the function
+        # need to be visible before the next functions are triggered
+        if self._sapi is not None:
+            timestamp_map["t_start_asyncwait"] = time.time() * 1000.0
+            self._sapi._wait_for_async_operations()
+
         # if we already have a local queue client (because of immediately sent messages) and backup data layer client,
         # re-use them
         # if not, then the call to get them will initialize them
@@ -532,9 +767,13 @@ class PublicationUtils():
             timestamp_map["t_start_dlcbackup"] = time.time() * 1000.0
             dlc = self.get_backup_data_layer_client()
 
-            # set data layer flag to stop further execution of function instances
+            # set the flag to stop further execution of function instances
             # that may have been triggered concurrently via a new message
+            # the function workers in this sandbox check the shared stop flags;
+            # the ones in the other sandboxes of the workflow set them when they get the stop event
+            set_execution_stopped(key)
             dlc.put("workflow_execution_stop_" + key, "1")
+            self._publish_stop_event(key)
 
             # dump the result into the data layer
             result = {}
@@ -559,7 +798,8 @@ class PublicationUtils():
 
             # store the workflow's final result
             # which has been encapsulated
-            dlc.put("result_" + key, output["value"])
+            if self._should_persist_result():
+                dlc.put("result_" + key, output["value"])
             timestamp_map["hasError"] = True
 
         else:
@@ -573,8 +813,10 @@ class PublicationUtils():
 
                 #dlc.put("result_" + current_function_instance_id, encapsulated_value_output)
                 timestamp_map["t_start_resultmap"] = time.time() * 1000.0
-                dlc.putMapEntry(self._execution_info_map_name, "result_" + current_function_instance_id, encapsulated_value_output)
-                #self._logger.debug("[__mfn_backup] [%s] [%s] %s", self._execution_info_map_name, "result_" + current_function_instance_id, encapsulated_value_output)
+                # the result is stored together with the input backups of the next functions
+                # (i.e., a single data layer call per function instance)
+                checkpoint_entries = {}
+                checkpoint_entries["result_" + current_function_instance_id] = encapsulated_value_output
 
             timestamp_map["t_start_storeoutput"] = time.time() * 1000.0
             # store self._sapi.transient_output into the data layer
@@ -584,7 +826,7 @@ class PublicationUtils():
             # use here the original output:
             # we'll update the metadata separately for each trigger and encapsulate the output with it
             timestamp_map["t_start_generatenextlist"] = time.time() * 1000.0
-            converted_function_output = self._convert_function_output_static_workflow(value_output)
+            converted_function_output = self._convert_function_output_static_workflow(value_output, raw_state_output)
             choice_next_list = self._state_utils.getChoiceResults(value_output)
             converted_function_output = converted_function_output + self._dynamic_workflow + choice_next_list
 
@@ -596,16 +838,18 @@ class PublicationUtils():
 
             if check_error_flag:
                 timestamp_map["t_start_dlcbackup_err"] = time.time() * 1000.0
-                dlc = self.get_backup_data_layer_client()
                 # check the workflow stop flag
                 # if some other function execution had an error and we had been
                 # simultaneously triggered, we can finish but don't need to publish
                 # to the next function in the workflow, so we can stop execution of the workflow
                 timestamp_map["t_start_dlcbackup_err_flag"] = time.time() * 1000.0
-                workflow_exec_stop = dlc.get("workflow_execution_stop_" + key, locality=0)
-                if workflow_exec_stop is not None and workflow_exec_stop != "":
+                if is_execution_stopped(key):
                     self._logger.info("Not continuing because workflow execution has been stopped... %s", key)
                     continue_publish_flag = False
+                    # the exit may have already been published (e.g., by the function with the error),
+                    # so the references stored since then would not be deleted otherwise
+                    if self._payload_ref_threshold > 0:
+                        self._delete_payload_references()
 
             # if we didn't have to check the error, or we checked it, but there was not one, then continue publishing the output
             # to the next functions
@@ -618,25 +862,33 @@ class PublicationUtils():
 
                 if self._should_checkpoint:
                     # we are going to accummulate any input backups in this map
-                    input_backup_map = {}
+                    input_backup_map = checkpoint_entries
                     # we are going to accummulate any new starting functions in this map
                     starting_next = {}
 
                 timestamp_map["t_start_pubnextlist"] = time.time() * 1000.0
                 any_next = False
-                # parse the converted_function_output to determine the next and publish directly
-                for function_output in converted_function_output:
-                    next_function_execution_id, output = self._publish_output(key, function_output, lqcpub, timestamp_map)
-                    if self._should_checkpoint:
-                        if next_function_execution_id is not None and output is not None:
-                            # here, output MUST contain "topicNext" and "value"; otherwise,
-                            # we wouldn't have been able to publish it in publish_output()
-                            # use the updated topicNext for globally published messages
-                            starting_next[next_function_execution_id] = output["topicNext"]
-                            next_function_instance_id = next_function_execution_id + "_" + output["topicNext"]
-                            input_backup_map["input_" + next_function_instance_id] = output["value"]
-                            self._next_backup_list.append(next_function_instance_id)
-                            any_next = True
+                # with multiple next (e.g., a fan-out via dynamic next), add all messages to the local queue with a single call
+                if len(converted_function_output) > 1:
+                    self._local_queue_batch = []
+                try:
+                    # parse the converted_function_output to determine the next and publish directly
+                    for function_output in converted_function_output:
+                        next_function_execution_id, output = self._publish_output(key, function_output, lqcpub, timestamp_map)
+                        if self._should_checkpoint:
+                            if next_function_execution_id is not None and output is not None:
+                                # here, output MUST contain "topicNext" and "value"; otherwise,
+                                # we wouldn't have been able to publish it in publish_output()
+                                # use the updated topicNext for globally published messages
+                                starting_next[next_function_execution_id] = output["topicNext"]
+                                next_function_instance_id = next_function_execution_id + "_" + output["topicNext"]
+                                input_backup_map["input_" + next_function_instance_id] = output["value"]
+                                self._next_backup_list.append(next_function_instance_id)
+                                any_next = True
+                finally:
+                    if self._local_queue_batch is not None:
+                        timestamp_map["t_start_pubbatch"] = time.time() * 1000.0
+                        self._flush_local_queue_messages(lqcpub)
 
                 if self._should_checkpoint:
                     timestamp_map["t_start_backtrigger"] = time.time() * 1000.0
@@ -647,6 +899,10 @@ class PublicationUtils():
                         next_func_topic = starting_next[next_func_exec_id]
                         self._send_message_to_recovery_manager(key, "start", next_func_topic, next_func_exec_id, False, "", lqcpub)
 
+            elif self._should_checkpoint:
+                # not publishing to the next functions; only the result needs to be stored
+                self._store_trigger_backups(dlc, checkpoint_entries, current_function_instance_id)
+
         if self._should_checkpoint:
             # regardless whether this function execution had an error or not, we are finished and need to let the recovery manager know
             self._send_message_to_recovery_manager(key, "finish", self._function_topic, self._metadata["__function_execution_id"], has_error, error_type, lqcpub)
@@ -214,7 +214,7 @@ class SessionHelperThread(threading.Thread):
         # check if the message is in json
         is_json = True
         try:
-            msg = json.loads(value)
+            msg = self._publication_utils.decode_input(value, metadata)
             #self._logger.debug("[SessionHelperThread] decoded value: " + str(msg))
         except Exception as exc:
             is_json = False
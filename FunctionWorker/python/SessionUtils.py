@@ -52,7 +52,7 @@ class SessionUtils:
 
         self._helper_thread = None
 
-        self._global_data_layer_client = DataLayerClient(locality=1, sid=sid, for_mfn=True, connect=self._datalayer)
+        self._global_data_layer_client = DataLayerClient(locality=1, sid=sid, for_mfn=True, connect=self._datalayer, pooled=True)
 
         # only valid if this is a session function (i.e., session_function_id is not None)
         self._local_topic_communication = None
@@ -13,6 +13,7 @@
 #   limitations under the License.
 
 import ast
+import asyncio
 import copy
 from datetime import datetime
 import json
@@ -82,6 +83,9 @@ class StateUtils:
         self.catcher_list = []
         self.retry_list = []
 
+        # if set, coroutines returned by 'async def' handlers are awaited on this (already running) loop
+        self._event_loop = None
+
         self._logger = logger
         self.parse_function_state_info()
 
@@ -111,6 +115,27 @@ class StateUtils:
         return ret_max_attempts, ret_interval_seconds, ret_backoff_rate
 
 
+    def set_event_loop(self, loop):
+        self._event_loop = loop
+
+    def get_instance_copy(self):
+        # for the in-process execution modes: share the parsed state definition,
+        # but keep the changes during an instance's execution (e.g., by a catcher) separate
+        state_utils = copy.copy(self)
+        state_utils.result_path_dict = copy.copy(self.result_path_dict)
+        state_utils.choiceNext = ''
+        return state_utils
+
+    def _run_coroutine(self, coro):
+        if self._event_loop is not None:
+            return asyncio.run_coroutine_threadsafe(coro, self._event_loop).result()
+        # no shared loop (e.g., fork and thread modes); use a loop just for this instance
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
     def isTaskState(self):
         return self.functionstatetype == StateUtils.taskStateType or self.functionstatetype == StateUtils.defaultStateType
 
@@ -204,6 +229,8 @@ class StateUtils:
             func = exec_arguments["function"]
             args = exec_arguments["function_input"]
             function_output = func(args, sapi)
+            if asyncio.iscoroutine(function_output):
+                function_output = self._run_coroutine(function_output)
 
         elif runtime == "java":
             # open the API server for this request
@@ -331,6 +358,76 @@ class StateUtils:
             ret_value = self._exec_function(runtime, exec_arguments, sapi)
             return ret_value
 
+    async def _exec_function_async(self, exec_arguments, sapi):
+        func = exec_arguments["function"]
+        args = exec_arguments["function_input"]
+        return await func(args, sapi)
+
+    async def exec_function_catch_retry_async(self, exec_arguments, sapi):
+        # same as exec_function_catch_retry(), but for 'async def' python handlers:
+        # awaited on the caller's event loop, so that no thread is held while waiting (e.g., for the retry delay)
+        retryer = self.retry_list
+        catcher = self.catcher_list
+        ret_error_list = []
+        ret_value = []
+
+        for ret in retryer:
+            ret_error_list = ret['ErrorEquals']
+
+            self._logger.debug("[StateUtils] found a ASL workflow retryer, retry for: " + str(ret_error_list))
+            try:
+                ret_value = await self._exec_function_async(exec_arguments, sapi)
+                return ret_value
+            except Exception as exc:
+                self._logger.debug("[StateUtils] retryer just caught an error: " + ", " + str(exc) + ", " + str(exc.__class__.__name__) + ", " + str(retryer))
+                ret_max_attempts, ret_interval_seconds, ret_backoff_rate = self.find_ret_data(exc, retryer) # get the retry data for this error
+                delay = int(ret_interval_seconds)
+                max_attempts = int(ret_max_attempts)
+                backoff_rate = float(ret_backoff_rate)
+
+                # start retrying on this error
+                while max_attempts:
+                    try:
+                        ret_value = await self._exec_function_async(exec_arguments, sapi)
+                        return ret_value
+                    except Exception as e_retry:
+                        if (any(str(e_retry) in s0 for s0 in ret_error_list) or any(e_retry.__class__.__name__ in s1 for s1 in ret_error_list)):
+                            self._logger.debug("[StateUtils] MFn ASL retryer just caught an error:" + str(e_retry) + str(retryer))
+                            self._logger.debug("[StateUtils] retrying for Error: " + str(e_retry) + ", remaining attempts: " + str(max_attempts))
+                    max_attempts -= 1
+                if not max_attempts:
+                    ret_value = {"Error": str(exc), "Cause": "Error not caught by MFn ASL Workflow retryer"}
+                    self._logger.error("[StateUtils] Error not caught by MFn ASL Workflow retryer!")
+                    return ret_value
+
+            self._logger.warning('%s, retrying in %s seconds... ' % (e_retry, str(delay)))
+            await asyncio.sleep(delay)
+            delay *= backoff_rate
+
+        if catcher:
+            self._logger.debug("[StateUtils] found a ASL workflow catcher")
+            # there was no retry information provided for this function, proceed with catch
+            ret_value = {"Error": "Catcher", "Cause": "error caught by MFn ASL Workflow catcher"}
+            try:
+                ret_value = await self._exec_function_async(exec_arguments, sapi)
+                return ret_value
+            except Exception as exc:
+                exc_msg = str(exc)
+                self._logger.error("[StateUtils] catcher just caught an error: " + exc_msg + " " + str(catcher))
+                cat_next, cat_result = self.find_cat_data(exc, catcher)
+                if cat_next != []:
+                    self._logger.error("[StateUtils] matching catch list entry target and result for this error: " + str(cat_next) + " " + str(cat_result))
+                    self.result_path_dict['ResultPath'] = cat_result
+                    ret_value = {"Error": exc_msg, "Cause": "this error caught by MFn ASL Workflow catcher!"}
+                    sapi.add_dynamic_next(cat_next, exc_msg)
+                    return ret_value
+                else: # no catcher could be found for this error
+                    self._logger.error("[StateUtils] Error not caught by MFn ASL Workflow catcher!")
+                    raise exc
+        else: # neither catcher nor retryers are set
+            ret_value = await self._exec_function_async(exec_arguments, sapi)
+            return ret_value
+
     def getChoiceResults(self, value_output):
         choice_next_list = []
         #self._logger.debug("[StateUtils] getChoiceResults Inputs: " + str(self.choiceNext) + str(self.functionstatetype))
@@ -382,8 +479,17 @@ class StateUtils:
         parallelInfo["FunctionTopic"] = self.functiontopic
         parallelInfo["Endpoint"] = self._internal_endpoint
 
+        # the full parallelInfo (e.g., the branch output keys) is only stored with the workflow instance metadata for the post-parallel processing
+        # the metadata passed along with every message in the branches only has what the branch terminal states need
+        parallelInfoCompact = {}
+        parallelInfoCompact["CounterName"] = CounterName
+        parallelInfoCompact["BranchOutputKeyPrefix"] = name_prefix + "_branch_"
+        parallelInfoCompact["BranchOutputKeysSetKey"] = workflow_instance_outputkeys_set_key
+
         parallelInfo_key = self.functionstatename + "_" + key + "_parallel_info"
-        metadata[parallelInfo_key] = parallelInfo
+        metadata[parallelInfo_key] = parallelInfoCompact
+        stored_metadata = dict(metadata)
+        stored_metadata[parallelInfo_key] = parallelInfo
 
         #self._logger.debug("[StateUtils] evaluateParallelState: ")
         #self._logger.debug("\t CounterName:" + CounterName)
@@ -395,7 +501,7 @@ class StateUtils:
 
         assert py3utils.is_string(CounterName)
         try:
-            dlc = DataLayerClient(locality=1, suid=self._storage_userid, is_wf_private=False, connect=self._datalayer)
+            dlc = DataLayerClient(locality=1, suid=self._storage_userid, is_wf_private=False, connect=self._datalayer, pooled=True)
 
             # create a triggerable counter to start the post-parallel when parallel state finishes
             dlc.createCounter(CounterName, 0, tableName=dlc.countertriggerstable)
@@ -410,7 +516,7 @@ class StateUtils:
             dlc.shutdown()
 
         assert py3utils.is_string(workflow_instance_metadata_storage_key)
-        sapi.put(workflow_instance_metadata_storage_key, json.dumps(metadata))
+        sapi.put(workflow_instance_metadata_storage_key, json.dumps(stored_metadata))
 
         assert py3utils.is_string(workflow_instance_outputkeys_set_key)
         sapi.createSet(workflow_instance_outputkeys_set_key)
@@ -448,8 +554,11 @@ class StateUtils:
                 parallelInfo = metadata[parallelInfoKey]
 
                 counterName = str(parallelInfo["CounterName"])
-                branchOutputKeys = parallelInfo["BranchOutputKeys"]
-                branchOutputKey = str(branchOutputKeys[branchCounter-1])
+                if "BranchOutputKeyPrefix" in parallelInfo:
+                    branchOutputKey = str(parallelInfo["BranchOutputKeyPrefix"]) + str(branchCounter)
+                else:
+                    branchOutputKeys = parallelInfo["BranchOutputKeys"]
+                    branchOutputKey = str(branchOutputKeys[branchCounter-1])
 
                 branchOutputKeysSetKey = str(parallelInfo["BranchOutputKeysSetKey"])
 
@@ -464,7 +573,7 @@ class StateUtils:
 
                 assert py3utils.is_string(counterName)
                 try:
-                    dlc = DataLayerClient(locality=1, suid=self._storage_userid, is_wf_private=False, connect=self._datalayer)
+                    dlc = DataLayerClient(locality=1, suid=self._storage_userid, is_wf_private=False, connect=self._datalayer, pooled=True)
 
                     # increment the triggerable counter
                     dlc.incrementCounter(counterName, 1, tableName=dlc.countertriggerstable)
@@ -533,7 +642,7 @@ class StateUtils:
         if do_cleanup:
             assert py3utils.is_string(counterName)
             try:
-                dlc = DataLayerClient(locality=1, suid=self._storage_userid, is_wf_private=False, connect=self._datalayer)
+                dlc = DataLayerClient(locality=1, suid=self._storage_userid, is_wf_private=False, connect=self._datalayer, pooled=True)
 
                 # done with the triggerable counter
                 dlc.deleteCounter(counterName, tableName=dlc.countertriggerstable)
@@ -586,6 +695,9 @@ class StateUtils:
             #self._logger.debug("\t add_dynamic_next:" + self.parsedfunctionstateinfo["Next"])
                 sapi.add_dynamic_next("end", post_parallel_output_values)
 
+        # the bookkeeping of this parallel state (e.g., all branch output keys) is not needed after the join;
+        # the ones of any enclosing parallel states are kept
+        full_metadata.pop(parallelInfoKey, None)
         return function_input, full_metadata
 
 
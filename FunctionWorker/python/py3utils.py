@@ -22,6 +22,12 @@ def is_string(string):
 
     return isinstance(string, basestring)
 
+def are_strings(items):
+    for item in items:
+        if not is_string(item):
+            return False
+    return True
+
 def ensure_long(value):
     if PYTHON_VERSION >= (3, ):
         return int(value)
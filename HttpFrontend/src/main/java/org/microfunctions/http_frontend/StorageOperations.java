@@ -15,10 +15,14 @@
 */
 package org.microfunctions.http_frontend;
 
+import java.io.ByteArrayOutputStream;
 import java.nio.ByteBuffer;
 import java.nio.charset.StandardCharsets;
 import java.util.ArrayList;
+import java.util.Arrays;
 import java.util.List;
+import java.util.zip.DataFormatException;
+import java.util.zip.Inflater;
 
 import org.apache.logging.log4j.LogManager;
 import org.apache.logging.log4j.Logger;
@@ -38,6 +42,31 @@ public class StorageOperations
     private static final int DATALAYER_MAX_MESSAGE_LENGTH = Integer.MAX_VALUE;
     //private static final int LOCALITY = DatalayerServer.RIAK_DATALAYER;
     private static final int LOCALITY = 1;
+    // the header of the values compressed by the data layer clients (see FunctionWorker/python/DataLayerClient.py)
+    private static final byte[] COMPRESSION_HEADER = {0x00, 'M', 'F', 'Z', 0x01};
+
+    private static byte[] decompressValue(byte[] value) throws DataFormatException
+    {
+        if (value.length < COMPRESSION_HEADER.length || !Arrays.equals(Arrays.copyOf(value, COMPRESSION_HEADER.length), COMPRESSION_HEADER)) {
+            return value;
+        }
+        Inflater inflater = new Inflater();
+        try {
+            inflater.setInput(value, COMPRESSION_HEADER.length, value.length - COMPRESSION_HEADER.length);
+            ByteArrayOutputStream output = new ByteArrayOutputStream(value.length * 4);
+            byte[] buffer = new byte[65536];
+            while (!inflater.finished()) {
+                int length = inflater.inflate(buffer);
+                if (length == 0 && (inflater.needsInput() || inflater.needsDictionary())) {
+                    throw new DataFormatException("Truncated compressed value");
+                }
+                output.write(buffer, 0, length);
+            }
+            return output.toByteArray();
+        } finally {
+            inflater.end();
+        }
+    }
 
     public static String getData (String datalayerServerHost, int datalayerServerPort, int continuationTimeoutMs, 
             String keyspace, String table, String key)
@@ -49,8 +78,8 @@ public class StorageOperations
         String value = null;
         try {
             transport.open();
-            value = new String(datalayer.selectRow(keyspace, table, key, LOCALITY).getValue(), StandardCharsets.UTF_8);
-        } catch (TException e) {
+            value = new String(decompressValue(datalayer.selectRow(keyspace, table, key, LOCALITY).getValue()), StandardCharsets.UTF_8);
+        } catch (TException | DataFormatException e) {
             logger.error("[StorageOperation] " + e.getMessage(), e);
         } finally {
             if (transport != null) {
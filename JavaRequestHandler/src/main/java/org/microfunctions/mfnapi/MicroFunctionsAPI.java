@@ -144,6 +144,9 @@ public class MicroFunctionsAPI
     def get(self, key, is_private=False):
     def delete(self, key, is_private=False, is_queued=False)
     def remove(self, key, is_private=False, is_queued=False):
+    def multi_put(self, key_value_map, is_private=False, is_queued=False):
+    def multi_get(self, keys, is_private=False):
+    def multi_delete(self, keys, is_private=False, is_queued=False):
 
     def add_workflow_next(self, next, value):
     def add_dynamic_next(self, next, value):
@@ -184,6 +187,9 @@ public class MicroFunctionsAPI
     def putMapEntry(self, mapname, key, value, is_private=False, is_queued=False):
     def getMapEntry(self, mapname, key, is_private=False):
     def deleteMapEntry(self, mapname, key, is_private=False, is_queued=False):
+    def multi_putMapEntries(self, mapname, key_value_map, is_private=False, is_queued=False):
+    def multi_getMapEntries(self, mapname, keys, is_private=False):
+    def multi_deleteMapEntries(self, mapname, keys, is_private=False, is_queued=False):
     def containsMapKey(self, mapname, key, is_private=False):
     def getMapKeys(self, mapname, is_private=False):
     def clearMap(self, mapname, is_private=False, is_queued=False):
@@ -1067,6 +1073,69 @@ public class MicroFunctionsAPI
         }
     }
 
+    public void multiPut(Map<String, String> keyValueMap)
+    {
+        this.multiPut(keyValueMap, false, false);
+    }
+    
+    public void multiPut(Map<String, String> keyValueMap, boolean isPrivate)
+    {
+        this.multiPut(keyValueMap, isPrivate, false);
+    }
+
+    public void multiPut(Map<String, String> keyValueMap, boolean isPrivate, boolean isQueued)
+    {
+        try
+        {
+            this.mfnapiClient.multi_put(keyValueMap, isPrivate, isQueued);
+        }
+        catch (Exception e)
+        {
+            LOGGER.error("Error in API call (multiPut): " + e);
+        }
+    }
+
+    public Map<String, String> multiGet(List<String> keys)
+    {
+        return this.multiGet(keys, false);
+    }
+    
+    public Map<String, String> multiGet(List<String> keys, boolean isPrivate)
+    {
+        Map<String, String> map = null;
+        try
+        {
+            map = this.mfnapiClient.multi_get(keys, isPrivate);
+        }
+        catch (Exception e)
+        {
+            LOGGER.error("Error in API call (multiGet): " + e);
+        }
+        return map;
+    }
+
+    public void multiDelete(List<String> keys)
+    {
+        this.multiDelete(keys, false, false);
+    }
+    
+    public void multiDelete(List<String> keys, boolean isPrivate)
+    {
+        this.multiDelete(keys, isPrivate, false);
+    }
+
+    public void multiDelete(List<String> keys, boolean isPrivate, boolean isQueued)
+    {
+        try
+        {
+            this.mfnapiClient.multi_delete(keys, isPrivate, isQueued);
+        }
+        catch (Exception e)
+        {
+            LOGGER.error("Error in API call (multiDelete): " + e);
+        }
+    }
+
     public void createMap(String mapname)
     {
         this.createMap(mapname, false, false);
@@ -1151,6 +1220,69 @@ public class MicroFunctionsAPI
             LOGGER.error("Error in API call (deleteMapEntry): " + e);
         }
     }
+
+    public void multiPutMapEntries(String mapname, Map<String, String> keyValueMap)
+    {
+        this.multiPutMapEntries(mapname, keyValueMap, false, false);
+    }
+    
+    public void multiPutMapEntries(String mapname, Map<String, String> keyValueMap, boolean isPrivate)
+    {
+        this.multiPutMapEntries(mapname, keyValueMap, isPrivate, false);
+    }
+
+    public void multiPutMapEntries(String mapname, Map<String, String> keyValueMap, boolean isPrivate, boolean isQueued)
+    {
+        try
+        {
+            this.mfnapiClient.multi_putMapEntries(mapname, keyValueMap, isPrivate, isQueued);
+        }
+        catch (Exception e)
+        {
+            LOGGER.error("Error in API call (multiPutMapEntries): " + e);
+        }
+    }
+
+    public Map<String, String> multiGetMapEntries(String mapname, List<String> keys)
+    {
+        return this.multiGetMapEntries(mapname, keys, false);
+    }
+    
+    public Map<String, String> multiGetMapEntries(String mapname, List<String> keys, boolean isPrivate)
+    {
+        Map<String, String> map = null;
+        try
+        {
+            map = this.mfnapiClient.multi_getMapEntries(mapname, keys, isPrivate);
+        }
+        catch (Exception e)
+        {
+            LOGGER.error("Error in API call (multiGetMapEntries): " + e);
+        }
+        return map;
+    }
+
+    public void multiDeleteMapEntries(String mapname, List<String> keys)
+    {
+        this.multiDeleteMapEntries(mapname, keys, false, false);
+    }
+    
+    public void multiDeleteMapEntries(String mapname, List<String> keys, boolean isPrivate)
+    {
+        this.multiDeleteMapEntries(mapname, keys, isPrivate, false);
+    }
+
+    public void multiDeleteMapEntries(String mapname, List<String> keys, boolean isPrivate, boolean isQueued)
+    {
+        try
+        {
+            this.mfnapiClient.multi_deleteMapEntries(mapname, keys, isPrivate, isQueued);
+        }
+        catch (Exception e)
+        {
+            LOGGER.error("Error in API call (multiDeleteMapEntries): " + e);
+        }
+    }
     
     public boolean containsMapKey(String mapname, String key)
     {
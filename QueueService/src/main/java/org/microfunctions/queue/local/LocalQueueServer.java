@@ -16,6 +16,8 @@
 package org.microfunctions.queue.local;
 
 
+import java.io.File;
+import java.io.IOException;
 import java.net.InetSocketAddress;
 import java.util.ArrayList;
 import java.util.List;
@@ -31,6 +33,8 @@ import org.apache.thrift.transport.TServerSocket;
 import org.apache.thrift.transport.TServerTransport;
 import org.apache.thrift.transport.TTransportException;
 import org.microfunctions.queue.local.LocalQueueService.Iface;
+import org.newsclub.net.unix.AFUNIXServerSocket;
+import org.newsclub.net.unix.AFUNIXSocketAddress;
 
 public class LocalQueueServer implements Iface, Runnable {
     
@@ -41,13 +45,22 @@ public class LocalQueueServer implements Iface, Runnable {
     private static Logger LOGGER = LogManager.getLogger(LocalQueueServer.class);
     
     private TServer server = null;
+    private TServer unixSocketServer = null;
     private LocalQueue queue = new LocalQueue();
 
     private int localQueueServerPort;
+    // optional unix domain socket for the clients in the same sandbox (e.g., function workers)
+    private String unixSocketPath;
 
     public LocalQueueServer(int lqsp)
+    {
+    	this(lqsp, null);
+    }
+
+    public LocalQueueServer(int lqsp, String unixSocketPath)
     {
     	this.localQueueServerPort = lqsp;
+    	this.unixSocketPath = unixSocketPath;
     }
 
     @Override
@@ -70,6 +83,15 @@ public class LocalQueueServer implements Iface, Runnable {
         queue.addMessage(topic, message);
     }
 
+    @Override
+    public List<Boolean> addMessages(List<LocalQueueTopicMessage> messages) throws TException {
+        List<Boolean> statuses = new ArrayList<Boolean>(messages.size());
+        for (LocalQueueTopicMessage topicMessage: messages) {
+            statuses.add(queue.addMessage(topicMessage.getTopic(), topicMessage.getMessage()));
+        }
+        return statuses;
+    }
+
     @Override
     public LocalQueueMessage getAndRemoveMessage(String topic, long timeout) throws TException {
         return queue.getAndRemoveMessage(topic, timeout);
@@ -116,19 +138,45 @@ public class LocalQueueServer implements Iface, Runnable {
         return Runtime.getRuntime().maxMemory() - Runtime.getRuntime().totalMemory() + Runtime.getRuntime().freeMemory();
     }
     
-    public void start (InetSocketAddress bindAddr, int maxWorkerThreads, int clientTimeout) throws TTransportException {
-        TServerTransport transport = new TServerSocket(bindAddr, clientTimeout);
+    private TServer createServer (TServerTransport transport, int maxWorkerThreads) {
         TThreadPoolServer.Args args = new TThreadPoolServer.Args(transport)
                 .transportFactory(new TFramedTransport.Factory(DEFAULT_MAX_FRAME_LENGTH))
                 .protocolFactory(new TCompactProtocol.Factory())
                 .processor(new LocalQueueService.Processor<Iface>(this))
                 .maxWorkerThreads(maxWorkerThreads);
-        server = new TThreadPoolServer(args);
+        return new TThreadPoolServer(args);
+    }
+    
+    public void start (InetSocketAddress bindAddr, int maxWorkerThreads, int clientTimeout) throws TTransportException {
+        TServerTransport transport = new TServerSocket(bindAddr, clientTimeout);
+        server = this.createServer(transport, maxWorkerThreads);
         
         LOGGER.info("Starting local queue...");
         server.serve();
     }
     
+    public void startUnixSocket (String socketPath, int maxWorkerThreads, int clientTimeout) throws IOException, TTransportException {
+        final File socketFile = new File(socketPath);
+        // remove the socket file of a previous run; otherwise, the bind fails
+        socketFile.delete();
+        
+        AFUNIXServerSocket serverSocket = AFUNIXServerSocket.newInstance();
+        serverSocket.bind(new AFUNIXSocketAddress(socketFile));
+        TServerTransport transport = new TServerSocket(serverSocket, clientTimeout);
+        unixSocketServer = this.createServer(transport, maxWorkerThreads);
+        
+        // the tcp server is served by the calling thread (see start())
+        Thread unixSocketServerThread = new Thread(new Runnable() {
+            @Override
+            public void run() {
+                unixSocketServer.serve();
+            }
+        });
+        unixSocketServerThread.setDaemon(true);
+        unixSocketServerThread.start();
+        LOGGER.info("Listening on unix socket: " + socketPath);
+    }
+    
     public void start (InetSocketAddress bindAddr, int maxWorkerThreads) throws TTransportException {
         this.start(bindAddr, maxWorkerThreads, DEFAULT_CLIENT_TIMEOUT);
     }
@@ -141,6 +189,10 @@ public class LocalQueueServer implements Iface, Runnable {
         if (server != null) {
             server.stop();
         }
+        
+        if (unixSocketServer != null) {
+            unixSocketServer.stop();
+        }
     }
     
     protected void finalize () throws Throwable {
@@ -153,6 +205,18 @@ public class LocalQueueServer implements Iface, Runnable {
     
     public void run()
     {
+		if (this.unixSocketPath != null)
+		{
+			try
+			{
+				this.startUnixSocket(this.unixSocketPath, DEFAULT_MAX_WORKER_THREADS, DEFAULT_CLIENT_TIMEOUT);
+			}
+			catch (IOException | TTransportException e)
+			{
+				LOGGER.error("Could not listen on unix socket: " + this.unixSocketPath, e);
+			}
+		}
+
 		try
 		{
 			InetSocketAddress bindAddr = new InetSocketAddress("0.0.0.0", this.localQueueServerPort);
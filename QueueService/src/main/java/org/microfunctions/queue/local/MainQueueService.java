@@ -40,7 +40,9 @@ public class MainQueueService
 			LOGGER.warn("Hostname can't be detected");
 		}
 		System.err.println("OPTIONS:\n"
-				+ " - hostname (HOSTNAME)\t<fqdn>\t(default: "+hostname+"\n");
+				+ " - hostname (HOSTNAME)\t<fqdn>\t(default: "+hostname+"\n"
+				+ " - portNumber (PORTNUMBER)\t<port>\t(default: 4999)\n"
+				+ " - unixSocket (UNIXSOCKET)\t<path>\t(optional; also listen on this unix domain socket)\n");
 	}
 
     public static void main(String[] args)
@@ -58,7 +60,7 @@ public class MainQueueService
 			// Copy properties from env or system props
 			Map<String,String> env = System.getenv();
 			Properties sys = System.getProperties();
-			for(String key : new String[]{"hostname", "portNumber"}) {
+			for(String key : new String[]{"hostname", "portNumber", "unixSocket"}) {
 				String envkey = key.replace('.', '_').toUpperCase();
 				if(env.containsKey(envkey))
 					config.put(key,env.get(envkey));
@@ -93,7 +95,13 @@ public class MainQueueService
         LOGGER.info("hostname = " + hostname);
         LOGGER.info("port number = " + portNumber);
 
-        LocalQueueServer localQueueServer = new LocalQueueServer(portNumber);
+        String unixSocketPath = config.getProperty("unixSocket");
+        if (unixSocketPath != null)
+        {
+            LOGGER.info("unix socket = " + unixSocketPath);
+        }
+
+        LocalQueueServer localQueueServer = new LocalQueueServer(portNumber, unixSocketPath);
         Thread localQueueServerThread = new Thread(localQueueServer);
         localQueueServerThread.start();
 
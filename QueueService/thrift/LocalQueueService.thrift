@@ -21,12 +21,18 @@ struct LocalQueueMessage {
 	2: binary payload
 }
 
+struct LocalQueueTopicMessage {
+	1: string topic,
+	2: LocalQueueMessage message
+}
+
 service LocalQueueService {
 	void addTopic (1: string topic),
 	void removeTopic (1: string topic),
 	
 	bool addMessage (1: string topic, 2: LocalQueueMessage message),
     oneway void addMessageNoack (1: string topic, 2: LocalQueueMessage message),
+    list<bool> addMessages (1: list<LocalQueueTopicMessage> messages),
 
     LocalQueueMessage getAndRemoveMessage (1: string topic, 2: i64 timeout),
     LocalQueueMessage getMessage (1: string topic, 2: i64 timeout),
@@ -17,6 +17,8 @@ package main
 
 import (
   "bufio"
+  "bytes"
+  "compress/zlib"
   "context"
   "encoding/binary"
   "encoding/json"
@@ -59,6 +61,12 @@ type Execution struct {
   rt_rcvdlq int64
 }
 
+// a retrieval of a result that is not available waits for it at most this long
+const resultRetrievalTimeout = 60 * time.Second
+
+// the entry in the execution_info_map of a synchronous execution whose result has been delivered (see StoreSyncResultMarker())
+const syncResultMarkerKey = "sync_result_delivered"
+
 // ExecutionResults keeps a map of execution id's (UUID rendered strings) and Execution
 var ExecutionMutex = sync.Mutex{}
 var ExecutionCond = sync.NewCond(&ExecutionMutex)
@@ -103,6 +111,35 @@ var (
   httpServer *http.Server
 )
 
+// Binary message envelope (see ../../FunctionWorker/python/MessageEnvelope.py)
+// 4 bytes magic, 1 byte version, 4 bytes (uint32) metadata length, metadata as JSON, raw userdata
+var envelopeMagic = []byte{0x00, 'M', 'F', 'E'}
+const (
+  envelopeVersion = 1
+  envelopeHeaderLength = 9
+)
+
+// UnmarshalMessage parses an MfnMessage that is either encapsulated in JSON or in the binary message envelope
+func UnmarshalMessage(payload []byte, msg *MfnMessage) error {
+  if len(payload) < envelopeHeaderLength || !bytes.Equal(payload[0:4], envelopeMagic) {
+    return msg.UnmarshalJSON(payload)
+  }
+  if payload[4] != envelopeVersion {
+    return fmt.Errorf("unsupported message envelope version %d", payload[4])
+  }
+  end := envelopeHeaderLength + int(binary.BigEndian.Uint32(payload[5:envelopeHeaderLength]))
+  if len(payload) < end {
+    return fmt.Errorf("truncated message envelope")
+  }
+  msg.Mfnmetadata = &Metadata{}
+  err := json.Unmarshal(payload[envelopeHeaderLength:end], msg.Mfnmetadata)
+  if err != nil {
+    return err
+  }
+  msg.Mfnuserdata = string(payload[end:])
+  return nil
+}
+
 // ConsumeResults (a concurrent go routine)
 // Initializes its own thrift client to consume from the results topic
 // It loops to consume messages
@@ -169,7 +206,7 @@ func ConsumeResults(quit <-chan bool, done chan<- bool) {
       msg := MfnMessage{}
       // 4 byte unsigned integer length that defaults to 36, followed by 32 bytes UUID
       len := binary.BigEndian.Uint32(lqm.Payload[0:])
-      err = msg.UnmarshalJSON(lqm.Payload[len:])
+      err = UnmarshalMessage(lqm.Payload[len:], &msg)
       if err != nil {
         log.Println("consumer: Couldn't unmarshal message", err)
         continue
@@ -192,7 +229,10 @@ func ConsumeResults(quit <-chan bool, done chan<- bool) {
 // handler is an HTTP handle function
 // It checks requests for URL parameters async and executionId
 // If an executionId is present, it is a retrieval that only tries to fetch the result from the datalayer
+// The results of synchronous executions are only stored if the workflow sets persist_sync_results (PersistSyncResults),
+// so that the retrieval of a delivered synchronous result that has not been stored is answered with 410 (Gone)
 // If the retrieval is synchronous and no result is available, it will also create an Execution and wait on its completion
+// (at most resultRetrievalTimeout, then it is answered with 404)
 // New requests are checked to have a Content-type 'application/json'
 // the body will be used to generate a new MfnMessage and sent
 // Synchronous requests will create an execution and wait on its completion before returning thr response
@@ -234,7 +274,10 @@ func handler(w http.ResponseWriter, r *http.Request) {
       log.Println("handler: Couldn't fetch result of execution ID", id, err)
       http.Error(w, "Can't fetch result", http.StatusInternalServerError)
     } else if res == nil {
-      if async {
+      if IsSyncResultDelivered(id) {
+        log.Printf("handler: Result of synchronous execution ID %s has been delivered and not stored", id)
+        http.Error(w, "Result of synchronous execution has not been stored (see the workflow's persist_sync_results)", http.StatusGone)
+      } else if async {
         log.Printf("handler: Result not yet available of execution ID %s, redirecting", id)
         // TODO: 300 location redirect
         http.Redirect(w, r, r.URL.String() + "executionId=" + id, http.StatusMovedPermanently)
@@ -250,17 +293,35 @@ func handler(w http.ResponseWriter, r *http.Request) {
           ExecutionCond.L.Unlock()
         }
         e.cond.L.Lock()
-        // Wait on Result
-        e.cond.Wait()
+        // Wait on Result, but not forever (e.g., the execution is unknown to this frontend)
+        timedOut := false
+        timer := time.AfterFunc(resultRetrievalTimeout, func() {
+          e.cond.L.Lock()
+          timedOut = true
+          e.cond.Broadcast()
+          e.cond.L.Unlock()
+        })
+        for e.msg == nil && !timedOut {
+          e.cond.Wait()
+        }
+        timer.Stop()
+        result := e.msg
         e.cond.L.Unlock()
 
-        // Modify ExecutionResults
-        ExecutionCond.L.Lock()
-        delete(ExecutionResults, id)
-        ExecutionCond.L.Unlock()
+        // Modify ExecutionResults (the synchronous request of the execution removes its own entry)
+        if !ok {
+          ExecutionCond.L.Lock()
+          delete(ExecutionResults, id)
+          ExecutionCond.L.Unlock()
+        }
 
-        w.Header().Set("Content-Type", "application/json")
-        w.Write([]byte(e.msg.Mfnuserdata))
+        if result == nil {
+          log.Printf("handler: Result of execution ID %s not available after %s", id, resultRetrievalTimeout)
+          http.Error(w, "Result not available", http.StatusNotFound)
+        } else {
+          w.Header().Set("Content-Type", "application/json")
+          w.Write([]byte(result.Mfnuserdata))
+        }
       }
     } else {
       msgb,err = res.MarshalJSON()
@@ -432,8 +493,10 @@ func handler(w http.ResponseWriter, r *http.Request) {
       log.Println("Couldn't send message to LocalQueueService: ", err)
       http.Error(w, "Error submitting event to system", http.StatusInternalServerError)
     } else {
-      // Wait on Result
-      c.Wait()
+      // Wait on Result (a retrieval of the same execution may wake us up when it times out)
+      for e.msg == nil {
+        c.Wait()
+      }
       // Marshall result
       //msgb,err = e.msg.MarshalJSON()
       //if err != nil {
@@ -444,6 +507,7 @@ func handler(w http.ResponseWriter, r *http.Request) {
       w.Header().Set("Content-Type", "application/json")
       w.Write([]byte(e.msg.Mfnuserdata))
       rt_exitfe = time.Now().UnixNano()
+      go StoreSyncResultMarker(id)
       log.Printf(
         `[ResumedUserSession] [ExecutionId] [%s] [Size] [0] [TimestampMap] [{"tfe_entry":%d,"tfe_sendlq":%d,"tfe_sentlq":%d,"tfe_rcvdlq":%d,"tfe_exit":%d}] [LatencyRoundtrip] [%d] [Response] {...}`,
         e.msg.Mfnmetadata.ExecutionId,
@@ -489,6 +553,22 @@ func InitDatalayer() {
   datalayer = datalayerservice.NewDataLayerServiceClient(thrift.NewTStandardClient(iprot, oprot))
 }
 
+// the header of the values compressed by the data layer clients (see ../../FunctionWorker/python/DataLayerClient.py)
+var compressionHeader = []byte("\x00MFZ\x01")
+
+// DecompressValue returns the value as it was written to the datalayer
+func DecompressValue(value []byte) ([]byte, error) {
+  if !bytes.HasPrefix(value, compressionHeader) {
+    return value, nil
+  }
+  reader, err := zlib.NewReader(bytes.NewReader(value[len(compressionHeader):]))
+  if err != nil {
+    return nil, err
+  }
+  defer reader.Close()
+  return ioutil.ReadAll(reader)
+}
+
 // FetchResult uses the datalayer to fetch the result of an execution id
 func FetchResult(id string) (*MfnMessage, error) {
   // see ../../ManagementService/management_init.py:365
@@ -500,11 +580,47 @@ func FetchResult(id string) (*MfnMessage, error) {
   if err != nil || len(kvp.Value) == 0 {
     return nil, err
   }
+  value, err := DecompressValue(kvp.Value)
+  if err != nil {
+    return nil, err
+  }
   msg := &MfnMessage{}
-  err = msg.UnmarshalJSON(kvp.Value)
+  err = UnmarshalMessage(value, msg)
   return msg, err
 }
 
+// IsSyncResultDelivered checks whether the result of a synchronous execution has been delivered by a frontend
+func IsSyncResultDelivered(id string) bool {
+  mapName := "execution_info_map_" + id
+  // LOCALITY = 1 (access global datalayer)
+  datalayerMutex.Lock()
+  kvp, err := datalayer.GetEntryFromMap(datalayerCtx, datalayerKeyspace, datalayerMapTable, mapName, syncResultMarkerKey, 1)
+  datalayerMutex.Unlock()
+  if err != nil {
+    log.Println("handler: Couldn't check the result marker of execution ID", id, err)
+    return false
+  }
+  return kvp != nil && len(kvp.Value) > 0
+}
+
+// StoreSyncResultMarker records that the result of a synchronous execution has been delivered
+// the result itself is only stored by the function workers if the workflow sets persist_sync_results
+// so that a later retrieval by executionId can tell a delivered result from a pending one (see handler())
+func StoreSyncResultMarker(id string) {
+  mapName := "execution_info_map_" + id
+  kvp := &datalayermessage.KeyValuePair{
+    syncResultMarkerKey,
+    []byte("1"),
+  }
+  // LOCALITY = 1 (access global datalayer)
+  datalayerMutex.Lock()
+  res, err := datalayer.PutEntryToMap(datalayerCtx, datalayerKeyspace, datalayerMapTable, mapName, kvp, 1)
+  datalayerMutex.Unlock()
+  if res == false || err != nil {
+    log.Println("producer: Could not store the result marker of execution ID", id, err)
+  }
+}
+
 // InitProducer initialized the producer thrift client and connects it to the local queue service
 func InitProducer() {
   fmt.Print("producer: Starting client")
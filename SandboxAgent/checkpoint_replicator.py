@@ -0,0 +1,104 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import os
+import sys
+import threading
+
+sys.path.insert(1, os.path.join(sys.path[0], '../FunctionWorker/python'))
+
+from CheckpointJournal import CheckpointJournalReader
+from DataLayerClient import DataLayerClient, set_compression_config
+
+# how often the journal is synced to disk and replicated (i.e., the bound of the durability window)
+REPLICATION_INTERVAL = 0.1
+# the maximum size of the records replicated with a single batch
+MAX_BATCH_BYTES = 4 * 1024 * 1024
+# the journal is truncated after all of its records have been replicated and it has reached this size
+TRUNCATE_SIZE = 64 * 1024 * 1024
+
+class CheckpointReplicator(threading.Thread):
+    '''
+    Replicates the checkpoints that the function workers append to the checkpoint journal
+    to the data layer in the background. The records that have not been replicated
+    before a restart are replayed when the replicator starts.
+    '''
+    def __init__(self, journal_path, sandboxid, datalayer, logger, compression_config=None):
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        self._journal_path = journal_path
+        self._sandboxid = sandboxid
+        self._datalayer = datalayer
+        self._logger = logger
+        # the workflow's compression of the data layer tables, as applied by the function workers
+        self._compression_config = compression_config
+
+        self._stop_event = threading.Event()
+        self._num_replicated = 0
+
+    def run(self):
+        journal = CheckpointJournalReader(self._journal_path)
+        # the checkpoints and results are stored as if the function workers had written them
+        # (the compression configuration applies to all data layer clients of the process)
+        set_compression_config(self._compression_config)
+        # same data layer client as the function workers would use to store their backups
+        dlc = DataLayerClient(locality=-1, for_mfn=True, sid=self._sandboxid, connect=self._datalayer)
+
+        offset = journal.get_replicated_offset()
+        if offset > 0 or os.path.getsize(self._journal_path) > 0:
+            self._logger.info("Replaying checkpoint journal from offset: %s", str(offset))
+
+        while not self._stop_event.wait(REPLICATION_INTERVAL):
+            offset = self._replicate(journal, dlc, offset)
+
+        # the function workers have been stopped; replicate what is left
+        offset = self._replicate(journal, dlc, offset)
+        dlc.shutdown()
+        self._logger.info("Checkpoint replicator stopped; replicated records: %s, corrupted records: %s", str(self._num_replicated), str(journal.num_corrupted_records))
+
+    def _replicate(self, journal, dlc, offset):
+        try:
+            journal.sync()
+            while True:
+                records, next_offset = journal.read_records(offset, MAX_BATCH_BYTES)
+                if next_offset == offset:
+                    break
+
+                # later records of the same entry overwrite earlier ones
+                batch = {}
+                for map_name, entries in records:
+                    if map_name not in batch:
+                        batch[map_name] = {}
+                    batch[map_name].update(entries)
+
+                for map_name in batch:
+                    if not dlc.putMapEntries(map_name, batch[map_name]):
+                        raise Exception("Could not replicate checkpoints of map: " + map_name)
+
+                journal.set_replicated_offset(next_offset)
+                offset = next_offset
+                self._num_replicated += len(records)
+
+            if journal.truncate_if_replicated(offset, TRUNCATE_SIZE):
+                offset = 0
+        except Exception as exc:
+            # keep the offset; the records will be replicated with the next attempt
+            self._logger.error("Checkpoint replication failed: %s", str(exc))
+
+        return offset
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
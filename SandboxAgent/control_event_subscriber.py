@@ -0,0 +1,92 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import json
+import os
+import socket
+import sys
+import threading
+
+sys.path.insert(1, os.path.join(sys.path[0], '../FunctionWorker/python'))
+
+from ControlEvents import ControlEventReader
+from DataLayerCache import DataLayerCache
+from DataLayerClient import DataLayerClient
+from LocalQueueClient import LocalQueueClient
+from LocalQueueClientMessage import LocalQueueClientMessage
+
+# how often the control events of the workflow are checked (i.e., the delay of their delivery to this sandbox)
+POLL_INTERVAL = 0.1
+
+class ControlEventSubscriber(threading.Thread):
+    '''
+    Subscribes the sandbox to the control events of the workflow (e.g., executions stopped in any sandbox; see ControlEvents)
+    and forwards them as update messages to the local queue topics of the function workers in this sandbox.
+    The invalidations of the data layer cache are applied to the local data layer directly,
+    because the cache is shared by all function workers of the sandbox (see DataLayerCache).
+    '''
+    def __init__(self, sandboxid, datalayer, queue, workflow, logger):
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        self._sandboxid = sandboxid
+        self._datalayer = datalayer
+        self._queue = queue
+        self._workflow = workflow
+        self._logger = logger
+
+        self._stop_event = threading.Event()
+        self._num_forwarded = 0
+
+    def run(self):
+        dlc = DataLayerClient(locality=1, for_mfn=True, sid=self._sandboxid, connect=self._datalayer)
+        local_queue_client = LocalQueueClient(connect=self._queue)
+        data_layer_cache = DataLayerCache(self._sandboxid, self._datalayer, {})
+        hostname = socket.gethostname()
+        reader = ControlEventReader()
+
+        while not self._stop_event.wait(POLL_INTERVAL):
+            try:
+                for update in reader.read_new_events(dlc):
+                    if update["action"] == "invalidate-data-layer-cache":
+                        if update.get("origin") != hostname:
+                            self._invalidate_cache(data_layer_cache, update)
+                    else:
+                        self._forward(local_queue_client, update)
+            except Exception as exc:
+                # the events that have not been read will be read with the next attempt
+                self._logger.error("Could not read the control events: %s", str(exc))
+
+        data_layer_cache.shutdown()
+        local_queue_client.shutdown()
+        dlc.shutdown()
+        self._logger.info("Control event subscriber stopped; forwarded events: %s", str(self._num_forwarded))
+
+    def _invalidate_cache(self, data_layer_cache, invalidation):
+        for cache_key in invalidation["cacheKeys"]:
+            data_layer_cache.invalidate(cache_key)
+        for cache_group in invalidation["cacheGroups"]:
+            data_layer_cache.invalidate_group(cache_group)
+
+    def _forward(self, local_queue_client, update):
+        lqcm_update = LocalQueueClientMessage(key="0l", value=json.dumps(update))
+        # the local functions may be updated by the deployment concurrently
+        for function_topic in list(self._workflow.getWorkflowLocalFunctions()):
+            if not local_queue_client.addMessage(function_topic, lqcm_update, True):
+                self._logger.error("Could not forward the control event to function worker: %s", function_topic)
+        self._num_forwarded += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
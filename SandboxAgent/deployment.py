@@ -20,10 +20,11 @@ import time
 
 import process_utils
 import state_utils
-from workflow import Workflow
+from workflow import Workflow, WorkflowStateType
 
 sys.path.insert(1, os.path.join(sys.path[0], '../FunctionWorker/python'))
 
+from CheckpointJournal import get_checkpoint_journal_path
 from DataLayerClient import DataLayerClient
 from LocalQueueClient import LocalQueueClient
 from LocalQueueClientMessage import LocalQueueClientMessage
@@ -32,7 +33,7 @@ SINGLE_JVM_FOR_FUNCTIONS = True
 
 class Deployment:
 
-    def __init__(self, deployment_info, hostname, userid, sandboxid, workflowid, workflowname, queue, datalayer, logger, external_endpoint, internal_endpoint):
+    def __init__(self, deployment_info, hostname, userid, sandboxid, workflowid, workflowname, queue, datalayer, logger, external_endpoint, internal_endpoint, worker_queue=None, worker_datalayer=None, worker_datalayer_hedge=None):
         self._logger = logger
         self._deployment_info = deployment_info
         self._hostname = hostname
@@ -42,6 +43,10 @@ class Deployment:
         self._workflowname = workflowname
         self._queue = queue
         self._datalayer = datalayer
+        # the addresses for the function workers (e.g., unix:///path/to/socket)
+        self._worker_queue = queue if worker_queue is None else worker_queue
+        self._worker_datalayer = datalayer if worker_datalayer is None else worker_datalayer
+        self._worker_datalayer_hedge = worker_datalayer_hedge
         self._external_endpoint = external_endpoint
         self._internal_endpoint = internal_endpoint
 
@@ -566,8 +571,10 @@ class Deployment:
         worker_params["fruntime"] = state["resource_runtime"]
         worker_params["ftopic"] = function_topic
         worker_params["hostname"] = self._hostname
-        worker_params["queue"] = self._queue
-        worker_params["datalayer"] = self._datalayer
+        worker_params["queue"] = self._worker_queue
+        worker_params["datalayer"] = self._worker_datalayer
+        if self._worker_datalayer_hedge:
+            worker_params["datalayerhedge"] = self._worker_datalayer_hedge
         worker_params["externalendpoint"] = self._external_endpoint
         worker_params["internalendpoint"] = self._internal_endpoint
         worker_params["fnext"] = wf_node.getNextMap()
@@ -581,9 +588,59 @@ class Deployment:
         worker_params["sessionfunction"] = wf_node.is_session_function()
         worker_params["sessionfunctionparameters"] = wf_node.get_session_function_parameters()
         worker_params["shouldcheckpoint"] = self._workflow.are_checkpoints_enabled()
+        worker_params["binaryenvelope"] = self._workflow.is_binary_envelope_enabled()
+        worker_params["codec"] = self._workflow.get_codec()
+        worker_params["payloadrefthreshold"] = self._workflow.get_payload_reference_threshold()
+        worker_params["persistsyncresults"] = self._workflow.are_sync_results_persisted()
+        worker_params["datalayercache"] = self._workflow.get_data_layer_cache_config()
+        worker_params["datalayercompression"] = self._workflow.get_data_layer_compression_config()
+        worker_params["executionbudgetms"] = self._workflow.get_execution_budget_ms()
+        worker_params["checkpointjournal"] = None
+        if self._workflow.are_checkpoints_enabled() and self._workflow.is_checkpoint_journal_enabled():
+            worker_params["checkpointjournal"] = get_checkpoint_journal_path(self._sandboxid)
+        worker_params["executionmode"] = wf_node.get_execution_mode()
+        worker_params["executionmodeparameters"] = wf_node.get_execution_mode_parameters()
 
         return worker_params
 
+    def _is_fusable(self, worker_params):
+        return worker_params["fruntime"].find("python") == 0 \
+            and worker_params["functionstatetype"] in [WorkflowStateType.SAND_TASK_STATE_TYPE, WorkflowStateType.TASK_STATE_TYPE] \
+            and not worker_params["sessionfunction"]
+
+    def _add_fused_next(self, function_topic, worker_params_map, chain):
+        # fuse a python task state with its single, static next state (also a python task state),
+        # so that the next state is executed in the same process on the in-memory output
+        worker_params = worker_params_map[function_topic]
+        if "fusednext" in worker_params:
+            return worker_params["fusednext"]
+
+        fnext = list(worker_params["fnext"].keys())
+        if not self._is_fusable(worker_params) or len(fnext) != 1:
+            return None
+
+        next_topic = self._workflow.topicPrefix + fnext[0]
+        if next_topic not in worker_params_map or next_topic in chain or not self._is_fusable(worker_params_map[next_topic]):
+            return None
+
+        next_worker_params = dict(worker_params_map[next_topic])
+        # the next state may be fused with its own next state
+        next_fused_next = self._add_fused_next(next_topic, worker_params_map, chain + [next_topic])
+        next_worker_params.pop("fusednext", None)
+        if next_fused_next is not None and function_topic not in self._get_fused_chain_topics(next_fused_next):
+            next_worker_params["fusednext"] = next_fused_next
+
+        worker_params["fusednext"] = next_worker_params
+        self._logger.info("Fusing state %s with its next state %s", worker_params["functionstatename"], next_worker_params["functionstatename"])
+        return next_worker_params
+
+    def _get_fused_chain_topics(self, fused_next):
+        topics = []
+        while fused_next is not None:
+            topics.append(fused_next["ftopic"])
+            fused_next = fused_next.get("fusednext")
+        return topics
+
     def _compile_java_resources_if_necessary(self, resource, mvndeps):
         error = None
 
@@ -836,6 +893,9 @@ class Deployment:
             any_java_function = False
 
         total_time_state = 0.0
+        # first create all states, so that the parameters of the next states are available for fusion
+        worker_params_map = {}
+        state_map = {}
         for function_topic in workflow_nodes:
             wf_node = workflow_nodes[function_topic]
             resource_name = wf_node.get_resource_name()
@@ -864,7 +924,17 @@ class Deployment:
             self._local_queue_client.addTopic(function_topic)
 
             # compile worker parameters
-            worker_params = self._populate_worker_params(function_topic, wf_node, state)
+            worker_params_map[function_topic] = self._populate_worker_params(function_topic, wf_node, state)
+            state_map[function_topic] = state
+
+        if self._workflow.is_fusion_enabled():
+            for function_topic in workflow_nodes:
+                self._add_fused_next(function_topic, worker_params_map, [function_topic])
+
+        for function_topic in workflow_nodes:
+            worker_params = worker_params_map[function_topic]
+            state = state_map[function_topic]
+
             # store worker parameters as a local file
             params_filename = state["dirpath"] + "worker_params.json"
 
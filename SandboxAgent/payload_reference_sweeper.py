@@ -0,0 +1,77 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(1, os.path.join(sys.path[0], '../FunctionWorker/python'))
+
+from DataLayerClient import DataLayerClient
+from PayloadReferences import PAYLOAD_REF_TTL, delete_expired_payload_references, get_last_expired_bucket
+
+# how often the expired payload references are deleted
+SWEEP_INTERVAL = 60.0
+# how far back the expiry buckets are checked when the sweeper starts (e.g., the references stored before a restart)
+STARTUP_LOOKBACK = 24 * 3600.0
+
+class PayloadReferenceSweeper(threading.Thread):
+    '''
+    Deletes the payload references of the workflow (see PayloadReferences) after their TTL,
+    in the local data layer of this host and in the global data layer.
+    The sandboxes of the workflow sweep the global data layer concurrently; the deletions are idempotent.
+    '''
+    def __init__(self, sandboxid, datalayer, logger):
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        self._sandboxid = sandboxid
+        self._datalayer = datalayer
+        self._logger = logger
+
+        self._stop_event = threading.Event()
+        self._num_deleted = 0
+
+    def run(self):
+        # same data layer client as the function workers use to store the references
+        dlc = DataLayerClient(locality=-1, for_mfn=True, sid=self._sandboxid, connect=self._datalayer)
+
+        last_swept_bucket = get_last_expired_bucket(time.time(), PAYLOAD_REF_TTL + STARTUP_LOOKBACK)
+        while True:
+            last_swept_bucket = self._sweep(dlc, last_swept_bucket)
+            if self._stop_event.wait(SWEEP_INTERVAL):
+                break
+
+        dlc.shutdown()
+        self._logger.info("Payload reference sweeper stopped; deleted references: %s", str(self._num_deleted))
+
+    def _sweep(self, dlc, last_swept_bucket):
+        last_expired_bucket = get_last_expired_bucket(time.time())
+        while last_swept_bucket < last_expired_bucket:
+            bucket = last_swept_bucket + 1
+            try:
+                for locality in [0, 1]:
+                    self._num_deleted += delete_expired_payload_references(dlc, bucket, locality)
+            except Exception as exc:
+                # keep the bucket; it will be swept with the next attempt
+                self._logger.error("Could not delete the expired payload references: %s", str(exc))
+                break
+            last_swept_bucket = bucket
+
+        return last_swept_bucket
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
@@ -25,6 +25,9 @@ import time
 
 import requests
 
+from checkpoint_replicator import CheckpointReplicator
+from control_event_subscriber import ControlEventSubscriber
+from payload_reference_sweeper import PayloadReferenceSweeper
 from deployment import Deployment
 import logging_helpers
 import process_utils
@@ -32,6 +35,7 @@ import process_utils
 sys.path.insert(1, os.path.join(sys.path[0], '../FunctionWorker/python'))
 
 import py3utils
+from CheckpointJournal import get_checkpoint_journal_path
 from DataLayerClient import DataLayerClient
 from LocalQueueClient import LocalQueueClient
 from LocalQueueClientMessage import LocalQueueClientMessage
@@ -45,7 +49,7 @@ POLL_TIMEOUT = py3utils.ensure_long(60000)
 #ELASTICSEARCH_INDEX = 'wf' # index name will be: 'wf' + [the first character of the workflow name (in lower case)]
 
 class SandboxAgent:
-    def __init__(self, hostname, queue, datalayer, sandboxid, userid, workflowid, elasticsearch, workflowname, endpoint_key):
+    def __init__(self, hostname, queue, datalayer, sandboxid, userid, workflowid, elasticsearch, workflowname, endpoint_key, queue_unix_socket=None, datalayer_unix_socket=None, datalayer_hedge=None):
 
         self._start = time.time()
 
@@ -54,6 +58,18 @@ class SandboxAgent:
         self._hostname = hostname
         self._queue = queue
         self._datalayer = datalayer
+        # the queue service and the data layer may also listen on unix domain sockets,
+        # which are then used by the function workers instead of the tcp loopback
+        # (the frontend keeps using the tcp addresses)
+        self._queue_unix_socket = queue_unix_socket
+        self._worker_queue = queue
+        if queue_unix_socket is not None:
+            self._worker_queue = "unix://" + queue_unix_socket
+        self._worker_datalayer = datalayer
+        if datalayer_unix_socket is not None:
+            self._worker_datalayer = "unix://" + datalayer_unix_socket
+        # the alternative data layer servers for the hedged reads of the function workers
+        self._worker_datalayer_hedge = datalayer_hedge
         self._elasticsearch = elasticsearch
         self._userid = userid
         self._sandboxid = sandboxid
@@ -70,6 +86,9 @@ class SandboxAgent:
         self._logger.info("elasticsearch nodes: %s", self._elasticsearch)
         self._logger.info("queueservice: %s", self._queue)
         self._logger.info("datalayer: %s", self._datalayer)
+        self._logger.info("queueservice (function workers): %s", self._worker_queue)
+        self._logger.info("datalayer (function workers): %s", self._worker_datalayer)
+        self._logger.info("datalayer hedge (function workers): %s", self._worker_datalayer_hedge)
         self._logger.info("user id: %s", self._userid)
         self._logger.info("sandbox id: %s", self._sandboxid)
         self._logger.info("workflow id: %s", self._workflowid)
@@ -86,6 +105,9 @@ class SandboxAgent:
         self._deployment = None
         self._queue_service_process = None
         self._frontend_process = None
+        self._checkpoint_replicator = None
+        self._control_event_subscriber = None
+        self._payload_reference_sweeper = None
         # visible to the outside world: either kubernetes assigned URL or bare-metal host address + exposed port
         self._external_endpoint = None
         # visible internally: kubernetes node address or same as bare-metal external endpoint
@@ -184,7 +206,8 @@ class SandboxAgent:
             self._deployment = Deployment(deployment_info,\
                 self._hostname, self._userid, self._sandboxid, self._workflowid,\
                 self._workflowname, self._queue, self._datalayer, \
-                self._logger, self._external_endpoint, self._internal_endpoint)
+                self._logger, self._external_endpoint, self._internal_endpoint, \
+                self._worker_queue, self._worker_datalayer, self._worker_datalayer_hedge)
             self._deployment.set_child_process("fb", self._fluentbit_process, self._command_args_map_fluentbit)
             has_error, errmsg = self._deployment.process_deployment_info()
 
@@ -215,9 +238,21 @@ class SandboxAgent:
         if self._frontend_process is not None:
             self._frontend_process.terminate()
 
+        if self._control_event_subscriber is not None:
+            self._logger.info("Shutting down the control event subscriber...")
+            self._control_event_subscriber.stop()
+
         self._logger.info("Shutting down the function worker(s)...")
         self._deployment.shutdown()
 
+        if self._payload_reference_sweeper is not None:
+            self._logger.info("Shutting down the payload reference sweeper...")
+            self._payload_reference_sweeper.stop()
+
+        if self._checkpoint_replicator is not None:
+            self._logger.info("Shutting down the checkpoint replicator...")
+            self._checkpoint_replicator.stop()
+
         # shut down the local queue client, so that we can also shut down the queue service
         self._local_queue_client.removeTopic(self._instructions_topic)
         self._local_queue_client.shutdown()
@@ -270,7 +305,12 @@ class SandboxAgent:
         command_args_map_qs = {}
         command_args_map_qs["command"] = cmdqs
         command_args_map_qs["wait_until"] = "Starting local queue..."
-        error, self._queue_service_process = process_utils.run_command(cmdqs, self._logger, wait_until="Starting local queue...")
+        qsenv = None
+        if self._queue_unix_socket is not None:
+            qsenv = dict(os.environ)
+            qsenv["UNIXSOCKET"] = self._queue_unix_socket
+            command_args_map_qs["custom_env"] = qsenv
+        error, self._queue_service_process = process_utils.run_command(cmdqs, self._logger, custom_env=qsenv, wait_until="Starting local queue...")
         if error is not None:
             has_error = True
             errmsg = "Could not start the sandbox queue service: " + str(error)
@@ -286,6 +326,24 @@ class SandboxAgent:
         if has_error:
             self._stop_deployment("workflow", errmsg)
 
+        # replicate the checkpoint journal of the function workers (if enabled)
+        # also replay any records that were not replicated before a restart
+        journal_path = get_checkpoint_journal_path(self._sandboxid)
+        if self._deployment.get_workflow().is_checkpoint_journal_enabled() or os.path.exists(journal_path):
+            self._logger.info("Starting the checkpoint replicator...")
+            self._checkpoint_replicator = CheckpointReplicator(journal_path, self._sandboxid, self._datalayer, self._logger, self._deployment.get_workflow().get_data_layer_compression_config())
+            self._checkpoint_replicator.start()
+
+        # forward the control events of the workflow from all sandboxes (e.g., stopped executions) to the function workers
+        self._control_event_subscriber = ControlEventSubscriber(self._sandboxid, self._datalayer, self._queue, self._deployment.get_workflow(), self._logger)
+        self._control_event_subscriber.start()
+
+        # delete the payload references of the workflow after their TTL (if passing large outputs by reference is enabled)
+        if self._deployment.get_workflow().get_payload_reference_threshold() > 0:
+            self._logger.info("Starting the payload reference sweeper...")
+            self._payload_reference_sweeper = PayloadReferenceSweeper(self._sandboxid, self._datalayer, self._logger)
+            self._payload_reference_sweeper.start()
+
         ts_fe_launch = time.time()
         # 3. launch the frontend
         self._logger.info("Launching frontend...")
@@ -451,5 +509,15 @@ if __name__ == "__main__":
         datalayer = find_k8s_ep(datalayer)
         #queue = find_k8s_ep(queue)
 
-    sandbox_agent = SandboxAgent(hostname, queue, datalayer, sandboxid, userid, workflowid, elasticsearch, workflowname, endpoint_key)
+    # optional unix domain sockets for the function workers (e.g., /tmp/mfn_queue.sock)
+    # the data layer socket needs to be mounted into the sandbox
+    queue_unix_socket = os.getenv("MFN_QUEUE_UNIX_SOCKET")
+    datalayer_unix_socket = os.getenv("MFN_DATALAYER_UNIX_SOCKET")
+
+    # optional alternative data layer servers for hedged reads (e.g., host1:4998,host2:4998)
+    datalayer_hedge = None
+    if os.getenv("MFN_DATALAYER_HEDGE"):
+        datalayer_hedge = os.getenv("MFN_DATALAYER_HEDGE").split(",")
+
+    sandbox_agent = SandboxAgent(hostname, queue, datalayer, sandboxid, userid, workflowid, elasticsearch, workflowname, endpoint_key, queue_unix_socket, datalayer_unix_socket, datalayer_hedge)
     sandbox_agent.run()
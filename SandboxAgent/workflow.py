@@ -29,8 +29,21 @@ class WorkflowStateType:
     WAIT_STATE_TYPE = "Wait"
     PARALLEL_STATE_TYPE = "Parallel"
 
+class WorkflowExecutionMode:
+    # a new process is forked for each message (default)
+    FORK = "fork"
+    # a pool of long-lived, pre-forked processes handles the messages
+    POOL = "pool"
+    # the messages are handled in a bounded thread pool inside the function worker process
+    THREAD = "thread"
+    # 'async def' handlers run as coroutines on a shared event loop without holding a thread while awaited;
+    # only their synchronous steps (e.g., decoding the input, publishing the output) use a small thread pool
+    ASYNCIO = "asyncio"
+
+    ALL = [FORK, POOL, THREAD, ASYNCIO]
+
 class WorkflowNode:
-    def __init__(self, topic, nextNodes, potNext, gwftype, gwfstatename, gwfstateinfo, is_session_function, sgparams, logger):
+    def __init__(self, topic, nextNodes, potNext, gwftype, gwfstatename, gwfstateinfo, is_session_function, sgparams, logger, execution_mode=WorkflowExecutionMode.FORK, execution_mode_parameters=None):
 
         self.nodeId = topic
         self.nextMap = {}
@@ -54,6 +67,11 @@ class WorkflowNode:
         self._is_session_function = is_session_function
         self._session_function_parameters = sgparams
 
+        self._execution_mode = execution_mode
+        self._execution_mode_parameters = {}
+        if execution_mode_parameters is not None:
+            self._execution_mode_parameters = execution_mode_parameters
+
     def getNextMap(self):
         return self.nextMap
 
@@ -78,6 +96,12 @@ class WorkflowNode:
     def get_resource_name(self):
         return self._resource_name
 
+    def get_execution_mode(self):
+        return self._execution_mode
+
+    def get_execution_mode_parameters(self):
+        return self._execution_mode_parameters
+
 class Workflow:
     def __init__(self, uid, sid, wid, wf_type, wfstr, logger): # throws Exception
         self._logger = logger
@@ -108,6 +132,45 @@ class Workflow:
         # whether the function workers should store backups of triggers to next functions
         self._enable_checkpoints = True
 
+        # whether a python task state with a single, static next (also a python task state) should also execute
+        # that next state in the same process (i.e., without going through the local queue)
+        self._enable_fusion = False
+
+        # whether the function workers should pass messages to each other in the binary message envelope
+        # (i.e., metadata header + raw user data) instead of the JSON encapsulation
+        self._enable_binary_envelope = False
+
+        # the codec the function workers encode their outputs with (e.g., "json", "ujson", "orjson", "msgpack")
+        # function workers fall back to "json" if the codec is not available
+        self._codec = "json"
+
+        # outputs larger than this (in bytes) are stored in the data layer and passed by reference (0: disabled)
+        # the references are deleted when the execution finishes (unless checkpoints are enabled) and after their TTL
+        self._payload_reference_threshold = 0
+
+        # whether the function workers should append their checkpoints to a local journal,
+        # which is replicated to the data layer in the background by the sandbox agent
+        self._enable_checkpoint_journal = False
+
+        # whether the results of synchronous executions should also be stored in the data layer
+        # (the frontend receives them via the result topic; asynchronous results are always stored)
+        # needed to retrieve the results of synchronous executions by their executionId later;
+        # otherwise, the frontend answers such a retrieval with 410 (Gone)
+        self._persist_sync_results = False
+
+        # the configuration of the read-through cache of data layer tables in the local data layer
+        # (e.g., {"tables": ["defaultTable"], "ttl": 60, "max_entries": 10000}); None disables the cache
+        # the writes of other sandboxes invalidate the cached entries via control events (see ControlEvents)
+        self._data_layer_cache = None
+
+        # the tables whose values are compressed in the data layer, if they are large enough
+        # (e.g., {"tables": ["defaultTable"], "min_size": 4096, "level": 6}); None disables compression
+        self._data_layer_compression = None
+
+        # the time (ms) a function instance is allowed to run (i.e., its data layer operations fail afterwards);
+        # None means no limit
+        self._execution_budget_ms = None
+
         self._has_error = False
 
         # construct from JSON
@@ -123,6 +186,15 @@ class Workflow:
                 "name": "test_workflow",
                 "entry": "entryFunction",
                 "enable_checkpoints": False,
+                "enable_fusion": False,
+                "enable_binary_envelope": False,
+                "codec": "json",
+                "payload_reference_threshold": 0,
+                "enable_checkpoint_journal": False,
+                "persist_sync_results": False,
+                "data_layer_cache": {"tables": ["tableName"], "ttl": 60, "max_entries": 10000},
+                "data_layer_compression": {"tables": ["tableName"], "min_size": 4096, "level": 6},
+                "execution_budget_ms": 300000,
                 "exit": "exitName",
                 "functions": [
                     {
@@ -136,6 +208,17 @@ class Workflow:
                             "heartbeat_interval_ms": 5000
                         },
                         "potentialNext": []
+                    },
+                    {
+                        "name": "aFunction",
+                        "next": [],
+                        "potentialNext": [],
+                        "executionMode": "pool",
+                        "executionModeParameters":
+                        {
+                            "pool_size": 4,
+                            "recycle_after": 1000
+                        }
                     }
                 ]
             }
@@ -155,6 +238,33 @@ class Workflow:
         if "enable_checkpoints" in wfobj.keys():
             self._enable_checkpoints = wfobj["enable_checkpoints"]
 
+        if "enable_fusion" in wfobj.keys():
+            self._enable_fusion = wfobj["enable_fusion"]
+
+        if "enable_binary_envelope" in wfobj.keys():
+            self._enable_binary_envelope = wfobj["enable_binary_envelope"]
+
+        if "codec" in wfobj.keys():
+            self._codec = wfobj["codec"]
+
+        if "payload_reference_threshold" in wfobj.keys():
+            self._payload_reference_threshold = wfobj["payload_reference_threshold"]
+
+        if "enable_checkpoint_journal" in wfobj.keys():
+            self._enable_checkpoint_journal = wfobj["enable_checkpoint_journal"]
+
+        if "persist_sync_results" in wfobj.keys():
+            self._persist_sync_results = wfobj["persist_sync_results"]
+
+        if "data_layer_cache" in wfobj.keys():
+            self._data_layer_cache = wfobj["data_layer_cache"]
+
+        if "data_layer_compression" in wfobj.keys():
+            self._data_layer_compression = wfobj["data_layer_compression"]
+
+        if "execution_budget_ms" in wfobj.keys():
+            self._execution_budget_ms = wfobj["execution_budget_ms"]
+
         # also include the exit as a potential destination for sending immediate trigger messages
         self.workflowFunctionMap[self.workflowExitPoint] = True
 
@@ -200,7 +310,22 @@ class Workflow:
             if "sessionFunctionParameters" in function.keys():
                 sgparams = function["sessionFunctionParameters"]
 
-            wfnode = WorkflowNode(topic, nextNodes, potNext, gwftype, gwfstatename, gwfstateinfo, is_session_function, sgparams, self._logger)
+            execution_mode = WorkflowExecutionMode.FORK
+            if "executionMode" in function.keys():
+                execution_mode = function["executionMode"]
+                if execution_mode not in WorkflowExecutionMode.ALL:
+                    self._logger.error("Faulty workflow description: " + gname + " uses unknown execution mode: " + str(execution_mode))
+                    self._has_error = True
+                elif is_session_function and execution_mode != WorkflowExecutionMode.FORK:
+                    # session functions are long-running and keep their own helper threads
+                    self._logger.error("Faulty workflow description: " + gname + " is a session function, which only supports the fork execution mode")
+                    self._has_error = True
+
+            execution_mode_parameters = {}
+            if "executionModeParameters" in function.keys():
+                execution_mode_parameters = function["executionModeParameters"]
+
+            wfnode = WorkflowNode(topic, nextNodes, potNext, gwftype, gwfstatename, gwfstateinfo, is_session_function, sgparams, self._logger, execution_mode, execution_mode_parameters)
 
             self.workflowNodeMap[topic] = wfnode
 
@@ -242,6 +367,24 @@ class Workflow:
         self.workflowEntryTopic = self.topicPrefix + self.workflowEntryPoint
         self._logger.info("parseASL: workflowName: " + self.workflowName)
         self._logger.info("parseASL: workflowEntryPoint: " + self.workflowEntryTopic)
+        if "EnableFusion" in wfobj.keys():
+            self._enable_fusion = wfobj["EnableFusion"]
+        if "EnableBinaryEnvelope" in wfobj.keys():
+            self._enable_binary_envelope = wfobj["EnableBinaryEnvelope"]
+        if "Codec" in wfobj.keys():
+            self._codec = wfobj["Codec"]
+        if "PayloadReferenceThreshold" in wfobj.keys():
+            self._payload_reference_threshold = wfobj["PayloadReferenceThreshold"]
+        if "EnableCheckpointJournal" in wfobj.keys():
+            self._enable_checkpoint_journal = wfobj["EnableCheckpointJournal"]
+        if "PersistSyncResults" in wfobj.keys():
+            self._persist_sync_results = wfobj["PersistSyncResults"]
+        if "DataLayerCache" in wfobj.keys():
+            self._data_layer_cache = wfobj["DataLayerCache"]
+        if "DataLayerCompression" in wfobj.keys():
+            self._data_layer_compression = wfobj["DataLayerCompression"]
+        if "ExecutionBudgetMs" in wfobj.keys():
+            self._execution_budget_ms = wfobj["ExecutionBudgetMs"]
         workflowstates = wfobj["States"]
         self.parseStates(workflowstates)
 
@@ -251,7 +394,18 @@ class Workflow:
         is_session_function = False
         sgparams = {}
 
-        wfnode = WorkflowNode(topic, nextNodes, potNext, gwfstatetype, gwfstatename, gwfstateinfo, is_session_function, sgparams, self._logger)
+        execution_mode = WorkflowExecutionMode.FORK
+        if "ExecutionMode" in gwfstateinfo.keys():
+            execution_mode = gwfstateinfo["ExecutionMode"]
+            if execution_mode not in WorkflowExecutionMode.ALL:
+                self._logger.error("Faulty workflow description: " + gname + " uses unknown execution mode: " + str(execution_mode))
+                self._has_error = True
+
+        execution_mode_parameters = {}
+        if "ExecutionModeParameters" in gwfstateinfo.keys():
+            execution_mode_parameters = gwfstateinfo["ExecutionModeParameters"]
+
+        wfnode = WorkflowNode(topic, nextNodes, potNext, gwfstatetype, gwfstatename, gwfstateinfo, is_session_function, sgparams, self._logger, execution_mode, execution_mode_parameters)
         self.workflowNodeMap[topic] = wfnode # add new node to workflow node map
 
     def insideParallelBranchAlready(self):
@@ -611,4 +765,31 @@ class Workflow:
         del self.workflowLocalFunctions[function_topic]
 
     def are_checkpoints_enabled(self):
-        return self._enable_checkpoints
\ No newline at end of file
+        return self._enable_checkpoints
+
+    def is_fusion_enabled(self):
+        return self._enable_fusion
+
+    def is_binary_envelope_enabled(self):
+        return self._enable_binary_envelope
+
+    def get_codec(self):
+        return self._codec
+
+    def get_payload_reference_threshold(self):
+        return self._payload_reference_threshold
+
+    def is_checkpoint_journal_enabled(self):
+        return self._enable_checkpoint_journal
+
+    def are_sync_results_persisted(self):
+        return self._persist_sync_results
+
+    def get_data_layer_cache_config(self):
+        return self._data_layer_cache
+
+    def get_data_layer_compression_config(self):
+        return self._data_layer_compression
+
+    def get_execution_budget_ms(self):
+        return self._execution_budget_ms
\ No newline at end of file
@@ -13,6 +13,7 @@
    See the License for the specific language governing permissions and
    limitations under the License.
 */
+import java.util.ArrayList;
 import java.util.HashMap;
 import java.util.List;
 import java.util.Map;
@@ -40,6 +41,12 @@ public class TestDataLayerOperations
         testMapOperations(context, true, testResultMap);
         testMapOperations(context, false, testResultMap);
 
+        testMultiKVOperations(context, true, testResultMap);
+        testMultiKVOperations(context, false, testResultMap);
+
+        testMultiMapOperations(context, true, testResultMap);
+        testMultiMapOperations(context, false, testResultMap);
+
         return testResultMap;
     }
 
@@ -437,6 +444,87 @@ public class TestDataLayerOperations
 
     }
 
+    private void testMultiKVOperations(MicroFunctionsAPI context,
+            boolean isPrivate,
+            HashMap<String, Boolean> testResultMap)
+    {
+        String postfix = "";
+        if (isPrivate)
+        {
+            postfix = "Private";
+        }
+
+        Random r = new Random();
+        Map<String, String> keyValueMap = new HashMap<String, String>();
+        List<String> keys = new ArrayList<String>();
+        for (int i = 0; i < 10; i++)
+        {
+            String key = "multikey_" + i + "_" + System.currentTimeMillis();
+            keyValueMap.put(key, "" + r.nextInt(100000));
+            keys.add(key);
+        }
+
+        // should be empty
+        Map<String, String> gotValues = context.multiGet(keys, isPrivate);
+
+        context.multiPut(keyValueMap, isPrivate);
+
+        // should be equal to 'keyValueMap'
+        Map<String, String> gotValues2 = context.multiGet(keys, isPrivate);
+
+        context.multiDelete(keys, isPrivate);
+
+        // should be empty
+        Map<String, String> gotValues3 = context.multiGet(keys, isPrivate);
+
+        boolean success = gotValues != null && gotValues.isEmpty() && keyValueMap.equals(gotValues2) && gotValues3 != null && gotValues3.isEmpty();
+        testResultMap.put("testMultiPut" + postfix, success);
+        testResultMap.put("testMultiGet" + postfix, success);
+        testResultMap.put("testMultiDelete" + postfix, success);
+    }
+
+    private void testMultiMapOperations(MicroFunctionsAPI context,
+            boolean isPrivate,
+            HashMap<String, Boolean> testResultMap)
+    {
+        String postfix = "";
+        if (isPrivate)
+        {
+            postfix = "Private";
+        }
+
+        Random r = new Random();
+        String mapname = "myMultiMap" + r.nextInt(10000);
+        Map<String, String> keyValueMap = new HashMap<String, String>();
+        List<String> keys = new ArrayList<String>();
+        for (int i = 0; i < 10; i++)
+        {
+            String key = "k" + i;
+            keyValueMap.put(key, "v" + r.nextInt(10000));
+            keys.add(key);
+        }
+
+        context.multiPutMapEntries(mapname, keyValueMap, isPrivate);
+
+        // should be equal to 'keyValueMap'
+        Map<String, String> gotEntries = context.multiGetMapEntries(mapname, keys, isPrivate);
+
+        List<String> deletedKeys = keys.subList(0, 5);
+        context.multiDeleteMapEntries(mapname, deletedKeys, isPrivate);
+
+        // should only contain the remaining entries
+        Map<String, String> gotEntries2 = context.multiGetMapEntries(mapname, keys, isPrivate);
+        Map<String, String> remainingEntries = new HashMap<String, String>(keyValueMap);
+        remainingEntries.keySet().removeAll(deletedKeys);
+
+        context.deleteMap(mapname, isPrivate);
+
+        boolean success = keyValueMap.equals(gotEntries) && remainingEntries.equals(gotEntries2);
+        testResultMap.put("testMultiPutMapEntries" + postfix, success);
+        testResultMap.put("testMultiGetMapEntries" + postfix, success);
+        testResultMap.put("testMultiDeleteMapEntries" + postfix, success);
+    }
+
     // ======================================
 
     private void sleepALittle()
@@ -28,6 +28,9 @@ class PerformanceLatencyTestSingle(unittest.TestCase):
         # 1. parse and obtain workflow
         self._test = MFNTest(test_name="wf_single_checkpoints_on", workflow_filename="wf_single_checkpoints_on.json")
         self._test_checkpoints_off = MFNTest(test_name="wf_single_checkpoints_off", workflow_filename="wf_single_checkpoints_off.json")
+        self._test_binary_envelope = MFNTest(test_name="wf_single_binary_envelope", workflow_filename="wf_single_binary_envelope.json")
+        self._test_msgpack = MFNTest(test_name="wf_single_msgpack", workflow_filename="wf_single_msgpack.json")
+        self._test_payload_reference = MFNTest(test_name="wf_chain_payload_reference", workflow_filename="wf_chain_payload_reference.json")
 
     #@unittest.skip("")
     def test_echo_0_bytes(self):
@@ -80,7 +83,22 @@ class PerformanceLatencyTestSingle(unittest.TestCase):
 
         self._test_checkpoints_off.exec_tests(test_tuple_list, check_duration=True, should_undeploy=False)
 
+        time.sleep(5)
+
+        self._test_binary_envelope.exec_tests(test_tuple_list, check_duration=True, should_undeploy=False)
+
+        time.sleep(5)
+
+        self._test_msgpack.exec_tests(test_tuple_list, check_duration=True, should_undeploy=False)
+
+        time.sleep(5)
+
+        self._test_payload_reference.exec_tests(test_tuple_list, check_duration=True, should_undeploy=False)
+
     @classmethod
     def tearDownClass(self):
         self._test.undeploy_workflow()
-        self._test_checkpoints_off.undeploy_workflow()
\ No newline at end of file
+        self._test_checkpoints_off.undeploy_workflow()
+        self._test_binary_envelope.undeploy_workflow()
+        self._test_msgpack.undeploy_workflow()
+        self._test_payload_reference.undeploy_workflow()
\ No newline at end of file
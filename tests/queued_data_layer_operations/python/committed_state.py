@@ -0,0 +1,31 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+def handle(event, sapi):
+    names = event["names"]
+
+    # the queued operations of the previous function have been committed before it published its output
+    committed = {}
+    committed["key"] = sapi.get(names["key"])
+    committed["map"] = sapi.retrieveMap(names["map"])
+    committed["set"] = sorted(sapi.retrieveSet(names["set"]))
+    committed["counter"] = sapi.getCounterValue(names["counter"])
+    event["committed"] = committed
+
+    sapi.delete(names["key"])
+    sapi.deleteMap(names["map"])
+    sapi.deleteSet(names["set"])
+    sapi.deleteCounter(names["counter"])
+
+    return event
@@ -0,0 +1,52 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+def _read_state(sapi, names):
+    state = {}
+    state["key"] = sapi.get(names["key"])
+    state["map"] = sapi.retrieveMap(names["map"])
+    state["set"] = sorted(sapi.retrieveSet(names["set"]))
+    state["counter"] = sapi.getCounterValue(names["counter"])
+    return state
+
+def handle(event, sapi):
+    names = event["names"]
+
+    # the committed state before this instance
+    sapi.put(names["key"], "old")
+    sapi.createMap(names["map"])
+    sapi.putMapEntry(names["map"], "old", "1")
+    sapi.createSet(names["set"])
+    sapi.addSetEntry(names["set"], "old")
+    sapi.createCounter(names["counter"], 10)
+
+    # queued delete, then put
+    sapi.delete(names["key"], is_queued=True)
+    sapi.put(names["key"], "new", is_queued=True)
+    sapi.deleteMap(names["map"], is_queued=True)
+    sapi.createMap(names["map"], is_queued=True)
+    sapi.putMapEntry(names["map"], "new", "2", is_queued=True)
+
+    # queued clear, then add
+    sapi.clearSet(names["set"], is_queued=True)
+    sapi.addSetEntry(names["set"], "new", is_queued=True)
+
+    # queued counter delete, then increment
+    sapi.deleteCounter(names["counter"], is_queued=True)
+    sapi.incrementCounter(names["counter"], 5, is_queued=True)
+
+    # read your writes: the queued operations are only committed when this instance finishes
+    event["read_your_writes"] = _read_state(sapi, names)
+
+    return event
@@ -0,0 +1,49 @@
+#   Copyright 2020 The KNIX Authors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import json
+import unittest
+import sys
+
+sys.path.append("../")
+from mfn_test_utils import MFNTest
+
+class QueuedDataLayerOperationsTest(unittest.TestCase):
+
+    #@unittest.skip("")
+    def test_queued_data_layer_operations(self):
+        event = {}
+        event["names"] = {}
+        event["names"]["key"] = "queued_ops_key"
+        event["names"]["map"] = "queued_ops_map"
+        event["names"]["set"] = "queued_ops_set"
+        event["names"]["counter"] = "queued_ops_counter"
+
+        # delete then put: only the new value; clear then add: only the new item;
+        # delete counter then increment: the increment starts from 0
+        state = {}
+        state["key"] = "new"
+        state["map"] = {"new": "2"}
+        state["set"] = ["new"]
+        state["counter"] = 5
+
+        expected_output = dict(event)
+        expected_output["read_your_writes"] = state
+        expected_output["committed"] = state
+
+        test_tuple_list = []
+        test_tuple_list.append((json.dumps(event), json.dumps(expected_output)))
+
+        test = MFNTest(test_name="Queued Data Layer Operations", workflow_filename="wf_queued_data_layer_operations.json")
+        test.exec_tests(test_tuple_list)